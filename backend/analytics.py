@@ -0,0 +1,178 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+
+from .cache import TTLCache
+from .market_simulator import SECONDS_PER_YEAR, PriceEngine, market, price_history
+from .models import PortfolioPerformance
+from .price_history import PRICE_HISTORY_BAR_SECONDS, PriceHistoryStore, downsample
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Upper bound on points in a performance series; the interval widens to stay under it
+ANALYTICS_MAX_POINTS = int(os.getenv("ANALYTICS_MAX_POINTS", 500))
+# Annual risk-free rate used for the Sharpe ratio
+ANALYTICS_RISK_FREE_RATE = float(os.getenv("ANALYTICS_RISK_FREE_RATE", 0.0))
+# Results are dropped on the portfolio's next trade, and otherwise refreshed this often
+ANALYTICS_CACHE_TTL_SECONDS = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", 60))
+
+# portfolio_id -> {interval_seconds: PortfolioPerformance}
+performance_cache = TTLCache(maxsize=int(os.getenv("ANALYTICS_CACHE_MAX_SIZE", 5000)), ttl_seconds=ANALYTICS_CACHE_TTL_SECONDS)
+
+def invalidate_performance(portfolio_id) -> None:
+    """Drops cached analytics for a portfolio after it trades."""
+    performance_cache.pop(str(portfolio_id))
+
+def default_interval(span_seconds: float) -> int:
+    """Smallest whole multiple of the bar width that keeps the series under ANALYTICS_MAX_POINTS."""
+    # The grid adds a point before the first trade and one at the end of the span
+    steps = max(1, ANALYTICS_MAX_POINTS - 2)
+    return PRICE_HISTORY_BAR_SECONDS * max(1, int(-(-span_seconds // (PRICE_HISTORY_BAR_SECONDS * steps))))
+
+def _price_matrix(
+    symbols: List[str],
+    grid: np.ndarray,
+    trade_prices: "pd.DataFrame",
+    interval_seconds: int,
+    engine: PriceEngine,
+    store: PriceHistoryStore,
+) -> np.ndarray:
+    """
+    Close price of each symbol at each grid time: recorded bars where available,
+    otherwise the last traded price, with current simulator prices at the final point.
+    """
+    import pandas as pd
+
+    start = datetime.fromtimestamp(int(grid[0]) - interval_seconds, timezone.utc)
+    end = datetime.fromtimestamp(int(grid[-1]) + 1, timezone.utc)
+    history = {}
+    for symbol in symbols:
+        try:
+            bars = store.read(symbol, start, end)
+        except ValueError:
+            continue
+        if interval_seconds != PRICE_HISTORY_BAR_SECONDS:
+            bars = downsample(bars, interval_seconds)
+        if len(bars):
+            # A bar's close is the price at the end of its interval
+            closes = pd.Series(bars["close"], index=bars["ts"] + interval_seconds)
+            history[symbol] = closes[~closes.index.duplicated(keep="last")].reindex(grid, method="ffill")
+    prices = pd.DataFrame(history, index=grid, columns=symbols, dtype=float)
+    prices = prices.combine_first(trade_prices.set_axis(grid).ffill())
+    current = [engine.get_price(symbol) if symbol in engine.symbol_index else np.nan for symbol in symbols]
+    prices.iloc[-1] = np.where(np.isnan(current), prices.iloc[-1].to_numpy(), current)
+    return prices.ffill().to_numpy()
+
+def compute_performance(
+    portfolio_id,
+    balance: float,
+    trade_rows: List[dict],
+    interval_seconds: Optional[int] = None,
+    now: Optional[float] = None,
+    engine: PriceEngine = market,
+    store: PriceHistoryStore = price_history,
+) -> PortfolioPerformance:
+    """
+    Reconstructs a portfolio's value over time from its trades and summarizes it.
+
+    Trades are bucketed onto a regular time grid; positions and cash are cumulative
+    sums of the signed fills per bucket, and the value series is cash plus positions
+    times a (time x symbol) price matrix built from recorded price history.
+
+    Args:
+        portfolio_id: The portfolio being analysed.
+        balance: Its current cash balance, used to recover the starting cash.
+        trade_rows: Its `trades` rows (symbol, quantity, price, side, executed_at).
+        interval_seconds: Grid spacing; chosen from the trading span if None, and widened
+            if it would give more than ANALYTICS_MAX_POINTS points.
+        now: End of the series in epoch seconds (defaults to the current time).
+
+    Returns:
+        PortfolioPerformance: Summary statistics and the value series.
+    """
+    # pandas is imported on first use; it is slow to import and only analytics needs it
+    import pandas as pd
+
+    now = time.time() if now is None else now
+    if not trade_rows:
+        interval_seconds = interval_seconds or PRICE_HISTORY_BAR_SECONDS
+        point = datetime.fromtimestamp(now, timezone.utc)
+        return PortfolioPerformance(
+            portfolio_id=portfolio_id, interval_seconds=interval_seconds, start=point, end=point,
+            initial_value=balance, current_value=balance, total_return=0.0,
+            annualized_volatility=None, sharpe_ratio=None, max_drawdown=0.0,
+            ts=[point], value=[balance],
+        )
+
+    trades = pd.DataFrame(trade_rows)
+    executed_at = pd.to_datetime(trades["executed_at"], utc=True, format="ISO8601")
+    trade_ts = (executed_at - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy()
+    signed_quantity = np.where(trades["side"].to_numpy() == "BUY", 1.0, -1.0) * trades["quantity"].to_numpy(dtype=float)
+    trade_price = trades["price"].to_numpy(dtype=float)
+    cash_flow = -signed_quantity * trade_price
+    initial_cash = float(balance - cash_flow.sum())
+
+    # An explicit interval only ever widens the default, so the grid stays within ANALYTICS_MAX_POINTS
+    interval_seconds = max(interval_seconds or 0, default_interval(now - trade_ts.min()))
+    # Grid point i is the state at that instant; the first point precedes every trade
+    start = (np.ceil(trade_ts.min() / interval_seconds) - 1) * interval_seconds
+    grid = np.arange(start, now + interval_seconds, interval_seconds, dtype=float)
+    grid[-1] = max(now, trade_ts.max())
+    bucket = np.searchsorted(grid, trade_ts, side="left")
+    symbols, symbol_idx = np.unique(trades["symbol"].to_numpy(), return_inverse=True)
+    symbols = symbols.tolist()
+
+    position_changes = np.zeros((len(grid), len(symbols)))
+    np.add.at(position_changes, (bucket, symbol_idx), signed_quantity)
+    positions = position_changes.cumsum(axis=0)
+    cash = initial_cash + np.bincount(bucket, weights=cash_flow, minlength=len(grid)).cumsum()
+
+    last_trade_prices = (
+        pd.DataFrame({"bucket": bucket, "symbol": symbol_idx, "price": trade_price})
+        .groupby(["bucket", "symbol"])["price"].last()
+        .unstack()
+        .reindex(index=range(len(grid)), columns=range(len(symbols)))
+    )
+    last_trade_prices.columns = symbols
+    prices = _price_matrix(symbols, grid, last_trade_prices, interval_seconds, engine, store)
+    values = cash + np.nansum(positions * prices, axis=1)
+
+    previous = values[:-1]
+    returns = np.divide(np.diff(values), previous, out=np.zeros(len(previous)), where=previous > 0)
+    periods_per_year = SECONDS_PER_YEAR / interval_seconds
+    volatility = sharpe = None
+    if len(returns) > 1:
+        std = float(returns.std(ddof=1))
+        volatility = std * np.sqrt(periods_per_year)
+        if std > 0:
+            excess = returns.mean() - ANALYTICS_RISK_FREE_RATE / periods_per_year
+            sharpe = float(excess / std * np.sqrt(periods_per_year))
+    peaks = np.maximum.accumulate(values)
+    drawdowns = np.divide(values, peaks, out=np.ones(len(values)), where=peaks > 0) - 1
+
+    return PortfolioPerformance(
+        portfolio_id=portfolio_id,
+        interval_seconds=interval_seconds,
+        start=datetime.fromtimestamp(grid[0], timezone.utc),
+        end=datetime.fromtimestamp(grid[-1], timezone.utc),
+        initial_value=round(initial_cash, 2),
+        current_value=round(float(values[-1]), 2),
+        total_return=float(values[-1] / initial_cash - 1) if initial_cash > 0 else 0.0,
+        annualized_volatility=volatility,
+        sharpe_ratio=sharpe,
+        max_drawdown=float(drawdowns.min()),
+        ts=[datetime.fromtimestamp(ts, timezone.utc) for ts in grid.tolist()],
+        value=np.round(values, 2).tolist(),
+    )
+
+def cached_performance(portfolio_id, interval_seconds: Optional[int]) -> Optional[PortfolioPerformance]:
+    return (performance_cache.get(str(portfolio_id)) or {}).get(interval_seconds)
+
+def store_performance(portfolio_id, interval_seconds: Optional[int], performance: PortfolioPerformance) -> None:
+    entries: Dict[Optional[int], PortfolioPerformance] = dict(performance_cache.get(str(portfolio_id)) or {})
+    entries[interval_seconds] = performance
+    performance_cache.set(str(portfolio_id), entries)
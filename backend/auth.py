@@ -1,6 +1,10 @@
+import asyncio
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
@@ -8,9 +12,13 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-from .database import supabase
+from .cache import TTLCache
+from .database import execute, supabase
+from .metrics import password_hash_duration, password_hash_rejected, password_hash_wait
 from .models import TokenData, UserInDB
 
+logger = logging.getLogger(__name__)
+
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -25,6 +33,26 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY environment variable not set.")
 
+# Verified-token and user caches for the authentication hot path
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 300))
+
+# Cached users changed by another worker are evicted within this many seconds (users.updated_at is polled)
+AUTH_INVALIDATION_POLL_SECONDS = float(os.getenv("AUTH_INVALIDATION_POLL_SECONDS", 5))
+
+# token -> (user_id, exp); entries never outlive the token itself
+token_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# user_id -> UserInDB; bounded by AUTH_CACHE_TTL_SECONDS so profile changes are picked up
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+# Password hashing pool: bcrypt releases the GIL, so worker threads hash on separate cores
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", 2))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed password."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -33,6 +61,73 @@ def get_password_hash(password: str) -> str:
     """Hashes a plain password."""
     return pwd_context.hash(password)
 
+def _timed_call(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, started, time.perf_counter() - started
+
+async def _run_password_op(op: str, func, *args, admit: bool = True):
+    """
+    Runs a bcrypt operation on the hashing pool with admission control.
+
+    With `admit=False` the operation skips admission control: it still counts towards
+    the queue seen by other requests, but is never rejected.
+
+    Raises:
+        HTTPException: 503 with Retry-After when the pool's queue is full.
+    """
+    global _hash_pending
+    if admit and _hash_pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        password_hash_rejected.inc(operation=op)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+    _hash_pending += 1
+    submitted = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        result, started, elapsed = await loop.run_in_executor(_hash_executor, _timed_call, func, *args)
+    finally:
+        _hash_pending -= 1
+    password_hash_duration.observe(elapsed, operation=op)
+    password_hash_wait.observe(started - submitted, operation=op)
+    return result
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a password on the hashing pool without blocking the event loop."""
+    return await _run_password_op("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hashes a password on the hashing pool without blocking the event loop."""
+    return await _run_password_op("hash", get_password_hash, password)
+
+async def get_password_hashes_async(passwords: List[str]) -> List[str]:
+    """
+    Hashes many passwords on the hashing pool, e.g. for a roster import.
+
+    At most PASSWORD_HASH_WORKERS hashes are submitted at a time, so logins queue
+    behind one round of bulk work instead of the whole batch. Since that already bounds
+    what the batch adds to the queue, it bypasses admission control: a burst of logins
+    can delay an import but not fail it halfway.
+    """
+    semaphore = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+
+    async def hash_one(password: str) -> str:
+        async with semaphore:
+            return await _run_password_op("bulk_hash", get_password_hash, password, admit=False)
+
+    return list(await asyncio.gather(*(hash_one(password) for password in passwords)))
+
+def password_hash_pending() -> int:
+    """Returns the number of bcrypt calls queued or running on the hashing pool."""
+    return _hash_pending
+
+def shutdown_hash_executor() -> None:
+    """Stops the hashing pool, waiting for queued operations to finish."""
+    _hash_executor.shutdown(wait=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Creates a JWT access token.
@@ -69,22 +164,72 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id_str: str = payload.get("sub")
-        if user_id_str is None:
+    cached_token = token_cache.get(token)
+    if cached_token is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id_str: str = payload.get("sub")
+            if user_id_str is None:
+                raise credentials_exception
+            token_data = TokenData(id=UUID(user_id_str))
+        except (JWTError, ValueError):
             raise credentials_exception
-        token_data = TokenData(id=UUID(user_id_str))
-    except JWTError:
-        raise credentials_exception
+        expires_at = payload.get("exp")
+        token_cache.set(token, (token_data.id, expires_at), expires_at=expires_at)
+    else:
+        user_id, expires_at = cached_token
+        token_data = TokenData(id=user_id)
+
+    cached_user = user_cache.get(token_data.id)
+    if cached_user is not None:
+        return cached_user
 
     # Fetch user from Supabase (assuming 'id' in users table matches 'sub' in JWT)
-    response = supabase.table("users").select("*").eq("id", token_data.id).single().execute()
+    response = await execute(supabase.table("users").select("*").eq("id", token_data.id).single())
     user_data = response.data
 
     if user_data is None:
         raise credentials_exception
-    return UserInDB(**user_data)
+    user = UserInDB(**user_data)
+    user_cache.set(user.id, user, expires_at=expires_at)
+    return user
+
+def invalidate_user(user_id: UUID) -> None:
+    """Drops a cached user so the next request re-reads it (e.g., after a role change)."""
+    user_cache.pop(user_id)
+
+async def evict_changed_users(since: datetime) -> datetime:
+    """
+    Drops cached users whose row was updated after `since`, by any worker.
+
+    Returns:
+        datetime: The `since` to pass to the next call. It trails the current time by one
+        poll interval, so an update committed while this call ran is not missed.
+    """
+    polled_at = datetime.now(timezone.utc)
+    response = await execute(supabase.table("users").select("id").gt("updated_at", since.isoformat()))
+    for row in response.data or []:
+        user_cache.pop(UUID(row["id"]))
+    return polled_at - timedelta(seconds=AUTH_INVALIDATION_POLL_SECONDS)
+
+async def watch_user_changes() -> None:
+    """
+    Evicts users changed by other workers every AUTH_INVALIDATION_POLL_SECONDS.
+
+    invalidate_user only reaches the worker that made the change; this loop bounds how
+    long the others keep serving a stale role to one poll interval.
+    """
+    since = datetime.now(timezone.utc)
+    while True:
+        await asyncio.sleep(AUTH_INVALIDATION_POLL_SECONDS)
+        try:
+            since = await evict_changed_users(since)
+        except Exception:
+            logger.exception("Polling for changed users failed")
+
+def auth_cache_stats() -> dict:
+    """Returns hit/miss counters for the token and user caches."""
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
 
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
     """
@@ -1,41 +1,137 @@
+import asyncio
 import os
-from openai import OpenAI
+import threading
+import time
 from uuid import UUID
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from .chatbot_cache import ResponseCache, is_self_contained
+from .metrics import external_api_duration
 
-def get_chatbot_response(query: str, user_id: UUID, conversation_history: List[Dict] = None) -> str:
-    """Generates a response from the AI chatbot."""
-    if conversation_history is None:
-        conversation_history = []
+# OpenAI client, created on first use (the openai package is slow to import)
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared OpenAI client, importing and creating it on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AsyncOpenAI
+                # Honors OPENAI_BASE_URL, so a local completion server can stand in
+                _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+async def close_client() -> None:
+    """Closes the OpenAI client's connection pool, if it was ever created."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
+
+CHATBOT_MODEL = os.getenv("CHATBOT_MODEL", "gpt-3.5-turbo") # Or gpt-4, depending on availability and cost
+
+SYSTEM_PROMPT = "You are FinLit, a friendly and knowledgeable financial literacy assistant. Provide helpful, educational, and neutral financial information. Do not give direct investment advice."
+
+FALLBACK_RESPONSE = "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again later."
+
+# Answers to self-contained questions, looked up whether or not the user has history;
+# follow-ups that depend on the conversation always go to the model
+response_cache = ResponseCache()
+
+class IncompleteResponseError(Exception):
+    """Raised by a streamed response when the completion fails after part of the answer was sent."""
 
+def build_messages(query: str, conversation_history: List[Dict] = None) -> List[Dict]:
+    """Builds the chat messages: system prompt, previous turns, then the current query."""
     # Add system message to set the context for the chatbot
     messages = [
-        {"role": "system", "content": "You are FinLit, a friendly and knowledgeable financial literacy assistant. Provide helpful, educational, and neutral financial information. Do not give direct investment advice."},
+        {"role": "system", "content": SYSTEM_PROMPT},
     ]
 
     # Add previous conversation history
-    messages.extend(conversation_history)
+    messages.extend(conversation_history or [])
     
     # Add the current user query
     messages.append({"role": "user", "content": query})
+    return messages
+
+def is_cacheable(query: str, conversation_history: List[Dict] = None) -> bool:
+    """Whether the answer to `query` can be shared: it has no history or does not refer to it."""
+    return not conversation_history or is_self_contained(query)
+
+async def get_chatbot_response(query: str, user_id: UUID, conversation_history: List[Dict] = None) -> str:
+    """Generates a response from the AI chatbot."""
+    cacheable = is_cacheable(query, conversation_history)
+    if not cacheable:
+        response_cache.record_bypass()
+    else:
+        cached = response_cache.get(query)
+        if cached is not None:
+            return cached
+    try:
+        with external_api_duration.time(service="openai", operation="chat_completion"):
+            response = await get_client().chat.completions.create(
+                model=CHATBOT_MODEL,
+                messages=build_messages(query, conversation_history),
+                max_tokens=150,
+                temperature=0.7,
+            )
+        answer = response.choices[0].message.content.strip()
+        if cacheable:
+            response_cache.set(query, answer)
+        return answer
+    except Exception as e:
+        print(f"Error calling OpenAI API: {e}")
+        return FALLBACK_RESPONSE
+
+async def stream_chatbot_response(query: str, user_id: UUID, conversation_history: List[Dict] = None) -> AsyncIterator[str]:
+    """
+    Generates a response from the AI chatbot, yielding text fragments as they arrive.
 
+    Raises:
+        IncompleteResponseError: The completion failed mid-answer; the fragments already
+            yielded are a partial answer and are not cached.
+    """
+    cacheable = is_cacheable(query, conversation_history)
+    if not cacheable:
+        response_cache.record_bypass()
+    else:
+        cached = response_cache.get(query)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    failed = False
+    started = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Or gpt-4, depending on availability and cost
-            messages=messages,
+        stream = await get_client().chat.completions.create(
+            model=CHATBOT_MODEL,
+            messages=build_messages(query, conversation_history),
             max_tokens=150,
             temperature=0.7,
+            stream=True,
         )
-        return response.choices[0].message.content.strip()
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    external_api_duration.observe(time.perf_counter() - started, service="openai", operation="chat_completion_first_token")
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
-        return "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again later."
+        failed = True
+    external_api_duration.observe(time.perf_counter() - started, service="openai", operation="chat_completion_stream")
+    if not parts:
+        yield FALLBACK_RESPONSE
+    elif failed:
+        raise IncompleteResponseError("The completion failed after part of the answer was streamed")
+    elif cacheable:
+        response_cache.set(query, "".join(parts).strip())
 
 # Example usage (for testing)
 if __name__ == "__main__":
     sample_user_id = UUID('a1b2c3d4-e5f6-7890-1234-567890abcdef') # Replace with a real UUID
-    print("Chatbot response:", get_chatbot_response("What is diversification?", sample_user_id))
-    print("Chatbot response:", get_chatbot_response("Explain compound interest.", sample_user_id))
+    print("Chatbot response:", asyncio.run(get_chatbot_response("What is diversification?", sample_user_id)))
+    print("Chatbot response:", asyncio.run(get_chatbot_response("Explain compound interest.", sample_user_id)))
@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+
+from .cache import TTLCache
+
+# Response cache for self-contained chatbot questions
+CHATBOT_CACHE_MAX_SIZE = int(os.getenv("CHATBOT_CACHE_MAX_SIZE", 2048))
+CHATBOT_CACHE_TTL_SECONDS = int(os.getenv("CHATBOT_CACHE_TTL_SECONDS", 24 * 60 * 60))
+# Cosine similarity at which a differently worded question reuses a cached answer (0 disables)
+CHATBOT_CACHE_SIMILARITY = float(os.getenv("CHATBOT_CACHE_SIMILARITY", 0.92))
+
+EMBEDDING_DIM = 1024
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_SPACES = re.compile(r"\s+")
+
+# Filler words ignored by the near-duplicate index so that content words decide similarity
+_STOP_WORDS = frozenset(
+    "a an the is are was what whats what's s how do does i me my you your can could would "
+    "please explain tell about of to in on for and or it this that".split()
+)
+
+# Words that tie a question to earlier turns ("explain that again", "what about them?")
+_FOLLOW_UP_WORDS = frozenset(
+    "it its that this these those they them their he she him her more else again above previous earlier example".split()
+)
+_FOLLOW_UP_OPENERS = ("and ", "but ", "or ", "so ", "also ", "then ", "what about ", "how about ")
+_FOLLOW_UP_REPLIES = frozenset("why how yes no ok okay sure thanks".split())
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and strips punctuation and extra whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", query.lower())).strip()
+
+def embed_query(normalized: str) -> np.ndarray:
+    """
+    Embeds a normalized query as a unit vector using feature hashing.
+
+    Content words and their character trigrams are hashed into EMBEDDING_DIM buckets, so
+    rephrasings of the same question ("what is diversification" / "explain diversification")
+    land close together without calling an embedding model.
+    """
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    words = [word for word in normalized.split() if word not in _STOP_WORDS] or normalized.split()
+    features = [f"w:{word}" for word in words]
+    padded = f" {' '.join(words)} "
+    features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    for feature in features:
+        vector[zlib.crc32(feature.encode()) % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def is_self_contained(query: str) -> bool:
+    """
+    Tells whether `query` reads as a standalone question, whose answer does not depend
+    on the conversation before it. Errs toward treating questions as follow-ups.
+    """
+    normalized = normalize_query(query)
+    words = normalized.split()
+    if not words or (len(words) == 1 and words[0] in _FOLLOW_UP_REPLIES):
+        return False
+    return not normalized.startswith(_FOLLOW_UP_OPENERS) and _FOLLOW_UP_WORDS.isdisjoint(words)
+
+class ResponseCache:
+    """
+    Caches chatbot answers by normalized question, with an optional near-duplicate index.
+
+    Exact matches come from a TTL + LRU cache. When `similarity` is set, every cached
+    question also has a hashed embedding in a fixed-size ring of vectors; a lookup
+    that misses exactly compares against all of them with one matrix-vector product.
+    """
+
+    def __init__(self, maxsize: int = CHATBOT_CACHE_MAX_SIZE, ttl_seconds: float = CHATBOT_CACHE_TTL_SECONDS, similarity: float = CHATBOT_CACHE_SIMILARITY):
+        self.similarity = similarity
+        self._answers = TTLCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self._vectors = np.zeros((maxsize, EMBEDDING_DIM), dtype=np.float32) if similarity > 0 else None
+        self._vector_keys = [None] * maxsize
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def get(self, query: str) -> Optional[str]:
+        """Returns a cached answer for `query` (or a near-duplicate of it), if any."""
+        key = normalize_query(query)
+        answer = self._answers.get(key)
+        if answer is not None:
+            self.exact_hits += 1
+            return answer
+        if self._vectors is not None and key:
+            with self._lock:
+                scores = self._vectors @ embed_query(key)
+                best = int(np.argmax(scores))
+                best_key = self._vector_keys[best] if scores[best] >= self.similarity else None
+            if best_key is not None:
+                answer = self._answers.get(best_key)
+                if answer is not None:
+                    self.near_hits += 1
+                    return answer
+        self.misses += 1
+        return None
+
+    def set(self, query: str, answer: str) -> None:
+        """Caches `answer` for `query`."""
+        key = normalize_query(query)
+        if not key:
+            return
+        is_new = self._answers.get(key) is None
+        self._answers.set(key, answer)
+        if self._vectors is not None and is_new:
+            with self._lock:
+                slot = self._next_slot
+                self._vectors[slot] = embed_query(key)
+                self._vector_keys[slot] = key
+                self._next_slot = (slot + 1) % len(self._vector_keys)
+
+    def record_bypass(self) -> None:
+        """Counts a question that skipped the cache (a follow-up that depends on the conversation)."""
+        self.bypassed += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hit/miss counters and the hit rate over cacheable questions."""
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "size": len(self._answers),
+            "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,143 @@
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .cache import TTLCache
+from .database import execute, supabase
+
+# Conversation window sent with each chatbot question
+CHATBOT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHATBOT_HISTORY_TOKEN_BUDGET", 1000))
+CHATBOT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHATBOT_SUMMARY_TOKEN_BUDGET", 200))
+CHATBOT_HISTORY_MAX_TURNS = int(os.getenv("CHATBOT_HISTORY_MAX_TURNS", 10))
+# A conversation idle for this long is forgotten and the next question starts a new one
+CHATBOT_SESSION_IDLE_MINUTES = int(os.getenv("CHATBOT_SESSION_IDLE_MINUTES", 30))
+CHATBOT_MEMORY_MAX_USERS = int(os.getenv("CHATBOT_MEMORY_MAX_USERS", 10000))
+
+# Words kept from an old question when it drops out of the window
+SUMMARY_WORDS_PER_TURN = 12
+
+def estimate_tokens(text: str) -> int:
+    """Approximates the token count of `text` (about four characters per token for English)."""
+    return max(1, (len(text) + 3) // 4)
+
+class Conversation:
+    """
+    One user's recent chatbot turns, capped by turn count and token budget.
+
+    Turns that fall out of the window lose their answer and keep only the first words of
+    their question, as a capped list of earlier topics; this is truncation, not a model
+    written summary, but it keeps the prompt size bounded however long the conversation runs.
+    """
+
+    def __init__(self, token_budget: int = CHATBOT_HISTORY_TOKEN_BUDGET, summary_budget: int = CHATBOT_SUMMARY_TOKEN_BUDGET, max_turns: int = CHATBOT_HISTORY_MAX_TURNS):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_turns = max_turns
+        self.turns: Deque[Tuple[str, str, int]] = deque()
+        self.turn_tokens = 0
+        self.topics: Deque[Tuple[str, int]] = deque()
+        self.summary_tokens = 0
+        # interaction_at of the newest stored turn in the window
+        self.stored_at: Optional[datetime] = None
+
+    def add(self, query: str, response: str) -> None:
+        """Appends a turn, reducing the oldest turns to topics if the window overflows."""
+        tokens = estimate_tokens(query) + estimate_tokens(response)
+        self.turns.append((query, response, tokens))
+        self.turn_tokens += tokens
+        while len(self.turns) > 1 and (len(self.turns) > self.max_turns or self.turn_tokens > self.token_budget):
+            old_query, _, old_tokens = self.turns.popleft()
+            self.turn_tokens -= old_tokens
+            self._add_topic(old_query)
+
+    def _add_topic(self, query: str) -> None:
+        words = query.split()
+        topic = " ".join(words[:SUMMARY_WORDS_PER_TURN]) + ("..." if len(words) > SUMMARY_WORDS_PER_TURN else "")
+        tokens = estimate_tokens(topic)
+        self.topics.append((topic, tokens))
+        self.summary_tokens += tokens
+        while len(self.topics) > 1 and self.summary_tokens > self.summary_budget:
+            _, dropped = self.topics.popleft()
+            self.summary_tokens -= dropped
+
+    def messages(self) -> List[Dict]:
+        """Returns the conversation as chat messages (earlier topics first, then recent turns)."""
+        messages = []
+        if self.topics:
+            summary = "; ".join(topic for topic, _ in self.topics)
+            messages.append({"role": "system", "content": f"Earlier in this conversation the student asked about: {summary}"})
+        for query, response, _ in self.turns:
+            messages.append({"role": "user", "content": query})
+            messages.append({"role": "assistant", "content": response})
+        return messages
+
+class ConversationMemory:
+    """
+    Per-user conversation windows kept in process memory.
+
+    A user's window is loaded from `chatbot_interactions` on their first question (only
+    turns from the current session are used) and then kept up to date in memory. Each
+    question reads just the newest stored turn's time, and the window is loaded again
+    if that turn is newer than the window, i.e. it was asked through another worker.
+    """
+
+    def __init__(self, max_users: int = CHATBOT_MEMORY_MAX_USERS, idle_minutes: int = CHATBOT_SESSION_IDLE_MINUTES):
+        self.idle_minutes = idle_minutes
+        self._conversations = TTLCache(maxsize=max_users, ttl_seconds=idle_minutes * 60)
+
+    async def _load(self, user_id: UUID) -> Conversation:
+        since = datetime.now(timezone.utc) - timedelta(minutes=self.idle_minutes)
+        response = await execute(
+            supabase.table("chatbot_interactions")
+            .select("query, response, interaction_at")
+            .eq("user_id", user_id)
+            .gte("interaction_at", since.isoformat())
+            .order("interaction_at", desc=True)
+            .limit(CHATBOT_HISTORY_MAX_TURNS * 2)
+        )
+        conversation = Conversation()
+        rows = response.data or []
+        for row in reversed(rows):
+            conversation.add(row["query"], row["response"])
+        if rows:
+            conversation.stored_at = datetime.fromisoformat(rows[0]["interaction_at"])
+        return conversation
+
+    async def _newest(self, user_id: UUID) -> Optional[datetime]:
+        response = await execute(
+            supabase.table("chatbot_interactions")
+            .select("interaction_at")
+            .eq("user_id", user_id)
+            .order("interaction_at", desc=True)
+            .limit(1)
+        )
+        return datetime.fromisoformat(response.data[0]["interaction_at"]) if response.data else None
+
+    async def history(self, user_id: UUID) -> List[Dict]:
+        """Returns the user's conversation as chat messages, loading it if this worker's copy is missing or behind."""
+        conversation = self._conversations.get(user_id)
+        if conversation is not None:
+            newest = await self._newest(user_id)
+            if newest is not None and (conversation.stored_at is None or newest > conversation.stored_at):
+                conversation = None
+        if conversation is None:
+            conversation = await self._load(user_id)
+            self._conversations.set(user_id, conversation)
+        return conversation.messages()
+
+    def record(self, user_id: UUID, query: str, response: str, interaction_at: datetime) -> None:
+        """Adds a completed turn, stored at `interaction_at`, and restarts the user's idle timer."""
+        conversation = self._conversations.get(user_id) or Conversation()
+        conversation.add(query, response)
+        conversation.stored_at = interaction_at if conversation.stored_at is None else max(conversation.stored_at, interaction_at)
+        self._conversations.set(user_id, conversation)
+
+    def forget(self, user_id: UUID) -> None:
+        """Drops a user's conversation window."""
+        self._conversations.pop(user_id)
+
+# Shared per-user conversation windows used by the chatbot endpoints
+conversation_memory = ConversationMemory()
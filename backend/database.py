@@ -1,20 +1,118 @@
+import asyncio
 import os
-from supabase import create_client, Client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+from .metrics import db_query_duration, db_query_errors
+
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
 SUPABASE_URL: str = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY")
 SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY")
 
+# Maximum number of PostgREST round-trips in flight per worker process.
+SUPABASE_MAX_CONCURRENCY: int = int(os.getenv("SUPABASE_MAX_CONCURRENCY", 32))
+# PostgREST caps rows per response (1000 by default), so bulk reads are paged.
+SUPABASE_PAGE_SIZE: int = int(os.getenv("SUPABASE_PAGE_SIZE", 1000))
+
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY or not SUPABASE_ANON_KEY:
     raise ValueError("Supabase environment variables not set.")
 
 # Use the Service Role Key for backend operations for full access (bypasses RLS)
 # Or use the Anon Key if you want RLS to apply to your backend as well.
 # For this app, we'll use the Service Key for admin-like access from backend.
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# The client keeps a single pooled HTTP session that is shared by every query.
+_client = None
+_client_created = False
+_client_lock = threading.Lock()
+
+def get_supabase() -> "Client":
+    """Returns the shared Supabase client, importing and creating it on first call."""
+    global _client, _client_created
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+                _client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+                _client_created = True
+    return _client
+
+class _LazyClient:
+    """Stands in for the Supabase client and creates it the first time it is used."""
+
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
+
+supabase: "Client" = _LazyClient()
 
 # You might also want a client that respects RLS for certain operations
 # supabase_rls: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+
+# Dedicated, bounded pool for blocking Supabase calls so they never run on the event loop.
+_db_executor = ThreadPoolExecutor(max_workers=SUPABASE_MAX_CONCURRENCY, thread_name_prefix="supabase")
+
+async def execute(query):
+    """
+    Executes a Supabase query builder without blocking the event loop.
+
+    Args:
+        query: A built query (e.g., supabase.table("users").select("*").eq("id", user_id)).
+
+    Returns:
+        The APIResponse returned by the builder's execute().
+    """
+    request = getattr(query, "request", query)
+    path = str(getattr(request, "path", ""))
+    # ".../rest/v1/trades" -> "trades", ".../rest/v1/rpc/execute_trade" -> "rpc/execute_trade"
+    table = path.split("/rest/v1/", 1)[-1] or "unknown"
+    method = getattr(request, "http_method", "unknown")
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_db_executor, query.execute)
+    except Exception:
+        db_query_errors.inc(table=table, method=method)
+        raise
+    finally:
+        db_query_duration.observe(time.perf_counter() - started, table=table, method=method)
+
+async def fetch_all(build_query, page_size: int = SUPABASE_PAGE_SIZE) -> list:
+    """
+    Reads every row of a query by paging through it with range().
+
+    Args:
+        build_query: Callable returning a fresh, deterministically ordered select builder.
+        page_size (int): Rows per round-trip; must not exceed the PostgREST max-rows setting.
+
+    Returns:
+        list: All rows, in query order.
+    """
+    rows = []
+    start = 0
+    while True:
+        response = await execute(build_query().range(start, start + page_size - 1))
+        rows.extend(response.data)
+        if len(response.data) < page_size:
+            return rows
+        start += page_size
+
+def close_supabase() -> None:
+    """Closes the Supabase client's HTTP session, if the client was ever created."""
+    global _client, _client_created
+    with _client_lock:
+        client, _client = _client, None
+        created, _client_created = _client_created, False
+    # Only the PostgREST session is used (checked against supabase 2.32.0)
+    if created and client is not None:
+        client.postgrest.session.close()
+
+def shutdown_executor() -> None:
+    """Stops the database worker pool, waiting for in-flight queries to finish."""
+    _db_executor.shutdown(wait=True)
@@ -0,0 +1,283 @@
+import asyncio
+import csv
+import heapq
+import importlib.util
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from uuid import UUID
+
+from .cache import TTLCache
+from .database import SUPABASE_PAGE_SIZE, execute, fetch_all, supabase
+from .pagination import encode_cursor, keyset_page
+
+# Rows fetched per PostgREST request while exporting
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", SUPABASE_PAGE_SIZE))
+# Rows buffered per Parquet row group; bounds export memory together with EXPORT_PAGE_SIZE
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 50000))
+# Ids per `in` filter when an export is scoped to a class
+EXPORT_FILTER_BATCH_SIZE = 200
+# Users and portfolios an export of every class keeps looked up; older ones are fetched again
+EXPORT_LOOKUP_CACHE_SIZE = int(os.getenv("EXPORT_LOOKUP_CACHE_SIZE", 10000))
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+TRADE_EXPORT_COLUMNS = ["id", "executed_at", "user_id", "email", "class_code", "portfolio_id", "symbol", "side", "quantity", "price"]
+CHATBOT_EXPORT_COLUMNS = ["id", "interaction_at", "user_id", "email", "class_code", "query", "response", "feedback"]
+
+def parquet_available() -> bool:
+    # pyarrow is optional and only imported when a Parquet export runs
+    return importlib.util.find_spec("pyarrow") is not None
+
+async def _pages(build_query: Callable, sort_key: str, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[dict]]:
+    """
+    Walks a query newest first with keyset pagination, yielding one page at a time.
+
+    The next page is requested before the current one is handed to the consumer,
+    so the database round-trip overlaps with encoding and sending.
+    """
+    before = None
+    pending = asyncio.ensure_future(execute(keyset_page(build_query(), sort_key, before, page_size - 1)))
+    try:
+        while pending is not None:
+            rows = (await pending).data or []
+            pending = None
+            if len(rows) == page_size:
+                before = encode_cursor(rows[-1], sort_key)
+                pending = asyncio.ensure_future(execute(keyset_page(build_query(), sort_key, before, page_size - 1)))
+            if rows:
+                yield rows
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+async def _merged_pages(streams: List[AsyncIterator[List[dict]]], sort_key: str, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[dict]]:
+    """
+    Merges newest-first page streams (one per `in` filter chunk) into one newest-first stream.
+
+    Each stream holds at most its current page (and the one prefetched after it).
+    """
+    if len(streams) == 1:
+        async for rows in streams[0]:
+            yield rows
+        return
+
+    def newest_first(row: dict) -> tuple:
+        return (-datetime.fromisoformat(row[sort_key]).timestamp(), -UUID(str(row["id"])).int)
+
+    pages: List[List[dict]] = [[] for _ in streams]
+    heap = []
+
+    async def next_page(i: int) -> None:
+        pages[i] = list(reversed(await anext(streams[i], [])))
+        if pages[i]:
+            heapq.heappush(heap, (newest_first(pages[i][-1]), i))
+
+    try:
+        await asyncio.gather(*(next_page(i) for i in range(len(streams))))
+        merged = []
+        while heap:
+            _, i = heapq.heappop(heap)
+            merged.append(pages[i].pop())
+            if pages[i]:
+                heapq.heappush(heap, (newest_first(pages[i][-1]), i))
+            else:
+                await next_page(i)
+            if len(merged) == page_size:
+                yield merged
+                merged = []
+        if merged:
+            yield merged
+    finally:
+        for stream in streams:
+            await stream.aclose()
+
+def _batches(ids: List[str]) -> List[List[str]]:
+    return [ids[start:start + EXPORT_FILTER_BATCH_SIZE] for start in range(0, len(ids), EXPORT_FILTER_BATCH_SIZE)]
+
+class ExportScope:
+    """
+    Users (and their portfolios) an export covers, with the lookups used to annotate rows.
+
+    A class-scoped export loads the class up front, since its ids filter the export.
+    An export of every class loads nothing up front; each page looks up the users and
+    portfolios it refers to, keeping at most EXPORT_LOOKUP_CACHE_SIZE of each.
+    """
+
+    def __init__(self, users: List[dict], portfolios: List[dict], class_code: Optional[str]):
+        self.class_code = class_code
+        self.user_ids = [str(user["id"]) for user in users]
+        self.portfolio_ids = [str(row["id"]) for row in portfolios]
+        self.users = TTLCache(maxsize=max(EXPORT_LOOKUP_CACHE_SIZE, len(users)), ttl_seconds=float("inf"))
+        self.portfolios = TTLCache(maxsize=max(EXPORT_LOOKUP_CACHE_SIZE, len(portfolios)), ttl_seconds=float("inf"))
+        for user in users:
+            self.users.set(str(user["id"]), user)
+        for row in portfolios:
+            self.portfolios.set(str(row["id"]), row)
+
+    @classmethod
+    async def load(cls, class_code: Optional[str], with_portfolios: bool) -> "ExportScope":
+        if class_code is None:
+            return cls([], [], None)
+        users = await fetch_all(lambda: supabase.table("users").select("id, email, class_code").eq("class_code", class_code).order("id"))
+        portfolios = []
+        if with_portfolios:
+            for chunk in _batches([str(user["id"]) for user in users]):
+                portfolios += await fetch_all(lambda: supabase.table("portfolios").select("id, user_id").in_("user_id", chunk).order("id"))
+        return cls(users, portfolios, class_code)
+
+    async def _lookup(self, cache: TTLCache, table: str, columns: str, ids: List[str]) -> Dict[str, dict]:
+        """Rows of `table` by id for `ids`; an export of every class fetches the ones it has not seen."""
+        found = {}
+        for row_id in dict.fromkeys(ids):
+            row = cache.get(row_id)
+            if row is not None:
+                found[row_id] = row
+        missing = [row_id for row_id in dict.fromkeys(ids) if row_id not in found]
+        if self.class_code is None and missing:
+            for chunk in _batches(missing):
+                for row in await fetch_all(lambda: supabase.table(table).select(columns).in_("id", chunk).order("id")):
+                    found[str(row["id"])] = row
+                    cache.set(str(row["id"]), row)
+        return found
+
+    async def annotate(self, rows: List[dict], user_ids: List[Optional[str]]) -> List[dict]:
+        """Adds each row's user_id (from `user_ids`), email and class."""
+        users = await self._lookup(self.users, "users", "id, email, class_code", [user_id for user_id in user_ids if user_id])
+        annotated = []
+        for row, user_id in zip(rows, user_ids):
+            user = users.get(user_id or "", {})
+            annotated.append({**row, "user_id": user_id, "email": user.get("email"), "class_code": user.get("class_code")})
+        return annotated
+
+    async def annotate_trades(self, rows: List[dict]) -> List[dict]:
+        portfolios = await self._lookup(self.portfolios, "portfolios", "id, user_id", [str(row["portfolio_id"]) for row in rows])
+        user_ids = [str(portfolios[pid]["user_id"]) if pid in portfolios else None for pid in (str(row["portfolio_id"]) for row in rows)]
+        return await self.annotate(rows, user_ids)
+
+    def filter_chunks(self, ids: List[str]) -> List[Optional[List[str]]]:
+        """`in` filter chunks for a class-scoped export, or [None] (no filter) for all classes."""
+        if self.class_code is None:
+            return [None]
+        return _batches(ids)
+
+def _in_range(query, column: str, start: Optional[datetime], end: Optional[datetime]):
+    if start is not None:
+        query = query.gte(column, start.isoformat())
+    if end is not None:
+        query = query.lt(column, end.isoformat())
+    return query
+
+async def trade_rows(scope: ExportScope, start: Optional[datetime], end: Optional[datetime]) -> AsyncIterator[List[dict]]:
+    """Yields pages of trades (annotated with user, email and class) in scope, newest first."""
+    def build_query(chunk: Optional[List[str]]):
+        query = supabase.table("trades").select("id, portfolio_id, symbol, quantity, price, side, executed_at")
+        if chunk is not None:
+            query = query.in_("portfolio_id", chunk)
+        return _in_range(query, "executed_at", start, end)
+
+    streams = [_pages(lambda chunk=chunk: build_query(chunk), "executed_at") for chunk in scope.filter_chunks(scope.portfolio_ids)]
+    async for rows in _merged_pages(streams, "executed_at"):
+        yield await scope.annotate_trades(rows)
+
+async def chatbot_rows(scope: ExportScope, start: Optional[datetime], end: Optional[datetime]) -> AsyncIterator[List[dict]]:
+    """Yields pages of chatbot interactions (annotated with email and class) in scope, newest first."""
+    def build_query(chunk: Optional[List[str]]):
+        query = supabase.table("chatbot_interactions").select("id, user_id, query, response, feedback, interaction_at")
+        if chunk is not None:
+            query = query.in_("user_id", chunk)
+        return _in_range(query, "interaction_at", start, end)
+
+    streams = [_pages(lambda chunk=chunk: build_query(chunk), "interaction_at") for chunk in scope.filter_chunks(scope.user_ids)]
+    async for rows in _merged_pages(streams, "interaction_at"):
+        yield await scope.annotate(rows, [str(row["user_id"]) for row in rows])
+
+async def stream_csv(pages: AsyncIterator[List[dict]], columns: List[str]) -> AsyncIterator[bytes]:
+    """Encodes pages of rows as CSV, one chunk per page."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    async for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the generator streaming them."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+_PARQUET_TYPES = {
+    "quantity": "int64",
+    "price": "float64",
+    "feedback": "int64",
+}
+_PARQUET_TIMESTAMPS = {"executed_at", "interaction_at"}
+
+def _parquet_schema(columns: List[str]):
+    import pyarrow as pa
+
+    fields = []
+    for column in columns:
+        if column in _PARQUET_TIMESTAMPS:
+            fields.append(pa.field(column, pa.timestamp("us", tz="UTC")))
+        else:
+            fields.append(pa.field(column, getattr(pa, _PARQUET_TYPES.get(column, "string"))()))
+    return pa.schema(fields)
+
+def _parquet_table(rows: List[dict], schema):
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_timestamp(field.type):
+            arrays.append(pa.array(values, pa.string()).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+async def stream_parquet(pages: AsyncIterator[List[dict]], columns: List[str]) -> AsyncIterator[bytes]:
+    """Encodes pages of rows as a Parquet file, flushing one row group every EXPORT_ROW_GROUP_SIZE rows."""
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    buffered: List[dict] = []
+    try:
+        async for rows in pages:
+            buffered.extend(rows)
+            if len(buffered) >= EXPORT_ROW_GROUP_SIZE:
+                writer.write_table(_parquet_table(buffered, schema))
+                buffered = []
+                yield sink.drain()
+        if buffered:
+            writer.write_table(_parquet_table(buffered, schema))
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from .database import fetch_all, supabase
+from .market_simulator import PriceEngine, market
+from .models import LeaderboardEntry, LeaderboardRank, TradeInDB
+from .serialization import model_columns
+from .valuation import HoldingsBook
+
+logger = logging.getLogger(__name__)
+
+# Minimum time between re-ranking every portfolio at current prices
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", 5))
+# Full reload from Supabase, picking up new portfolios and correcting any drift
+LEADERBOARD_RELOAD_SECONDS = float(os.getenv("LEADERBOARD_RELOAD_SECONDS", 300))
+# Trades made through other workers are polled at each re-rank; each poll reaches this far
+# behind the previous one, for trades committed after it with an earlier executed_at
+LEADERBOARD_TRADE_POLL_OVERLAP_SECONDS = float(os.getenv("LEADERBOARD_TRADE_POLL_OVERLAP_SECONDS", 10))
+
+class RankedBoard:
+    """
+    Portfolio slots sorted by value, highest first.
+
+    Values are kept negated in an ascending array, so rank lookups and the position
+    of an entry are binary searches. Moving one entry after a trade shifts the entries
+    between its old and new position by one place, in place (a memmove, no
+    reallocation): a trade usually moves a portfolio a few places, and this avoids a
+    sorted-container dependency for a board that is rebuilt at every refresh anyway.
+    """
+
+    def __init__(self, slots: np.ndarray, values: np.ndarray):
+        order = np.argsort(-values, kind="stable")
+        self.slots = slots[order]
+        self._keys = -values[order]
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def rank(self, value: float) -> int:
+        """1-based rank of `value`; equal values share a rank."""
+        return int(np.searchsorted(self._keys, -value, side="left")) + 1
+
+    def top(self, n: int):
+        """Returns the slots and values of the `n` highest entries."""
+        return self.slots[:n], -self._keys[:n]
+
+    def update(self, slot: int, old_value: float, new_value: float) -> None:
+        """Moves `slot` from `old_value` to `new_value` (inserting it if absent)."""
+        start = np.searchsorted(self._keys, -old_value, side="left")
+        end = np.searchsorted(self._keys, -old_value, side="right")
+        hits = np.flatnonzero(self.slots[start:end] == slot)
+        position = int(np.searchsorted(self._keys, -new_value, side="right"))
+        if not len(hits):
+            self.slots = np.insert(self.slots, position, slot)
+            self._keys = np.insert(self._keys, position, -new_value)
+            return
+        old = int(start + hits[0])
+        if position > old:
+            # The entry moves down: the ones it passes move up one place
+            position -= 1
+            self.slots[old:position] = self.slots[old + 1:position + 1]
+            self._keys[old:position] = self._keys[old + 1:position + 1]
+        elif position < old:
+            self.slots[position + 1:old + 1] = self.slots[position:old]
+            self._keys[position + 1:old + 1] = self._keys[position:old]
+        self.slots[position] = slot
+        self._keys[position] = -new_value
+
+class Leaderboard:
+    """
+    Ranks every portfolio by total value, overall and per class.
+
+    Portfolios live in a HoldingsBook. Each refresh values all of them in one
+    vectorized pass and re-sorts the boards; between refreshes, fills reported by
+    `apply_trade` move only the affected portfolio. Before each refresh, trades made
+    through other workers are read back from the trades table (`sync_trades`), so
+    every worker ranks the same trades within about LEADERBOARD_REFRESH_SECONDS.
+    Portfolios created since the last reload appear after the next one.
+    """
+
+    def __init__(self, engine: PriceEngine = market):
+        self.engine = engine
+        self.book: Optional[HoldingsBook] = None
+        self.user_ids: List[str] = []
+        self.class_codes: List[Optional[str]] = []
+        self.slot_by_user: Dict[str, int] = {}
+        self.values = np.empty(0)
+        self.boards: Dict[Optional[str], RankedBoard] = {}
+        self.refreshed_at = 0.0
+        self.loaded_at = 0.0
+        self._load_task: Optional[asyncio.Task] = None
+        # Trades already in the book, by id, with their executed_at; polls skip these
+        self._applied_trades: Dict[str, datetime] = {}
+        self._trades_since: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.book is not None
+
+    async def load(self) -> None:
+        """Reads every portfolio, holding and class code from Supabase and re-ranks."""
+        started = datetime.now(timezone.utc)
+        portfolio_rows = await fetch_all(lambda: supabase.table("portfolios").select("id, user_id, balance").order("id"))
+        holding_rows = await fetch_all(lambda: supabase.table("holdings").select("portfolio_id, symbol, quantity").order("portfolio_id").order("symbol"))
+        user_rows = await fetch_all(lambda: supabase.table("users").select("id, class_code").order("id"))
+        # Recent trades are already in the holdings just read; a trade committed while
+        # loading may be counted twice or missed until the next reload
+        recent = await self._trades_after(started - timedelta(seconds=LEADERBOARD_TRADE_POLL_OVERLAP_SECONDS))
+
+        class_by_user = {str(row["id"]): row.get("class_code") for row in user_rows}
+        self.book = HoldingsBook.from_rows(portfolio_rows, holding_rows, self.engine)
+        self.user_ids = [str(row["user_id"]) for row in portfolio_rows]
+        self.class_codes = [class_by_user.get(user_id) for user_id in self.user_ids]
+        self.slot_by_user = {}
+        for slot, user_id in enumerate(self.user_ids):
+            self.slot_by_user.setdefault(user_id, slot)
+        self._applied_trades = {str(trade.id): trade.executed_at for trade in recent}
+        self._trades_since = started
+        self.loaded_at = time.monotonic()
+        self.refresh(self.engine.prices)
+
+    async def _trades_after(self, since: datetime) -> List[TradeInDB]:
+        rows = await fetch_all(
+            lambda: supabase.table("trades").select(model_columns(TradeInDB)).gt("executed_at", since.isoformat()).order("executed_at").order("id")
+        )
+        return [TradeInDB(**row) for row in rows]
+
+    async def sync_trades(self) -> None:
+        """Applies trades made through other workers since the previous poll."""
+        if not self.ready:
+            return
+        polled_at = datetime.now(timezone.utc)
+        try:
+            trades = await self._trades_after(self._trades_since - timedelta(seconds=LEADERBOARD_TRADE_POLL_OVERLAP_SECONDS))
+        except Exception:
+            logger.exception("Polling for new trades failed")
+            return
+        for trade in trades:
+            self.apply_trade(trade)
+        self._trades_since = polled_at
+        # Ids only need remembering while a later poll can still return them (with margin for clock skew)
+        cutoff = polled_at - timedelta(seconds=2 * LEADERBOARD_TRADE_POLL_OVERLAP_SECONDS)
+        self._applied_trades = {trade_id: at for trade_id, at in self._applied_trades.items() if at > cutoff}
+
+    def refresh(self, prices: np.ndarray) -> None:
+        """Values every portfolio at `prices` and rebuilds the overall and per-class boards."""
+        self.values = self.book.values(prices)
+        slots = np.arange(len(self.values))
+        boards = {None: RankedBoard(slots, self.values)}
+        members: Dict[str, List[int]] = {}
+        for slot, class_code in enumerate(self.class_codes):
+            if class_code is not None:
+                members.setdefault(class_code, []).append(slot)
+        for class_code, class_slots in members.items():
+            class_slots = np.array(class_slots, dtype=np.intp)
+            boards[class_code] = RankedBoard(class_slots, self.values[class_slots])
+        self.boards = boards
+        self.refreshed_at = time.monotonic()
+
+    async def _load_logged(self) -> None:
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Leaderboard load failed")
+
+    async def ensure_fresh(self) -> None:
+        """
+        Loads on first use, then reloads or re-ranks when the current ranking is stale.
+
+        Raises:
+            HTTPException: 503 if the leaderboard has never been loaded and loading fails.
+        """
+        now = time.monotonic()
+        if not self.ready or now - self.loaded_at >= LEADERBOARD_RELOAD_SECONDS:
+            # Concurrent callers share one load; a failed reload is retried after the next interval
+            if self._load_task is None or self._load_task.done():
+                self.loaded_at = now
+                self._load_task = asyncio.create_task(self._load_logged(), name="leaderboard-load")
+            if not self.ready:
+                await asyncio.shield(self._load_task)
+                if not self.ready:
+                    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Leaderboard is unavailable")
+                return
+        if now - self.refreshed_at >= LEADERBOARD_REFRESH_SECONDS:
+            self.refreshed_at = now
+            await self.sync_trades()
+            self.refresh(self.engine.prices)
+
+    async def on_tick(self, prices: np.ndarray) -> None:
+        """Scheduler tick listener; re-ranks at most every LEADERBOARD_REFRESH_SECONDS."""
+        if self.ready and time.monotonic() - self.refreshed_at >= LEADERBOARD_REFRESH_SECONDS:
+            self.refreshed_at = time.monotonic()
+            await self.sync_trades()
+            self.refresh(prices)
+
+    def apply_trade(self, trade: TradeInDB) -> None:
+        """Moves the traded portfolio to its new position on its boards (once per trade)."""
+        if not self.ready or str(trade.id) in self._applied_trades:
+            return
+        self._applied_trades[str(trade.id)] = trade.executed_at
+        slot = self.book.portfolio_index.get(str(trade.portfolio_id))
+        if slot is None:
+            return
+        sign = 1 if trade.side == "BUY" else -1
+        symbol = self.engine.add_symbol(trade.symbol)
+        self.book.apply_trade(slot, symbol, sign * trade.quantity, -sign * trade.quantity * trade.price)
+
+        old_value = float(self.values[slot])
+        new_value = self.book.value_of(slot, self.engine.prices)
+        for scope in (None, self.class_codes[slot]):
+            board = self.boards.get(scope)
+            if board is not None:
+                board.update(slot, old_value, new_value)
+        self.values[slot] = new_value
+
+    def top(self, limit: int, class_code: Optional[str] = None) -> List[LeaderboardEntry]:
+        """Returns the `limit` most valuable portfolios in scope."""
+        board = self.boards.get(class_code)
+        if board is None:
+            return []
+        slots, values = board.top(limit)
+        return [
+            LeaderboardEntry(
+                rank=board.rank(value),
+                user_id=self.user_ids[slot],
+                portfolio_id=self.book.portfolio_ids[slot],
+                total_value=round(value, 2),
+            )
+            for slot, value in zip(slots.tolist(), values.tolist())
+        ]
+
+    def rank_of(self, user_id, class_code: Optional[str] = None) -> Optional[LeaderboardRank]:
+        """Returns the rank of `user_id`'s portfolio in scope, or None if it is not ranked there."""
+        slot = self.slot_by_user.get(str(user_id))
+        board = self.boards.get(class_code)
+        if slot is None or board is None or (class_code is not None and self.class_codes[slot] != class_code):
+            return None
+        value = float(self.values[slot])
+        return LeaderboardRank(
+            rank=board.rank(value),
+            total_value=round(value, 2),
+            portfolios=len(board),
+            class_code=class_code,
+        )
+
+# Shared leaderboard used by the API
+leaderboard = Leaderboard()
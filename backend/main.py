@@ -1,23 +1,73 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from uuid import UUID
-from typing import List
-from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
 
-from .database import supabase
+from .database import close_supabase, execute, fetch_all, shutdown_executor, supabase
 from .models import (
-    UserCreate, UserInDB, Token, PortfolioBase, PortfolioInDB, 
-    TradeBase, TradeInDB, MarketEventInDB, ChatbotInteractionBase, 
+    UserCreate, UserInDB, UserRoleUpdate, RosterImportResult, Token, PortfolioBase, PortfolioInDB, PortfolioPerformance, 
+    TradeBase, TradeInDB, TradeBatchResult, OrderBase, OrderInDB, LeaderboardEntry, LeaderboardRank, MarketEventInDB, PriceHistory, ReplayStart, ReplayControl, ReplayStatus, ChatbotInteractionBase, 
     ChatbotInteractionInDB, WebinarBase, WebinarInDB
 )
-from .auth import get_password_hash, verify_password, create_access_token, get_current_user, get_current_active_user, get_current_admin_user, get_current_instructor_user, get_current_student_user
-from .market_simulator import simulate_trade_execution, calculate_portfolio_value # Placeholder
-from .chatbot import get_chatbot_response # Placeholder
+from .auth import auth_cache_stats, password_hash_pending, get_password_hash_async, verify_password_async, shutdown_hash_executor, create_access_token, invalidate_user, watch_user_changes, get_current_user, get_current_active_user, get_current_admin_user, get_current_instructor_user, get_current_student_user
+from .scheduler import MARKET_SCHEDULER_ENABLED, scheduler
+from .valuation import revalue_all_portfolios
+from .replay import ScenarioReplay, load_scenario, precompute_session
+from .leaderboard import leaderboard
+from .analytics import cached_performance, compute_performance, invalidate_performance, performance_cache, store_performance
+from .orders import order_book, order_matcher
+from .streaming import market_stream
+from .roster import import_roster, parse_roster
+from .export import CHATBOT_EXPORT_COLUMNS, EXPORT_FORMATS, TRADE_EXPORT_COLUMNS, ExportScope, chatbot_rows, parquet_available, stream_csv, stream_parquet, trade_rows
+from .trading import TRADE_BATCH_MAX_SIZE, execute_trade_atomic, execute_trade_batch_atomic
+from .market_simulator import bar_recorder, market, price_history
+from .price_history import PRICE_HISTORY_BAR_SECONDS, downsample
+from .chatbot import FALLBACK_RESPONSE, IncompleteResponseError, response_cache as chatbot_response_cache, close_client as close_openai_client, get_chatbot_response, stream_chatbot_response
+from .startup import STARTUP_PREWARM, prewarm
+from .conversation import conversation_memory
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, keyset_page, page_response, select_columns, split_page
+from .shared_cache import cached_json_response, global_list_cache
+from .serialization import FAST_SERIALIZATION_ENABLED
+from .metrics import METRICS_TOKEN, PROFILER_ENABLED, Gauge, MetricsMiddleware, monitor_event_loop_lag, profiler, registry
+
+# Largest number of bars in one history response; without an interval, one is picked to fit
+MAX_HISTORY_POINTS = 2000
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag(), name="event-loop-lag")
+    # Role changes made through other workers reach this worker's user cache
+    user_watcher = asyncio.create_task(watch_user_changes(), name="auth-invalidation")
+    if PROFILER_ENABLED:
+        profiler.start()
+    if MARKET_SCHEDULER_ENABLED:
+        scheduler.start()
+    if STARTUP_PREWARM:
+        # Clients and slow imports load in the background while the worker is already serving
+        asyncio.create_task(asyncio.to_thread(prewarm), name="prewarm")
+    yield
+    await scheduler.stop()
+    await close_openai_client()
+    lag_monitor.cancel()
+    user_watcher.cancel()
+    profiler.stop()
+    # Persist the partially filled price bar
+    bar_recorder.flush(bar_recorder.pending())
+    # Let in-flight Supabase calls and password hashes finish before the worker exits
+    shutdown_executor()
+    shutdown_hash_executor()
+    close_supabase()
 
 app = FastAPI(
     title="FinLit API",
     description="Backend API for the FinLit financial literacy application.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS Middleware for frontend communication
@@ -32,42 +82,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Per-route latency histograms (outermost, so it times the whole request)
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to FinLit API!"}
 
+# --- Metrics Endpoints ---
+
+def collect_cache_stats() -> Dict[tuple, float]:
+    """Reads the hit/miss counters of the in-process caches at scrape time."""
+    caches = {
+        "auth_tokens": auth_cache_stats()["tokens"],
+        "auth_users": auth_cache_stats()["users"],
+        "chatbot_responses": chatbot_response_cache.stats(),
+        "global_lists": global_list_cache.stats(),
+        "portfolio_performance": performance_cache.stats(),
+    }
+    return {(cache, stat): value for cache, stats in caches.items() for stat, value in stats.items()}
+
+registry.register(Gauge("finlit_cache_stats", "Counters and sizes of in-process caches.", ("cache", "stat"), function=collect_cache_stats))
+registry.register(Gauge("finlit_password_hash_pending", "bcrypt calls queued or running.", function=lambda: {(): password_hash_pending()}))
+registry.register(Gauge("finlit_stream_connections", "Open market WebSocket connections.", function=lambda: {(): len(market_stream)}))
+registry.register(Gauge("finlit_open_orders", "Resting orders in the matching engine.", function=lambda: {(): len(order_book)}))
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Metrics"])
+async def get_metrics(request: Request):
+    # Prometheus text format; protected by METRICS_TOKEN when it is set
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/profile", tags=["Metrics"])
+async def get_profile(limit: int = Query(50, ge=1, le=500), current_user: UserInDB = Depends(get_current_admin_user)):
+    # Collapsed stacks sampled from the event loop thread (enable with PROFILER_ENABLED=true)
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is not enabled")
+    return profiler.top(limit)
+
 # --- Authentication Endpoints ---
 
 @app.post("/signup", response_model=UserInDB, tags=["Auth"])
 async def signup_user(user_data: UserCreate):
     # Check if user already exists
-    response = supabase.table("users").select("id").eq("email", user_data.email).execute()
+    response = await execute(supabase.table("users").select("id").eq("email", user_data.email))
     if response.data:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user_dict = user_data.model_dump()
     user_dict["password_hash"] = hashed_password
     del user_dict["password"]
 
-    response = supabase.table("users").insert(user_dict).execute()
+    response = await execute(supabase.table("users").insert(user_dict))
     if response.data:
         new_user = UserInDB(**response.data[0])
         # Create a default portfolio for new students
         if new_user.role == 'student':
             portfolio_data = PortfolioBase(user_id=new_user.id)
-            supabase.table("portfolios").insert(portfolio_data.model_dump()).execute()
+            await execute(supabase.table("portfolios").insert(portfolio_data.model_dump(mode="json")))
         return new_user
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User registration failed")
 
 @app.post("/token", response_model=Token, tags=["Auth"])
 async def login_for_access_token(form_data: UserCreate):
-    response = supabase.table("users").select("id, email, password_hash, role").eq("email", form_data.email).single().execute()
+    response = await execute(supabase.table("users").select("id, email, password_hash, role").eq("email", form_data.email).single())
     user_data = response.data
 
-    if not user_data or not verify_password(form_data.password, user_data["password_hash"]):
+    if not user_data or not await verify_password_async(form_data.password, user_data["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -85,6 +171,22 @@ async def login_for_access_token(form_data: UserCreate):
 async def read_users_me(current_user: UserInDB = Depends(get_current_active_user)):
     return current_user
 
+@app.patch("/users/{user_id}/role", response_model=UserInDB, tags=["Auth"])
+async def update_user_role(user_id: UUID, role_data: UserRoleUpdate, current_user: UserInDB = Depends(get_current_admin_user)):
+    response = await execute(supabase.table("users").update({"role": role_data.role}).eq("id", user_id))
+    if not response.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    # Cached users carry their role, so drop the stale entry here; other workers
+    # evict it on their next watch_user_changes poll
+    invalidate_user(user_id)
+    return UserInDB(**response.data[0])
+
+@app.post("/users/import", response_model=List[RosterImportResult], tags=["Auth"])
+async def import_users(request: Request, class_code: Optional[str] = Query(None, max_length=32), current_user: UserInDB = Depends(get_current_instructor_user)):
+    # Body is a CSV (email,password[,role][,class_code]) or JSON roster; class_code applies to rows without one
+    rows = parse_roster(await request.body(), request.headers.get("content-type", ""))
+    return await import_roster(rows, default_class_code=class_code, allow_instructors=current_user.role == 'admin')
+
 # --- Portfolio Endpoints ---
 
 @app.get("/portfolios/{user_id}", response_model=PortfolioInDB, tags=["Portfolio"])
@@ -92,96 +194,403 @@ async def get_portfolio(user_id: UUID, current_user: UserInDB = Depends(get_curr
     if current_user.id != user_id and current_user.role != 'admin':
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this portfolio")
     
-    response = supabase.table("portfolios").select("*").eq("user_id", user_id).single().execute()
+    response = await execute(supabase.table("portfolios").select("*").eq("user_id", user_id).single())
     if not response.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found")
     return PortfolioInDB(**response.data)
 
+@app.post("/portfolios/revalue", tags=["Portfolio"])
+async def revalue_portfolios(current_user: UserInDB = Depends(get_current_instructor_user)):
+    # Values every portfolio against current simulated prices and stores total_value
+    return await revalue_all_portfolios()
+
+@app.get("/portfolios/{portfolio_id}/performance", response_model=PortfolioPerformance, tags=["Portfolio"])
+async def get_portfolio_performance(
+    portfolio_id: UUID,
+    interval_seconds: Optional[int] = Query(None, ge=PRICE_HISTORY_BAR_SECONDS),
+    current_user: UserInDB = Depends(get_current_student_user),
+):
+    portfolio_response = await execute(supabase.table("portfolios").select("user_id, balance").eq("id", portfolio_id).limit(1))
+    if not portfolio_response.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found")
+    portfolio = portfolio_response.data[0]
+    if portfolio["user_id"] != str(current_user.id) and current_user.role != 'admin':
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view this portfolio")
+    if interval_seconds is not None and interval_seconds % PRICE_HISTORY_BAR_SECONDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"interval_seconds must be a multiple of {PRICE_HISTORY_BAR_SECONDS}")
+
+    # Cached per portfolio until its next trade
+    performance = cached_performance(portfolio_id, interval_seconds)
+    if performance is None:
+        trade_rows = await fetch_all(lambda: supabase.table("trades").select("symbol, quantity, price, side, executed_at").eq("portfolio_id", portfolio_id).order("executed_at").order("id"))
+        performance = await asyncio.to_thread(compute_performance, portfolio_id, float(portfolio["balance"]), trade_rows, interval_seconds)
+        store_performance(portfolio_id, interval_seconds, performance)
+    return performance
+
 # --- Trade Endpoints ---
 
+def check_symbols(symbols: List[str]) -> None:
+    """Rejects symbols the simulated market does not list, so user input never grows the universe."""
+    unknown = market.unknown_symbols(symbols)
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown symbols: {', '.join(sorted(set(unknown)))}")
+
 @app.post("/trades", response_model=TradeInDB, tags=["Trade"])
 async def execute_trade(trade_data: TradeBase, current_user: UserInDB = Depends(get_current_student_user)):
-    # Verify portfolio ownership
-    portfolio_response = supabase.table("portfolios").select("user_id, balance").eq("id", trade_data.portfolio_id).single().execute()
-    if not portfolio_response.data:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found")
-    
-    if portfolio_response.data["user_id"] != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to trade for this portfolio")
-    
-    portfolio_balance = portfolio_response.data["balance"]
-    trade_cost = trade_data.quantity * trade_data.price
-
-    if trade_data.side == 'BUY':
-        if portfolio_balance < trade_cost:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance for this trade")
-        new_balance = portfolio_balance - trade_cost
-    elif trade_data.side == 'SELL':
-        # In a real app, you'd check if the user holds enough of the stock
-        # For simplicity, we'll allow selling without checking holdings for now.
-        new_balance = portfolio_balance + trade_cost
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid trade side")
-    
-    # Simulate trade execution and update portfolio (simplified)
-    # In a real system, this would involve more complex market simulation and holdings update.
-    updated_portfolio = supabase.table("portfolios").update({"balance": new_balance}).eq("id", trade_data.portfolio_id).execute()
-    
-    trade_dict = trade_data.model_dump()
-    response = supabase.table("trades").insert(trade_dict).execute()
-    if response.data:
-        return TradeInDB(**response.data[0])
-    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Trade execution failed")
+    check_symbols([trade_data.symbol])
+    # Ownership, balance/holdings checks, portfolio and holdings updates, and the trade
+    # insert all happen in the execute_trade database function (one round-trip, one transaction)
+    trade = await execute_trade_atomic(current_user.id, trade_data)
+    leaderboard.apply_trade(trade)
+    invalidate_performance(trade.portfolio_id)
+    return trade
+
+@app.post("/trades/batch", response_model=List[TradeBatchResult], tags=["Trade"])
+async def execute_trade_batch(orders: List[TradeBase], current_user: UserInDB = Depends(get_current_student_user)):
+    if not orders:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No orders submitted")
+    if len(orders) > TRADE_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"A batch may contain at most {TRADE_BATCH_MAX_SIZE} orders")
+    check_symbols([order.symbol for order in orders])
+    # Orders may span several portfolios; ownership is checked per order inside the database
+    results = await execute_trade_batch_atomic(current_user.id, orders)
+    for result in results:
+        if result.trade is not None:
+            leaderboard.apply_trade(result.trade)
+            invalidate_performance(result.trade.portfolio_id)
+    return results
 
 @app.get("/portfolios/{portfolio_id}/trades", response_model=List[TradeInDB], tags=["Trade"])
-async def get_portfolio_trades(portfolio_id: UUID, current_user: UserInDB = Depends(get_current_student_user)):
+async def get_portfolio_trades(
+    portfolio_id: UUID,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_student_user),
+):
     # Verify portfolio ownership
-    portfolio_response = supabase.table("portfolios").select("user_id").eq("id", portfolio_id).single().execute()
+    portfolio_response = await execute(supabase.table("portfolios").select("user_id").eq("id", portfolio_id).single())
     if not portfolio_response.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found")
     
-    if portfolio_response.data["user_id"] != current_user.id and current_user.role != 'admin':
+    if portfolio_response.data["user_id"] != str(current_user.id) and current_user.role != 'admin':
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view these trades")
     
-    response = supabase.table("trades").select("*").eq("portfolio_id", portfolio_id).order("executed_at", desc=True).limit(50).execute()
-    return [TradeInDB(**trade) for trade in response.data]
+    # Keyset pagination: pass the X-Next-Cursor header of one page as `before` to get the next
+    # Rows come straight from the trades table, so they are served without re-validation
+    query = supabase.table("trades").select(select_columns(fields, TradeInDB, "executed_at", trusted=True)).eq("portfolio_id", portfolio_id)
+    trades = await execute(keyset_page(query, "executed_at", before, limit))
+    return page_response(trades.data, limit, "executed_at", TradeInDB, bool(fields), response, trusted=True)
+
+# --- Order Endpoints ---
+
+@app.post("/orders", response_model=OrderInDB, tags=["Trade"])
+async def place_order(order_data: OrderBase, current_user: UserInDB = Depends(get_current_student_user)):
+    check_symbols([order_data.symbol])
+    portfolio_response = await execute(supabase.table("portfolios").select("user_id").eq("id", order_data.portfolio_id).limit(1))
+    if not portfolio_response.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio not found")
+    if portfolio_response.data[0]["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to trade for this portfolio")
+
+    order_dict = order_data.model_dump(mode="json")
+    order_dict["user_id"] = str(current_user.id)
+    response = await execute(supabase.table("orders").insert(order_dict))
+    if not response.data:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Order placement failed")
+    # Rests in the matching engine until a price tick crosses it
+    order = OrderInDB(**response.data[0])
+    order_matcher.add(order)
+    return order
+
+@app.get("/orders", response_model=List[OrderInDB], tags=["Trade"])
+async def get_orders(
+    response: Response,
+    order_status: Optional[str] = Query(None, alias="status", pattern="^(open|filled|cancelled|rejected)$"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_student_user),
+):
+    query = supabase.table("orders").select(select_columns(fields, OrderInDB, "created_at", trusted=True)).eq("user_id", current_user.id)
+    if order_status:
+        query = query.eq("status", order_status)
+    orders = await execute(keyset_page(query, "created_at", before, limit))
+    return page_response(orders.data, limit, "created_at", OrderInDB, bool(fields), response, trusted=True)
+
+@app.delete("/orders/{order_id}", response_model=OrderInDB, tags=["Trade"])
+async def cancel_order(order_id: UUID, current_user: UserInDB = Depends(get_current_student_user)):
+    response = await execute(
+        supabase.table("orders").update({"status": "cancelled"})
+        .eq("id", order_id).eq("user_id", current_user.id).eq("status", "open")
+    )
+    if not response.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Open order not found")
+    order_matcher.cancel(order_id)
+    return OrderInDB(**response.data[0])
+
+# --- Leaderboard Endpoints ---
+
+@app.get("/leaderboard", response_model=List[LeaderboardEntry], tags=["Leaderboard"])
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    class_code: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    # Ranked in memory; omit class_code for the ranking across all classes
+    await leaderboard.ensure_fresh()
+    return leaderboard.top(limit, class_code)
+
+@app.get("/leaderboard/me", response_model=LeaderboardRank, tags=["Leaderboard"])
+async def get_my_rank(class_code: Optional[str] = None, current_user: UserInDB = Depends(get_current_student_user)):
+    await leaderboard.ensure_fresh()
+    rank = leaderboard.rank_of(current_user.id, class_code)
+    if rank is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Portfolio is not ranked yet")
+    return rank
 
 # --- Market Simulation Endpoints ---
 
 @app.get("/market-events", response_model=List[MarketEventInDB], tags=["Market Simulation"])
-async def get_market_events(current_user: UserInDB = Depends(get_current_active_user)):
-    # This endpoint is accessible to any logged-in user
-    response = supabase.table("market_events").select("*").order("event_date", desc=True).limit(20).execute()
-    return [MarketEventInDB(**event) for event in response.data]
+async def get_market_events(request: Request, current_user: UserInDB = Depends(get_current_active_user)):
+    # This endpoint is accessible to any logged-in user; every user sees the same list,
+    # so it is served from the shared response cache
+    async def load():
+        columns = select_columns(None, MarketEventInDB, "event_date", trusted=True)
+        response = await execute(supabase.table("market_events").select(columns).order("event_date", desc=True).limit(20))
+        return (response.data if FAST_SERIALIZATION_ENABLED else [MarketEventInDB(**event) for event in response.data]), {}
+
+    return await cached_json_response(request, global_list_cache, "market_events", load, trusted=FAST_SERIALIZATION_ENABLED)
+
+@app.post("/market-events", response_model=MarketEventInDB, tags=["Market Simulation"])
+async def trigger_market_event(current_user: UserInDB = Depends(get_current_instructor_user)):
+    # Generates an event now; the worker producing the market applies it to simulated prices
+    if scheduler.replay is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A scenario replay is running; stop it before triggering events")
+    event = await scheduler.trigger_event()
+    if event is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Market event creation failed")
+    return MarketEventInDB(**event)
+
+@app.get("/market/prices", response_model=Dict[str, float], tags=["Market Simulation"])
+async def get_market_prices(symbols: str, current_user: UserInDB = Depends(get_current_active_user)):
+    # Comma-separated symbols, e.g. ?symbols=AAPL,MSFT
+    symbol_list = [symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()]
+    if not symbol_list:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No symbols requested")
+    unknown = market.unknown_symbols(symbol_list)
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown symbols: {', '.join(unknown)}")
+    if not scheduler.running:
+        market.advance()
+    prices = market.get_prices(symbol_list)
+    return {symbol: round(float(price), 2) for symbol, price in zip(symbol_list, prices)}
+
+@app.get("/market/replay", response_model=ReplayStatus, tags=["Market Simulation"])
+async def get_replay(current_user: UserInDB = Depends(get_current_active_user)):
+    if scheduler.replay is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No scenario replay is running")
+    return scheduler.replay.status()
+
+@app.post("/market/replay", response_model=ReplayStatus, tags=["Market Simulation"])
+async def start_replay(replay_data: ReplayStart, current_user: UserInDB = Depends(get_current_instructor_user)):
+    # Precomputes the whole scenario, then lets the market producer play it back at `speed`
+    if not scheduler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The market scheduler is not running")
+    scenario = replay_data.scenario
+    if scenario is None:
+        try:
+            scenario = await asyncio.to_thread(load_scenario, replay_data.scenario_name)
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Scenario not found")
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid scenario file: {e}")
+    try:
+        session = await asyncio.to_thread(precompute_session, scenario)
+        # Lists the scenario's symbols in the shared engine, within MARKET_MAX_SYMBOLS, until the replay ends
+        replay = ScenarioReplay(session, market, speed=replay_data.speed, position=replay_data.position_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        await scheduler.set_replay(scheduler.replay_config(replay, seek=True), replay)
+    except Exception:
+        replay.release()
+        raise
+    return replay.status()
+
+@app.patch("/market/replay", response_model=ReplayStatus, tags=["Market Simulation"])
+async def control_replay(control: ReplayControl, current_user: UserInDB = Depends(get_current_instructor_user)):
+    # Change speed, pause/resume, or jump straight to position_seconds
+    if scheduler.replay is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No scenario replay is running")
+    replay = scheduler.replay
+    replay.control(speed=control.speed, position=control.position_seconds, paused=control.paused)
+    await scheduler.set_replay(scheduler.replay_config(replay, seek=control.position_seconds is not None))
+    return replay.status()
+
+@app.delete("/market/replay", response_model=ReplayStatus, tags=["Market Simulation"])
+async def stop_replay(current_user: UserInDB = Depends(get_current_instructor_user)):
+    replay = scheduler.replay
+    if replay is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No scenario replay is running")
+    await scheduler.set_replay(None)
+    return replay.status()
+
+@app.websocket("/ws/market")
+async def market_websocket(websocket: WebSocket, token: str = Query(...)):
+    # postgrest is imported with the Supabase client, on first use
+    from postgrest.exceptions import APIError
+
+    # Browsers cannot set headers on WebSocket requests, so the access token comes in the query string
+    try:
+        current_user = await get_current_user(token)
+    except (HTTPException, APIError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await market_stream.serve(websocket, current_user.id)
+
+@app.get("/market/prices/{symbol}/history", response_model=PriceHistory, tags=["Market Simulation"])
+async def get_price_history(
+    symbol: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    interval_seconds: Optional[int] = None,
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    symbol = symbol.upper()
+    end = end or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+    span = (end - start).total_seconds()
+    if interval_seconds is None:
+        # Smallest whole multiple of the bar width that keeps the response under MAX_HISTORY_POINTS
+        interval_seconds = PRICE_HISTORY_BAR_SECONDS * max(1, int(-(-span // (PRICE_HISTORY_BAR_SECONDS * MAX_HISTORY_POINTS))))
+    elif interval_seconds < PRICE_HISTORY_BAR_SECONDS or interval_seconds % PRICE_HISTORY_BAR_SECONDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"interval_seconds must be a multiple of {PRICE_HISTORY_BAR_SECONDS}")
+    elif span / interval_seconds > MAX_HISTORY_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"The range needs more than {MAX_HISTORY_POINTS} bars at this interval; use a longer interval or a shorter range",
+        )
+
+    try:
+        bars = await asyncio.to_thread(price_history.read, symbol, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if interval_seconds != PRICE_HISTORY_BAR_SECONDS:
+        bars = downsample(bars, interval_seconds)
+    return PriceHistory(
+        symbol=symbol,
+        interval_seconds=interval_seconds,
+        ts=[datetime.fromtimestamp(ts, timezone.utc) for ts in bars["ts"].tolist()],
+        open=bars["open"].tolist(),
+        high=bars["high"].tolist(),
+        low=bars["low"].tolist(),
+        close=bars["close"].tolist(),
+    )
 
 # --- Chatbot Endpoints ---
 
 @app.post("/chatbot/ask", response_model=ChatbotInteractionInDB, tags=["Chatbot"])
 async def ask_chatbot(query: str, current_user: UserInDB = Depends(get_current_active_user)):
-    # Integrate with OpenAI API here
-    response_text = get_chatbot_response(query, current_user.id) # Placeholder function
+    history = await conversation_memory.history(current_user.id)
+    response_text = await get_chatbot_response(query, current_user.id, history)
     
     interaction_data = ChatbotInteractionBase(
         user_id=current_user.id,
         query=query,
         response=response_text
     )
-    response = supabase.table("chatbot_interactions").insert(interaction_data.model_dump()).execute()
+    response = await execute(supabase.table("chatbot_interactions").insert(interaction_data.model_dump(mode="json")))
     if response.data:
-        return ChatbotInteractionInDB(**response.data[0])
+        interaction = ChatbotInteractionInDB(**response.data[0])
+        if response_text != FALLBACK_RESPONSE:
+            conversation_memory.record(current_user.id, query, response_text, interaction.interaction_at)
+        return interaction
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Chatbot interaction failed")
 
+@app.post("/chatbot/ask/stream", tags=["Chatbot"])
+async def ask_chatbot_stream(query: str, current_user: UserInDB = Depends(get_current_active_user)):
+    # Server-sent events: one "data" message per text fragment, then a "done" event
+    # carrying the stored interaction once the completion has finished. An answer cut
+    # off upstream ends with an "error" event instead and is not stored.
+    history = await conversation_memory.history(current_user.id)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in stream_chatbot_response(query, current_user.id, history):
+                parts.append(delta)
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+        except IncompleteResponseError:
+            yield f"event: error\ndata: {json.dumps({'detail': 'The answer was interrupted; please ask again'})}\n\n"
+            return
+
+        interaction_data = ChatbotInteractionBase(
+            user_id=current_user.id,
+            query=query,
+            response="".join(parts).strip()
+        )
+        try:
+            response = await execute(supabase.table("chatbot_interactions").insert(interaction_data.model_dump(mode="json")))
+        except Exception:
+            response = None
+        if response is not None and response.data:
+            interaction = ChatbotInteractionInDB(**response.data[0])
+            if parts != [FALLBACK_RESPONSE]:
+                conversation_memory.record(current_user.id, query, interaction.response, interaction.interaction_at)
+            yield f"event: done\ndata: {interaction.model_dump_json()}\n\n"
+        else:
+            yield f"event: error\ndata: {json.dumps({'detail': 'Chatbot interaction failed'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/chatbot/history", response_model=List[ChatbotInteractionInDB], tags=["Chatbot"])
-async def get_chatbot_history(current_user: UserInDB = Depends(get_current_active_user)):
-    response = supabase.table("chatbot_interactions").select("*").eq("user_id", current_user.id).order("interaction_at", desc=True).limit(50).execute()
-    return [ChatbotInteractionInDB(**interaction) for interaction in response.data]
+async def get_chatbot_history(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    query = supabase.table("chatbot_interactions").select(select_columns(fields, ChatbotInteractionInDB, "interaction_at", trusted=True)).eq("user_id", current_user.id)
+    interactions = await execute(keyset_page(query, "interaction_at", before, limit))
+    return page_response(interactions.data, limit, "interaction_at", ChatbotInteractionInDB, bool(fields), response, trusted=True)
 
 # --- Webinar Endpoints ---
 
 @app.get("/webinars", response_model=List[WebinarInDB], tags=["Webinars"])
-async def get_webinars(current_user: UserInDB = Depends(get_current_active_user)):
-    response = supabase.table("webinars").select("*").order("scheduled_at", desc=True).execute()
-    return [WebinarInDB(**webinar) for webinar in response.data]
+async def get_webinars(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    trusted = bool(fields) or FAST_SERIALIZATION_ENABLED
+    columns = select_columns(fields, WebinarInDB, "scheduled_at", trusted=True)
+
+    async def load():
+        query = supabase.table("webinars").select(columns)
+        webinars = await execute(keyset_page(query, "scheduled_at", before, limit))
+        rows, next_cursor = split_page(webinars.data, limit, "scheduled_at")
+        content = rows if trusted else [WebinarInDB(**webinar) for webinar in rows]
+        return content, ({NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {})
+
+    # Webinars are the same for every user, so each page is served from the shared response cache.
+    # The key is built from validated values only (a decoded cursor, known columns), never raw input.
+    cursor = ",".join(decode_cursor(before)) if before else ""
+    key = f"webinars:{limit}:{cursor}:{','.join(sorted(column.strip() for column in columns.split(',')))}"
+    return await cached_json_response(request, global_list_cache, key, load, trusted=trusted)
 
 @app.post("/webinars", response_model=WebinarInDB, tags=["Webinars"])
 async def create_webinar(webinar_data: WebinarBase, current_user: UserInDB = Depends(get_current_instructor_user)):
@@ -189,7 +598,43 @@ async def create_webinar(webinar_data: WebinarBase, current_user: UserInDB = Dep
     if webinar_data.instructor_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot create webinar for another instructor")
 
-    response = supabase.table("webinars").insert(webinar_data.model_dump()).execute()
+    response = await execute(supabase.table("webinars").insert(webinar_data.model_dump(mode="json")))
     if response.data:
+        await global_list_cache.invalidate("webinars:")
         return WebinarInDB(**response.data[0])
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Webinar creation failed")
+
+# --- Export Endpoints ---
+
+async def export_response(kind: str, format: str, class_code: Optional[str], start: Optional[datetime], end: Optional[datetime]) -> StreamingResponse:
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parquet export requires pyarrow; use format=csv")
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    scope = await ExportScope.load(class_code, with_portfolios=kind == "trades")
+    pages, columns = (trade_rows(scope, start, end), TRADE_EXPORT_COLUMNS) if kind == "trades" else (chatbot_rows(scope, start, end), CHATBOT_EXPORT_COLUMNS)
+    body = stream_parquet(pages, columns) if format == "parquet" else stream_csv(pages, columns)
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{kind}-{class_code}.{extension}" if class_code else f"{kind}.{extension}"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/export/trades", tags=["Export"])
+async def export_trades(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    class_code: Optional[str] = Query(None, max_length=32),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: UserInDB = Depends(get_current_instructor_user),
+):
+    # Streams every trade in scope, newest first, paging through Supabase as the client reads
+    return await export_response("trades", format, class_code, start, end)
+
+@app.get("/export/chatbot-interactions", tags=["Export"])
+async def export_chatbot_interactions(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    class_code: Optional[str] = Query(None, max_length=32),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: UserInDB = Depends(get_current_instructor_user),
+):
+    return await export_response("chatbot-interactions", format, class_code, start, end)
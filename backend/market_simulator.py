@@ -1,51 +1,311 @@
-import pandas as pd
+import os
+import threading
+import time
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict
-from uuid import UUID
+from typing import List, Dict, Optional, Tuple
+
+from .price_history import SYMBOL_PATTERN, BarRecorder, PriceHistoryStore
 
 # Placeholder for market data (e.g., stock prices)
 # In a real application, this would fetch from yfinance or a similar API
 # or be driven by a more complex simulation engine.
 
+# Seed for the simulated market; leave unset for a different market every run
+MARKET_SEED = os.getenv("MARKET_SEED")
+# Upper bound on symbols the shared engine will register (default universe plus scenario symbols)
+MARKET_MAX_SYMBOLS = int(os.getenv("MARKET_MAX_SYMBOLS", 500))
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+SECTORS = ["tech", "finance", "energy", "other"]
+
+# Default symbol universe: symbol -> (sector, starting price)
+DEFAULT_UNIVERSE = {
+    "AAPL": ("tech", 165.00),
+    "GOOG": ("tech", 115.00),
+    "MSFT": ("tech", 275.00),
+    "JPM": ("finance", 150.00),
+    "BAC": ("finance", 35.00),
+    "XOM": ("energy", 110.00),
+    "CVX": ("energy", 155.00),
+}
+
+class PriceEngine:
+    """
+    Simulates prices for a whole symbol universe held in NumPy arrays.
+
+    Prices follow correlated geometric Brownian motion driven by a one-factor market
+    shock, a per-sector shock and idiosyncratic noise, so every tick advances all
+    symbols with a handful of vectorized operations. Looking up a symbol never adds
+    it; symbols are listed through add_symbol, up to `max_symbols` at once, and
+    delisted through remove_symbols. A symbol's index never changes.
+    """
+
+    def __init__(
+        self,
+        universe: Optional[Dict[str, Tuple[str, float]]] = None,
+        drift: float = 0.05,
+        volatility: float = 0.25,
+        market_beta: float = 0.5,
+        sector_beta: float = 0.3,
+        seed: Optional[int] = None,
+        max_symbols: int = MARKET_MAX_SYMBOLS,
+    ):
+        if market_beta ** 2 + sector_beta ** 2 > 1:
+            raise ValueError("market_beta^2 + sector_beta^2 must not exceed 1")
+        self.rng = np.random.default_rng(seed)
+        self.default_drift = drift
+        self.default_volatility = volatility
+        self.market_beta = market_beta
+        self.sector_beta = sector_beta
+        self.idiosyncratic_beta = np.sqrt(1 - market_beta ** 2 - sector_beta ** 2)
+        self.sector_index = {sector: i for i, sector in enumerate(SECTORS)}
+        self.max_symbols = max(max_symbols, len(universe or DEFAULT_UNIVERSE))
+
+        self.symbols: List[str] = []
+        self.symbol_index: Dict[str, int] = {}
+        capacity = max(len(universe or DEFAULT_UNIVERSE), 64)
+        self._prices = np.empty(capacity)
+        self._drift = np.empty(capacity)
+        self._volatility = np.empty(capacity)
+        self._sector_ids = np.empty(capacity, dtype=np.intp)
+        self._listed = np.empty(capacity, dtype=bool)
+        # Delisted symbols keep their index, so anything holding it stays valid
+        self._delisted: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.last_tick = time.monotonic()
+        # While held, advance() leaves prices to an external driver (a scenario replay)
+        self.held = False
+
+        for symbol, (sector, price) in (universe or DEFAULT_UNIVERSE).items():
+            self.add_symbol(symbol, sector, price)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def prices(self) -> np.ndarray:
+        """Latest prices, aligned with `symbols`."""
+        return self._prices[:len(self.symbols)]
+
+    @property
+    def sector_ids(self) -> np.ndarray:
+        """Sector index of each symbol, aligned with `symbols`."""
+        return self._sector_ids[:len(self.symbols)]
+
+    @property
+    def listed(self) -> np.ndarray:
+        """Mask of the symbols that are not delisted, aligned with `symbols`."""
+        return self._listed[:len(self.symbols)]
+
+    def add_symbol(self, symbol: str, sector: str = "other", price: Optional[float] = None) -> int:
+        """
+        Registers a symbol (no-op if already known) and returns its index.
+
+        A delisted symbol is listed again at its old index, from its last price.
+
+        Raises:
+            ValueError: If the symbol is malformed or the universe already holds `max_symbols`.
+        """
+        with self._lock:
+            if symbol in self.symbol_index:
+                return self.symbol_index[symbol]
+            if not SYMBOL_PATTERN.match(symbol):
+                raise ValueError(f"Invalid symbol: {symbol!r}")
+            if len(self.symbol_index) >= self.max_symbols:
+                raise ValueError(f"The market already has {self.max_symbols} symbols")
+            n = self._delisted.pop(symbol, None)
+            if n is None:
+                n = len(self.symbols)
+                if n == len(self._prices):
+                    self._grow(2 * n)
+                self._prices[n] = price if price is not None else self.rng.uniform(10, 50)  # Generic price
+                self.symbols.append(symbol)
+            elif price is not None:
+                self._prices[n] = price
+            self._drift[n] = self.default_drift
+            self._volatility[n] = self.default_volatility
+            self._sector_ids[n] = self.sector_index.get(sector, self.sector_index["other"])
+            self._listed[n] = True
+            self.symbol_index[symbol] = n
+            return n
+
+    def remove_symbols(self, symbols: List[str]) -> None:
+        """
+        Delists `symbols`, making room for others under `max_symbols`.
+
+        Lookups treat a delisted symbol as unknown; its price stops moving, and its
+        index is kept for it alone.
+        """
+        with self._lock:
+            for symbol in symbols:
+                i = self.symbol_index.pop(symbol, None)
+                if i is not None:
+                    self._delisted[symbol] = i
+                    self._drift[i] = self._volatility[i] = 0.0
+                    self._listed[i] = False
+
+    def _grow(self, capacity: int) -> None:
+        for name in ("_prices", "_drift", "_volatility", "_sector_ids", "_listed"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def step(self, dt_seconds: float) -> np.ndarray:
+        """Advances every price by `dt_seconds` of simulated time and returns the new prices."""
+        with self._lock:
+            n = len(self.symbols)
+            if n == 0 or dt_seconds <= 0:
+                return self.prices
+            t = dt_seconds / SECONDS_PER_YEAR
+            market_shock = self.rng.standard_normal()
+            sector_shocks = self.rng.standard_normal(len(SECTORS))
+            shocks = (
+                self.market_beta * market_shock
+                + self.sector_beta * sector_shocks[self._sector_ids[:n]]
+                + self.idiosyncratic_beta * self.rng.standard_normal(n)
+            )
+            drift = self._drift[:n]
+            volatility = self._volatility[:n]
+            log_returns = (drift - 0.5 * volatility ** 2) * t + volatility * np.sqrt(t) * shocks
+            self._prices[:n] *= np.exp(log_returns)
+            return self.prices
+
+    def simulate_log_returns(self, steps: int, dt_seconds: float) -> np.ndarray:
+        """
+        Draws `steps` consecutive ticks of `dt_seconds` for every symbol in one batch.
+
+        Uses the same model as step() without moving the engine's prices; the price
+        path is `prices * exp(cumsum(log_returns, axis=0))`.
+
+        Returns:
+            np.ndarray: A (steps, symbols) array of log returns.
+        """
+        n = len(self.symbols)
+        t = dt_seconds / SECONDS_PER_YEAR
+        market_shocks = self.rng.standard_normal((steps, 1))
+        sector_shocks = self.rng.standard_normal((steps, len(SECTORS)))
+        shocks = (
+            self.market_beta * market_shocks
+            + self.sector_beta * sector_shocks[:, self._sector_ids[:n]]
+            + self.idiosyncratic_beta * self.rng.standard_normal((steps, n))
+        )
+        drift = self._drift[:n]
+        volatility = self._volatility[:n]
+        return (drift - 0.5 * volatility ** 2) * t + volatility * np.sqrt(t) * shocks
+
+    def advance(self, now: Optional[float] = None) -> np.ndarray:
+        """
+        Catches prices up to wall-clock time in one step.
+
+        GBM increments over consecutive intervals combine into a single increment over
+        their sum, so catching up costs the same however long the engine sat idle.
+        """
+        now = time.monotonic() if now is None else now
+        dt_seconds = now - self.last_tick
+        self.last_tick = now
+        if self.held:
+            return self.prices
+        return self.step(dt_seconds)
+
+    def set_prices(self, indices: np.ndarray, prices: np.ndarray) -> None:
+        """Overwrites the prices of the symbols at `indices`."""
+        with self._lock:
+            self._prices[indices] = prices
+
+    def price_index(self, symbol: str) -> Optional[int]:
+        """Index of `symbol`'s price, delisted symbols included (frozen at their last price); None if never listed."""
+        index = self.symbol_index.get(symbol)
+        return self._delisted.get(symbol) if index is None else index
+
+    def unknown_symbols(self, symbols: List[str]) -> List[str]:
+        """Returns the symbols in `symbols` that are not in the universe."""
+        return [symbol for symbol in symbols if symbol not in self.symbol_index]
+
+    def get_price(self, symbol: str) -> float:
+        """
+        Returns the latest price of `symbol` (O(1) lookup).
+
+        Raises:
+            KeyError: If the symbol is not in the universe.
+        """
+        return float(self._prices[self.symbol_index[symbol]])
+
+    def get_prices(self, symbols: List[str]) -> np.ndarray:
+        """
+        Returns the latest prices of `symbols` as an array, in the given order.
+
+        Raises:
+            KeyError: If any symbol is not in the universe.
+        """
+        indices = [self.symbol_index[symbol] for symbol in symbols]
+        return self._prices[np.asarray(indices, dtype=np.intp)]
+
+    def apply_shock(self, sectors: List[str], price_change: float) -> int:
+        """
+        Moves every symbol in `sectors` ("all" for the whole universe) by `price_change`.
+
+        Returns:
+            int: The number of symbols affected.
+        """
+        with self._lock:
+            n = len(self.symbols)
+            mask = self.sector_mask(sectors)
+            self._prices[:n] *= np.where(mask, 1.0 + price_change, 1.0)
+            return int(mask.sum())
+
+    def sector_mask(self, sectors: List[str]) -> np.ndarray:
+        """Boolean mask of the listed symbols in `sectors` ("all" for the whole universe)."""
+        if "all" in sectors:
+            return self.listed.copy()
+        sector_ids = [self.sector_index[sector] for sector in sectors if sector in self.sector_index]
+        return np.isin(self.sector_ids, sector_ids) & self.listed
+
+# Shared engine used by the API
+market = PriceEngine(seed=int(MARKET_SEED) if MARKET_SEED else None)
+
+# On-disk OHLC history of the shared engine, fed by the market scheduler
+price_history = PriceHistoryStore()
+bar_recorder = BarRecorder(price_history)
+
 def get_current_price(symbol: str) -> float:
-    # Simulate varying prices for demonstration
-    if symbol == "AAPL":
-        return round(np.random.uniform(150, 180), 2)
-    elif symbol == "GOOG":
-        return round(np.random.uniform(100, 130), 2)
-    elif symbol == "MSFT":
-        return round(np.random.uniform(250, 300), 2)
-    else:
-        return round(np.random.uniform(10, 50), 2) # Generic price
-
-def simulate_trade_execution(portfolio_id: UUID, symbol: str, quantity: int, side: str) -> bool:
-    """Simulates the execution of a trade."""
-    # In a real scenario, this would involve checking market liquidity, slippage, etc.
-    print(f"Simulating {side} of {quantity} {symbol} for portfolio {portfolio_id}")
-    # For now, just return True for successful simulation
-    return True
+    """Returns the current simulated price of `symbol`."""
+    market.advance()
+    return round(market.get_price(symbol), 2)
 
 def calculate_portfolio_value(portfolio_holdings: Dict[str, int], cash_balance: float) -> float:
     """Calculates the total value of a portfolio based on current market prices."""
-    total_holdings_value = 0.0
-    for symbol, quantity in portfolio_holdings.items():
-        price = get_current_price(symbol)
-        total_holdings_value += price * quantity
-    return cash_balance + total_holdings_value
+    if not portfolio_holdings:
+        return cash_balance
+    market.advance()
+    prices = market.get_prices(list(portfolio_holdings))
+    quantities = np.fromiter(portfolio_holdings.values(), dtype=float, count=len(portfolio_holdings))
+    return cash_balance + float(prices @ quantities)
 
-def generate_market_event() -> Dict:
+# Range of the price move applied to affected sectors, by event sentiment
+EVENT_PRICE_CHANGE = {
+    "positive": (0.01, 0.05),
+    "negative": (-0.05, -0.01),
+    "neutral": (-0.005, 0.005),
+}
+
+def generate_market_event(rng: Optional[np.random.Generator] = None) -> Dict:
     """Generates a simulated market event."""
+    rng = market.rng if rng is None else rng
     event_types = [
         "Interest Rate Change", "Tech Sector Boom", "Global Recession Fear",
         "Major Company Earnings", "Oil Price Spike", "Geopolitical Tension"
     ]
-    event_type = np.random.choice(event_types)
+    event_type = str(rng.choice(event_types))
     description = f"Simulated event: {event_type} impacting market sentiments."
     
+    sentiment = str(rng.choice(["positive", "negative", "neutral"]))
     impact_data = {
-        "overall_sentiment": np.random.choice(["positive", "negative", "neutral"]),
-        "sectors_affected": np.random.choice(["tech", "finance", "energy", "all"], size=np.random.randint(1, 3), replace=False).tolist()
+        "overall_sentiment": sentiment,
+        "sectors_affected": rng.choice(["tech", "finance", "energy", "all"], size=rng.integers(1, 3), replace=False).tolist(),
+        "price_change": round(float(rng.uniform(*EVENT_PRICE_CHANGE[sentiment])), 4),
     }
 
     return {
@@ -55,6 +315,14 @@ def generate_market_event() -> Dict:
         "event_date": datetime.now()
     }
 
+def apply_market_event(event: Dict, engine: Optional[PriceEngine] = None) -> int:
+    """Applies an event's price impact to the engine as one vectorized sector shock."""
+    engine = market if engine is None else engine
+    impact = event.get("impact") or {}
+    if "price_change" not in impact:
+        return 0
+    return engine.apply_shock(impact.get("sectors_affected", []), impact["price_change"])
+
 # Example usage (can be run as a background task/cron job)
 if __name__ == "__main__":
     print("Current AAPL price:", get_current_price("AAPL"))
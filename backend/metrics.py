@@ -0,0 +1,254 @@
+import asyncio
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _TallyCounter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Instrumentation settings
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # If set, /metrics requires "Authorization: Bearer <token>"
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", 0.5))
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", 0.01))
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {value}"
+
+class Gauge(Counter):
+    """A value that can go up and down, or be read from a callback at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, description, labels)
+        self.function = function
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> Iterator[str]:
+        if self.function is not None:
+            try:
+                values = dict(self.function())
+            except Exception:
+                return
+            with self._lock:
+                self._values = values
+        yield from super().samples()
+
+class Histogram:
+    """Counts observations into cumulative buckets, optionally split by labels."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then total count and sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0, 0.0]
+            series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the enclosed block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le_label)} {cumulative}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {series[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]}"
+
+class Registry:
+    """Holds every metric and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# --- Metrics recorded across the backend ---
+
+http_request_duration = registry.register(Histogram(
+    "finlit_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")))
+db_query_duration = registry.register(Histogram(
+    "finlit_db_query_duration_seconds", "Supabase (PostgREST) call latency by table or RPC.", ("table", "method")))
+db_query_errors = registry.register(Counter(
+    "finlit_db_query_errors_total", "Supabase calls that raised.", ("table", "method")))
+external_api_duration = registry.register(Histogram(
+    "finlit_external_api_duration_seconds", "Latency of calls to external APIs.", ("service", "operation")))
+password_hash_duration = registry.register(Histogram(
+    "finlit_password_hash_duration_seconds", "bcrypt time per call on the hashing pool.", ("operation",)))
+password_hash_wait = registry.register(Histogram(
+    "finlit_password_hash_wait_seconds", "Time bcrypt calls spent queued for a worker.", ("operation",)))
+password_hash_rejected = registry.register(Counter(
+    "finlit_password_hash_rejected_total", "bcrypt calls rejected because the queue was full.", ("operation",)))
+event_loop_lag = registry.register(Histogram(
+    "finlit_event_loop_lag_seconds", "How late the event loop ran a timer scheduled for now.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+class MetricsMiddleware:
+    """ASGI middleware that records request latency by method, route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep label cardinality bounded (/portfolios/{user_id}, not each id)
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_code,
+            )
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS) -> None:
+    """Measures how late `asyncio.sleep` wakes up; long lags mean something blocked the loop."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, time.perf_counter() - started - interval))
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack from a background thread.
+
+    Counts are kept per collapsed stack ("module:function;module:function"), the format
+    flame graph tools read, so the hottest code paths can be inspected at runtime.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL_SECONDS, max_depth: int = 30):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = _TallyCounter()
+        # The sampler thread counts while requests read, so both sides hold this lock
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._target_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+
+    def start(self, thread_id: Optional[int] = None) -> None:
+        """Starts sampling `thread_id` (default: the calling thread)."""
+        self._target_thread_id = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    self.samples[key] += 1
+
+    def top(self, limit: int = 50) -> List[Dict]:
+        """Returns the most frequently sampled stacks."""
+        with self._lock:
+            samples = self.samples.copy()
+        total = sum(samples.values()) or 1
+        return [
+            {"stack": stack, "samples": count, "fraction": round(count / total, 4)}
+            for stack, count in samples.most_common(limit)
+        ]
+
+profiler = SamplingProfiler()
@@ -1,7 +1,7 @@
-from typing import Optional, Literal
+from typing import Dict, List, Optional, Literal, Tuple
 from datetime import datetime
 from uuid import UUID
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 class UserBase(BaseModel):
     email: EmailStr
     role: Literal['student', 'instructor', 'admin'] = 'student'
@@ -11,12 +11,30 @@ class UserCreate(UserBase):
 
 class UserInDB(UserBase):
     id: UUID
+    # Set by instructors through the roster import, never by the user at signup
+    class_code: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class UserRoleUpdate(BaseModel):
+    role: Literal['student', 'instructor', 'admin']
+
+class RosterEntry(BaseModel):
+    email: EmailStr
+    password: str = Field(min_length=1)
+    role: Literal['student', 'instructor'] = 'student'
+    class_code: Optional[str] = Field(default=None, max_length=32)
+
+class RosterImportResult(BaseModel):
+    index: int
+    email: Optional[str] = None
+    status: Literal['created', 'exists', 'invalid', 'failed']
+    user_id: Optional[UUID] = None
+    error: Optional[str] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -51,6 +69,56 @@ class TradeInDB(TradeBase):
     class Config:
         from_attributes = True
 
+class TradeBatchResult(BaseModel):
+    index: int
+    status: Literal['filled', 'rejected']
+    trade: Optional[TradeInDB] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+class PortfolioPerformance(BaseModel):
+    portfolio_id: UUID
+    interval_seconds: int
+    start: datetime
+    end: datetime
+    initial_value: float
+    current_value: float
+    total_return: float
+    annualized_volatility: Optional[float] = None
+    sharpe_ratio: Optional[float] = None
+    max_drawdown: float
+    ts: List[datetime]
+    value: List[float]
+
+class OrderBase(BaseModel):
+    portfolio_id: UUID
+    symbol: str = Field(min_length=1, max_length=10)
+    side: Literal['BUY', 'SELL']
+    order_type: Literal['LIMIT', 'STOP']
+    quantity: int = Field(gt=0)
+    limit_price: Optional[float] = Field(default=None, gt=0)
+    stop_price: Optional[float] = Field(default=None, gt=0)
+
+    @model_validator(mode='after')
+    def check_trigger_price(self):
+        if self.order_type == 'LIMIT' and self.limit_price is None:
+            raise ValueError('LIMIT orders need a limit_price')
+        if self.order_type == 'STOP' and self.stop_price is None:
+            raise ValueError('STOP orders need a stop_price')
+        return self
+
+class OrderInDB(OrderBase):
+    id: UUID
+    user_id: UUID
+    status: Literal['open', 'filled', 'cancelled', 'rejected']
+    trade_id: Optional[UUID] = None
+    error: Optional[str] = None
+    created_at: datetime
+    filled_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class MarketEventBase(BaseModel):
     event_type: str
     description: Optional[str] = None
@@ -63,6 +131,86 @@ class MarketEventInDB(MarketEventBase):
     class Config:
         from_attributes = True
 
+class PriceHistory(BaseModel):
+    # Columnar OHLC bars; ts holds each bar's start time
+    symbol: str
+    interval_seconds: int
+    ts: List[datetime]
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+
+class EventImpact(BaseModel):
+    # A price change of -1 or less would wipe prices out (or make them negative)
+    sectors_affected: List[str] # Sector names, or ['all']
+    price_change: float = Field(gt=-1, allow_inf_nan=False) # e.g., -0.08 for an 8% drop
+    overall_sentiment: Optional[Literal['positive', 'negative', 'neutral']] = None
+
+class ScenarioEvent(BaseModel):
+    # Scripted event, `at_seconds` of simulated time into the scenario
+    at_seconds: float = Field(ge=0)
+    event_type: str
+    description: Optional[str] = None
+    impact: EventImpact
+
+class MarketScenario(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    seed: int
+    duration_seconds: float = Field(gt=0) # Simulated time covered by the scenario
+    step_seconds: float = Field(gt=0) # Simulated time between precomputed prices
+    start_date: Optional[datetime] = None # Simulated date of the first step; defaults to when the replay starts
+    universe: Optional[Dict[str, Tuple[str, float]]] = None # symbol -> (sector, starting price)
+    drift: float = 0.05
+    volatility: float = Field(0.25, ge=0)
+    market_beta: float = 0.5
+    sector_beta: float = 0.3
+    event_interval_seconds: Optional[float] = Field(None, gt=0) # Mean simulated time between random events
+    events: List[ScenarioEvent] = []
+
+class ReplayStart(BaseModel):
+    # Either an inline scenario or the name of a scenario file
+    scenario: Optional[MarketScenario] = None
+    scenario_name: Optional[str] = Field(None, pattern=r'^[A-Za-z0-9_-]+$')
+    speed: float = Field(1.0, gt=0) # Simulated seconds per wall-clock second
+    position_seconds: float = Field(0.0, ge=0)
+
+    @model_validator(mode='after')
+    def check_scenario(self):
+        if (self.scenario is None) == (self.scenario_name is None):
+            raise ValueError('Give exactly one of scenario and scenario_name')
+        return self
+
+class ReplayControl(BaseModel):
+    speed: Optional[float] = Field(None, gt=0)
+    position_seconds: Optional[float] = Field(None, ge=0) # Jump straight to this point
+    paused: Optional[bool] = None
+
+class ReplayStatus(BaseModel):
+    name: str
+    seed: int
+    speed: float
+    paused: bool
+    finished: bool
+    position_seconds: float
+    duration_seconds: float
+    simulated_time: datetime
+    steps: int
+    symbols: List[str]
+    events: int
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: UUID
+    portfolio_id: UUID
+    total_value: float
+
+class LeaderboardRank(BaseModel):
+    rank: int
+    total_value: float
+    portfolios: int
+    class_code: Optional[str] = None
+
 class ChatbotInteractionBase(BaseModel):
     user_id: UUID
     query: str
@@ -0,0 +1,251 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .analytics import invalidate_performance
+from .database import execute, fetch_all, supabase
+from .leaderboard import leaderboard
+from .market_simulator import PriceEngine, market
+from .models import OrderInDB, TradeInDB
+
+logger = logging.getLogger(__name__)
+
+# Maximum fills sent to the fill_orders database function per call
+ORDER_FILL_BATCH_SIZE = int(os.getenv("ORDER_FILL_BATCH_SIZE", 500))
+# Each order sync re-reads this many seconds before the previous one, so no committed change slips between them
+ORDER_SYNC_OVERLAP_SECONDS = float(os.getenv("ORDER_SYNC_OVERLAP_SECONDS", 5))
+
+def fills_below(order: OrderInDB) -> bool:
+    """True if the order fills when the price falls to its trigger (BUY LIMIT, SELL STOP)."""
+    return (order.order_type == 'LIMIT') == (order.side == 'BUY')
+
+def trigger_price(order: OrderInDB) -> float:
+    return order.limit_price if order.order_type == 'LIMIT' else order.stop_price
+
+class OrderBook:
+    """
+    Resting limit and stop orders for every symbol, in price-time priority.
+
+    Each symbol has two heaps: orders that fill when the price falls to their trigger
+    (highest trigger first) and orders that fill when it rises to theirs (lowest first),
+    with submission order breaking ties. The best trigger of each heap is mirrored in
+    arrays aligned with the PriceEngine's symbols, so finding the symbols that crossed
+    on a tick is one vectorized comparison and only crossed orders are popped.
+    Cancelled orders are dropped lazily when they reach the top of a heap.
+    """
+
+    def __init__(self, engine: PriceEngine = market):
+        self.engine = engine
+        self.orders: Dict[str, OrderInDB] = {}
+        self._below: Dict[int, list] = {}
+        self._above: Dict[int, list] = {}
+        self._best_below = np.full(len(engine), -np.inf)
+        self._best_above = np.full(len(engine), np.inf)
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, order_id) -> bool:
+        return str(order_id) in self.orders
+
+    def _grow(self, capacity: int) -> None:
+        n = len(self._best_below)
+        self._best_below = np.concatenate([self._best_below, np.full(capacity - n, -np.inf)])
+        self._best_above = np.concatenate([self._best_above, np.full(capacity - n, np.inf)])
+
+    def add(self, order: OrderInDB, sequence: Optional[int] = None) -> None:
+        """
+        Adds an open order to its symbol's book.
+
+        A new order gets the next sequence number; an order put back after a failed fill
+        passes the `sequence` it was matched with, so it keeps its time priority.
+        """
+        symbol = self.engine.add_symbol(order.symbol)
+        if symbol >= len(self._best_below):
+            self._grow(max(2 * len(self._best_below), symbol + 1))
+        order_id = str(order.id)
+        self.orders[order_id] = order
+        price = trigger_price(order)
+        if sequence is None:
+            sequence = next(self._sequence)
+        if fills_below(order):
+            heapq.heappush(self._below.setdefault(symbol, []), (-price, sequence, order_id))
+            self._best_below[symbol] = max(self._best_below[symbol], price)
+        else:
+            heapq.heappush(self._above.setdefault(symbol, []), (price, sequence, order_id))
+            self._best_above[symbol] = min(self._best_above[symbol], price)
+
+    def cancel(self, order_id) -> Optional[OrderInDB]:
+        """Removes an order; its heap entry is skipped when it surfaces."""
+        return self.orders.pop(str(order_id), None)
+
+    def clear(self) -> None:
+        """Removes every order."""
+        self.orders.clear()
+        self._below.clear()
+        self._above.clear()
+        self._best_below[:] = -np.inf
+        self._best_above[:] = np.inf
+
+    def match(self, prices: np.ndarray) -> List[Tuple[OrderInDB, float, int]]:
+        """
+        Pops every order whose trigger `prices` reached.
+
+        Returns:
+            List[Tuple[OrderInDB, float, int]]: Crossed orders with the price to fill them
+            at and their sequence number (for add() if the fill has to be retried).
+        """
+        n = min(len(prices), len(self._best_below))
+        crossed = np.flatnonzero((prices[:n] <= self._best_below[:n]) | (prices[:n] >= self._best_above[:n]))
+        fills = []
+        for symbol in crossed.tolist():
+            price = float(prices[symbol])
+            below = self._below.get(symbol, [])
+            while below and -below[0][0] >= price:
+                _, sequence, order_id = heapq.heappop(below)
+                order = self.orders.pop(order_id, None)
+                if order is not None:
+                    fills.append((order, price, sequence))
+            self._best_below[symbol] = -below[0][0] if below else -np.inf
+            above = self._above.get(symbol, [])
+            while above and above[0][0] <= price:
+                _, sequence, order_id = heapq.heappop(above)
+                order = self.orders.pop(order_id, None)
+                if order is not None:
+                    fills.append((order, price, sequence))
+            self._best_above[symbol] = above[0][0] if above else np.inf
+        return fills
+
+class OrderMatcher:
+    """
+    Matches the order book against every price tick and persists fills in bulk.
+
+    Only the market producer (the worker holding the lease) matches, so each order is
+    filled by one worker. It loads the open orders when it takes the lease, then syncs
+    the orders placed or cancelled through other workers in the background each tick.
+
+    Matching runs synchronously in the tick; fills are written by a background task
+    through the fill_orders database function, ORDER_FILL_BATCH_SIZE at a time, so a
+    slow database never delays the simulator. Fills that cannot be written are put
+    back in the book, with their original time priority, and retried when their
+    price crosses again, unless the order was cancelled in the meantime.
+    """
+
+    def __init__(self, book: OrderBook):
+        self.book = book
+        self.loaded = False
+        self.leader = False
+        self._pending: List[Tuple[OrderInDB, float, int]] = []
+        # Orders matched but not yet written, and those of them cancelled meanwhile
+        self._in_flight: Set[str] = set()
+        self._cancelled: Set[str] = set()
+        self._synced_at: Optional[datetime] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        """Loads every open order from Supabase into the book."""
+        polled_at = datetime.now(timezone.utc)
+        rows = await fetch_all(lambda: supabase.table("orders").select("*").eq("status", "open").order("created_at").order("id"))
+        for row in rows:
+            if row["id"] not in self.book and row["id"] not in self._in_flight:
+                self.book.add(OrderInDB(**row))
+        self._synced_at = polled_at
+        self.loaded = True
+        logger.info("Loaded %d open orders", len(rows))
+
+    async def sync(self) -> None:
+        """Applies the orders placed, cancelled or filled through any worker since the last load or sync."""
+        polled_at = datetime.now(timezone.utc)
+        since = (self._synced_at - timedelta(seconds=ORDER_SYNC_OVERLAP_SECONDS)).isoformat()
+        rows = await fetch_all(lambda: supabase.table("orders").select("*").gte("updated_at", since).order("updated_at").order("id"))
+        for row in rows:
+            if row["status"] != "open":
+                self.cancel(row["id"])
+            elif row["id"] not in self.book and row["id"] not in self._in_flight:
+                self.book.add(OrderInDB(**row))
+        self._synced_at = polled_at
+
+    async def _sync_logged(self) -> None:
+        try:
+            await self.sync()
+        except Exception:
+            logger.exception("Failed to sync open orders")
+
+    def add(self, order: OrderInDB) -> None:
+        """Adds a newly placed order, if this worker matches; otherwise the producer's sync picks it up."""
+        if self.loaded:
+            self.book.add(order)
+
+    def cancel(self, order_id) -> None:
+        """Removes a cancelled order, including one matched whose fill is still being written."""
+        self.book.cancel(order_id)
+        if str(order_id) in self._in_flight:
+            self._cancelled.add(str(order_id))
+
+    async def _load_logged(self) -> None:
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Failed to load open orders")
+
+    def on_tick(self, prices: np.ndarray, leader: bool = True) -> None:
+        """Scheduler tick listener; `leader` is whether this worker holds the market lease."""
+        if leader != self.leader:
+            # The lease changed hands: a new producer starts from the stored open orders
+            self.leader = leader
+            self.loaded = False
+            self.book.clear()
+        if leader and not self.loaded:
+            if self._load_task is None or self._load_task.done():
+                self._load_task = asyncio.create_task(self._load_logged(), name="order-book-load")
+        elif leader:
+            if self._sync_task is None or self._sync_task.done():
+                self._sync_task = asyncio.create_task(self._sync_logged(), name="order-book-sync")
+            matched = self.book.match(prices)
+            self._in_flight.update(str(order.id) for order, _, _ in matched)
+            self._pending.extend(matched)
+        if self._pending and (self._flush_task is None or self._flush_task.done()):
+            batch = self._pending[:ORDER_FILL_BATCH_SIZE]
+            del self._pending[:ORDER_FILL_BATCH_SIZE]
+            self._flush_task = asyncio.create_task(self._flush(batch), name="order-fills")
+
+    async def _flush(self, batch: List[Tuple[OrderInDB, float, int]]) -> None:
+        payload = [
+            {"order_id": str(order.id), "portfolio_id": str(order.portfolio_id), "price": round(price, 2)}
+            for order, price, _ in batch
+        ]
+        try:
+            response = await execute(supabase.rpc("fill_orders", {"p_fills": payload}))
+        except Exception:
+            logger.exception("Failed to persist %d order fills", len(batch))
+            for order, _, sequence in batch:
+                order_id = str(order.id)
+                if order_id not in self._cancelled:
+                    self.book.add(order, sequence)
+                self._in_flight.discard(order_id)
+                self._cancelled.discard(order_id)
+            return
+        for order, _, _ in batch:
+            self._in_flight.discard(str(order.id))
+            self._cancelled.discard(str(order.id))
+        filled = 0
+        for result in response.data or []:
+            if result["status"] == "filled":
+                filled += 1
+                trade = TradeInDB(**result["trade"])
+                leaderboard.apply_trade(trade)
+                invalidate_performance(trade.portfolio_id)
+        logger.info("Persisted order fills: %d filled, %d not filled", filled, len(batch) - filled)
+
+# Shared order book and matcher used by the API
+order_book = OrderBook()
+order_matcher = OrderMatcher(order_book)
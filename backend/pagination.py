@@ -0,0 +1,104 @@
+import base64
+import json
+import os
+import re
+from typing import List, Optional, Tuple, Type
+from uuid import UUID
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+
+from .serialization import FAST_SERIALIZATION_ENABLED, RawJSONResponse, model_columns
+
+# Page-size limits for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Cursor sort keys are timestamps as PostgREST returns them; anything else is rejected
+# before it reaches the filter string
+_CURSOR_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d{1,6})?(Z|[+-]\d{2}(:?\d{2})?)?")
+
+def encode_cursor(row: dict, sort_key: str) -> str:
+    """Encodes the keyset position (sort key, id) of `row` as an opaque cursor."""
+    raw = json.dumps([row[sort_key], str(row["id"])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Both parts are checked strictly (an ISO 8601 timestamp and a UUID), because they are
+    interpolated into a PostgREST filter where quotes, commas or parentheses would change it.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        if not isinstance(value, str) or not isinstance(row_id, str) or not _CURSOR_TIMESTAMP.fullmatch(value):
+            raise ValueError(cursor)
+        return value, str(UUID(row_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def select_columns(fields: Optional[str], model: Type[BaseModel], sort_key: str, trusted: bool = False) -> str:
+    """
+    Turns a comma-separated `fields` parameter into a select list for `model`.
+
+    Only `model`'s own fields can be requested, since projected rows skip response_model
+    validation; the id and sort key are always selected because the next cursor is built
+    from them. With `trusted`, a full select names exactly the model's columns, so the
+    rows can be served by page_response without validation.
+
+    Raises:
+        HTTPException: If a requested field is not one of the model's fields.
+    """
+    if not fields:
+        return model_columns(model) if trusted and FAST_SERIALIZATION_ENABLED else "*"
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = ["id", sort_key] + [field for field in requested if field not in ("id", sort_key)]
+    return ", ".join(columns)
+
+def keyset_page(query, sort_key: str, before: Optional[str], limit: int):
+    """
+    Restricts `query` to one page, newest first, starting after the `before` cursor.
+
+    Rows are ordered by (sort key, id) descending; one extra row is fetched to tell
+    whether a further page exists.
+    """
+    if before:
+        value, row_id = decode_cursor(before)
+        query = query.or_(f'{sort_key}.lt."{value}",and({sort_key}.eq."{value}",id.lt."{row_id}")')
+    return query.order(sort_key, desc=True).order("id", desc=True).limit(limit + 1)
+
+def split_page(rows: List[dict], limit: int, sort_key: str) -> Tuple[List[dict], Optional[str]]:
+    """Splits rows fetched with keyset_page into the page itself and the next cursor (or None)."""
+    next_cursor = encode_cursor(rows[limit - 1], sort_key) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def page_response(rows: List[dict], limit: int, sort_key: str, model: Type[BaseModel], projected: bool, response: Response, trusted: bool = False):
+    """
+    Builds a list endpoint's result from rows fetched with keyset_page.
+
+    Full rows are returned as `model` instances, which FastAPI validates and serializes.
+    Projected rows (a `fields` subset), and full rows on `trusted` routes selected with
+    select_columns(..., trusted=True), are encoded as-is in a RawJSONResponse instead.
+    Timestamps then keep PostgREST's ISO 8601 format.
+    """
+    rows, next_cursor = split_page(rows, limit, sort_key)
+    if projected:
+        # Whatever the database returns, a projection never carries more than the model's fields
+        rows = [{key: value for key, value in row.items() if key in model.model_fields} for row in rows]
+    if projected or (trusted and FAST_SERIALIZATION_ENABLED):
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return RawJSONResponse(content=rows, headers=headers)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [model(**row) for row in rows]
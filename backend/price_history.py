@@ -0,0 +1,181 @@
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+
+# Where OHLC bars are stored, and the width of a recorded bar
+PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", "data/price_history")
+PRICE_HISTORY_BAR_SECONDS = int(os.getenv("PRICE_HISTORY_BAR_SECONDS", 60))
+
+# One fixed-width record per bar; `ts` is the bar's start in epoch seconds (UTC)
+BAR_DTYPE = np.dtype([("ts", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8")])
+
+# Symbols are also file names, so they are restricted to a safe character set
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-]{1,10}$")
+
+class PriceHistoryStore:
+    """
+    Append-only, per-symbol OHLC bar files partitioned by UTC day.
+
+    Bars live at `<root>/<YYYY-MM-DD>/<SYMBOL>.bin` as packed BAR_DTYPE records in time
+    order, so a range query memory-maps each day file and slices it with a binary
+    search: reading a single day is a zero-copy view, and a longer range costs one
+    concatenate over the matching slices. Appends keep the order strict by dropping
+    bars that are not newer than the last one stored (e.g. a bar flushed at shutdown
+    and recorded again after a restart within the same minute).
+    """
+
+    def __init__(self, root: str = PRICE_HISTORY_DIR):
+        self.root = root
+
+    def _day_dir(self, day: date) -> str:
+        return os.path.join(self.root, day.isoformat())
+
+    def _path(self, day: date, symbol: str) -> str:
+        if not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol: {symbol!r}")
+        return os.path.join(self._day_dir(day), f"{symbol}.bin")
+
+    def append(self, symbol: str, bars: np.ndarray) -> None:
+        """Appends `bars` (BAR_DTYPE, ascending `ts`) for `symbol`, splitting them by day."""
+        if len(bars) == 0:
+            return
+        days = bars["ts"] // 86400
+        for day in np.unique(days):
+            path = self._path(date(1970, 1, 1) + timedelta(days=int(day)), symbol)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _append_records(path, bars[days == day])
+
+    def append_bar(self, symbols: List[str], ts: int, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> None:
+        """Appends one bar at `ts` for each of `symbols` (the arrays are aligned with `symbols`)."""
+        directory = self._day_dir(datetime.fromtimestamp(ts, timezone.utc).date())
+        os.makedirs(directory, exist_ok=True)
+        records = np.empty(len(symbols), dtype=BAR_DTYPE)
+        records["ts"] = ts
+        records["open"], records["high"], records["low"], records["close"] = open_, high, low, close
+        for i, symbol in enumerate(symbols):
+            if not SYMBOL_PATTERN.match(symbol):
+                continue
+            _append_records(os.path.join(directory, f"{symbol}.bin"), records[i:i + 1])
+
+    def _day_bars(self, day: date, symbol: str) -> Optional[np.ndarray]:
+        path = self._path(day, symbol)
+        try:
+            count = os.path.getsize(path) // BAR_DTYPE.itemsize
+        except FileNotFoundError:
+            return None
+        if count == 0:
+            return None
+        # Ignore a partially written trailing record
+        return np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(count,))
+
+    def read(self, symbol: str, start: datetime, end: datetime) -> np.ndarray:
+        """Returns the bars of `symbol` with start <= ts < end."""
+        start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+        slices = []
+        day = start.astimezone(timezone.utc).date()
+        last_day = end.astimezone(timezone.utc).date()
+        while day <= last_day:
+            bars = self._day_bars(day, symbol)
+            if bars is not None:
+                lo, hi = np.searchsorted(bars["ts"], [start_ts, end_ts])
+                if hi > lo:
+                    slices.append(bars[lo:hi])
+            day += timedelta(days=1)
+        if not slices:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return slices[0] if len(slices) == 1 else np.concatenate(slices)
+
+def _append_records(path: str, records: np.ndarray) -> None:
+    """Appends `records` (ascending `ts`) to a bar file, skipping any not newer than its last bar."""
+    with open(path, "a+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        whole = size - size % BAR_DTYPE.itemsize
+        if whole != size:
+            # Drop a record left half-written by a crash, so later records stay aligned
+            f.truncate(whole)
+        if whole:
+            f.seek(whole - BAR_DTYPE.itemsize)
+            last_ts = np.frombuffer(f.read(BAR_DTYPE.itemsize), dtype=BAR_DTYPE)["ts"][0]
+            records = records[records["ts"] > last_ts]
+        if len(records):
+            f.write(records.tobytes())
+
+def downsample(bars: np.ndarray, interval_seconds: int) -> np.ndarray:
+    """Aggregates `bars` into `interval_seconds` buckets (first open, max high, min low, last close)."""
+    if len(bars) == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+    buckets = bars["ts"] // interval_seconds * interval_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(bars)] - 1
+    out = np.empty(len(starts), dtype=BAR_DTYPE)
+    out["ts"] = buckets[starts]
+    out["open"] = bars["open"][starts]
+    out["high"] = np.maximum.reduceat(bars["high"], starts)
+    out["low"] = np.minimum.reduceat(bars["low"], starts)
+    out["close"] = bars["close"][ends]
+    return out
+
+class BarRecorder:
+    """
+    Folds price ticks for the whole universe into OHLC bars and flushes completed bars.
+
+    Each tick updates open/high/low/close arrays with a few vectorized operations;
+    once a tick lands in a new bar interval, the finished bar is appended to the store.
+    """
+
+    def __init__(self, store: PriceHistoryStore, bar_seconds: int = PRICE_HISTORY_BAR_SECONDS):
+        self.store = store
+        self.bar_seconds = bar_seconds
+        self._bar_ts: Optional[int] = None
+        self._open = self._high = self._low = self._close = np.empty(0)
+
+    def record(self, symbols: List[str], prices: np.ndarray, now: Optional[float] = None) -> Optional[tuple]:
+        """
+        Records one tick of `prices` (aligned with `symbols`).
+
+        Returns:
+            Optional[tuple]: The completed bar as append_bar arguments, or None if the bar is still open.
+        """
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        bar_ts = int(now) // self.bar_seconds * self.bar_seconds
+        completed = None
+        if self._bar_ts is not None and bar_ts != self._bar_ts:
+            completed = self.pending()
+            self._bar_ts = None
+        n = len(prices)
+        if self._bar_ts is None:
+            self._bar_ts = bar_ts
+            self._symbols = list(symbols)
+            self._open, self._high, self._low, self._close = (prices.copy() for _ in range(4))
+            return completed
+        if n > len(self._close):
+            # Symbols registered mid-bar start their bar at the current price
+            grown = n - len(self._close)
+            self._symbols = list(symbols)
+            self._open, self._high, self._low, self._close = (
+                np.concatenate([arr, prices[-grown:]]) for arr in (self._open, self._high, self._low, self._close)
+            )
+        np.maximum(self._high, prices, out=self._high)
+        np.minimum(self._low, prices, out=self._low)
+        self._close[:] = prices
+        return completed
+
+    def pending(self) -> Optional[tuple]:
+        """Returns the open bar as append_bar arguments (None if nothing was recorded)."""
+        if self._bar_ts is None:
+            return None
+        return (self._symbols, self._bar_ts, self._open, self._high, self._low, self._close)
+
+    def reset(self) -> Optional[tuple]:
+        """Discards the open bar and returns it (see pending()); the next tick starts a new one."""
+        bar = self.pending()
+        self._bar_ts = None
+        return bar
+
+    def flush(self, bar: Optional[tuple]) -> None:
+        """Writes a bar returned by record() or pending() to the store."""
+        if bar is not None:
+            self.store.append_bar(*bar)
@@ -0,0 +1,235 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .market_simulator import SECTORS, PriceEngine, generate_market_event
+from .models import MarketScenario, ReplayStatus
+
+# Directory holding named scenario files (<name>.json)
+SCENARIO_DIR = Path(os.getenv("SCENARIO_DIR", Path(__file__).parent / "scenarios"))
+# Upper bound on precomputed prices (steps x symbols) per scenario
+SCENARIO_MAX_POINTS = int(os.getenv("SCENARIO_MAX_POINTS", 10_000_000))
+
+def load_scenario(name: str) -> MarketScenario:
+    """
+    Reads SCENARIO_DIR/<name>.json.
+
+    Raises:
+        FileNotFoundError: If there is no such scenario.
+    """
+    with open(SCENARIO_DIR / f"{name}.json", encoding="utf-8") as f:
+        return MarketScenario(**json.load(f))
+
+class MarketSession:
+    """
+    A whole scenario, precomputed: prices at every step and the events along the way.
+
+    `prices[i]` holds every symbol's price `i * step_seconds` into the scenario, so
+    replaying it is an index lookup per tick.
+    """
+
+    def __init__(self, scenario: MarketScenario, symbols: List[str], sectors: List[str], prices: np.ndarray, events: List[Dict], start_date: datetime):
+        self.scenario = scenario
+        self.symbols = symbols
+        self.sectors = sectors
+        self.prices = prices
+        self.events = events
+        self.event_seconds = np.array([event["at_seconds"] for event in events], dtype=float)
+        self.start_date = start_date
+
+    @property
+    def steps(self) -> int:
+        return len(self.prices) - 1
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.scenario.duration_seconds
+
+    def prices_at(self, position: float) -> np.ndarray:
+        """Prices of every symbol `position` seconds into the scenario."""
+        return self.prices[min(int(position // self.scenario.step_seconds), self.steps)]
+
+    def events_between(self, start: float, end: float) -> List[Dict]:
+        """Events after `start` and up to `end`, in order."""
+        lo, hi = np.searchsorted(self.event_seconds, [start, end], side="right")
+        return self.events[lo:hi]
+
+def precompute_session(scenario: MarketScenario, start_date: Optional[datetime] = None) -> MarketSession:
+    """
+    Simulates a whole scenario in bulk.
+
+    Price shocks for every step are drawn in one batch and event shocks are added to
+    the log returns of the step they fall in, so the path is one cumulative sum.
+    Prices and random events come from separate streams spawned from the seed: the
+    same scenario always produces the same session.
+
+    Raises:
+        ValueError: If the scenario is too large or its parameters are invalid.
+    """
+    steps = int(np.ceil(scenario.duration_seconds / scenario.step_seconds))
+    price_seed, event_seed = np.random.SeedSequence(scenario.seed).spawn(2)
+    engine = PriceEngine(
+        universe=scenario.universe,
+        drift=scenario.drift,
+        volatility=scenario.volatility,
+        market_beta=scenario.market_beta,
+        sector_beta=scenario.sector_beta,
+        seed=price_seed,
+    )
+    if (steps + 1) * len(engine) > SCENARIO_MAX_POINTS:
+        raise ValueError(f"Scenario needs {(steps + 1) * len(engine)} prices; the limit is {SCENARIO_MAX_POINTS}")
+
+    events = [event.model_dump(exclude_none=True) for event in scenario.events]
+    if scenario.event_interval_seconds:
+        rng = np.random.default_rng(event_seed)
+        expected = scenario.duration_seconds / scenario.event_interval_seconds
+        arrivals = np.cumsum(rng.exponential(scenario.event_interval_seconds, int(expected + 4 * np.sqrt(expected)) + 10))
+        while arrivals[-1] <= scenario.duration_seconds:
+            arrivals = np.concatenate([arrivals, arrivals[-1] + np.cumsum(rng.exponential(scenario.event_interval_seconds, len(arrivals)))])
+        for at_seconds in arrivals[arrivals <= scenario.duration_seconds].tolist():
+            event = generate_market_event(rng)
+            del event["event_date"]
+            events.append({**event, "at_seconds": at_seconds})
+    events.sort(key=lambda event: event["at_seconds"])
+
+    log_returns = engine.simulate_log_returns(steps, scenario.step_seconds)
+    for event in events:
+        impact = event.get("impact") or {}
+        if "price_change" in impact:
+            # An event at t lands in the step ending at or after t
+            step = min(max(int(np.ceil(event["at_seconds"] / scenario.step_seconds)), 1), steps) - 1
+            log_returns[step] += np.log1p(impact["price_change"]) * engine.sector_mask(impact.get("sectors_affected", []))
+    prices = np.empty((steps + 1, len(engine)))
+    prices[0] = engine.prices
+    prices[1:] = engine.prices * np.exp(np.cumsum(log_returns, axis=0))
+
+    start_date = scenario.start_date or start_date or datetime.now(timezone.utc)
+    sectors = [SECTORS[i] for i in engine.sector_ids.tolist()]
+    return MarketSession(scenario, list(engine.symbols), sectors, prices, events, start_date)
+
+class ScenarioReplay:
+    """
+    Plays a precomputed session into a PriceEngine at `speed` simulated seconds per
+    wall-clock second.
+
+    The replay is a clock over the session: each `advance` looks up the row for the
+    current position and copies it into the engine, and reports the events passed
+    since the previous call. Seeking moves the clock without replaying what it skips.
+    While attached, the engine is held so nothing else moves the replayed prices.
+    Symbols the engine did not list yet are added, and delisted again by release().
+    """
+
+    def __init__(self, session: MarketSession, engine: PriceEngine, speed: float = 1.0, position: float = 0.0):
+        self.session = session
+        self.engine = engine
+        self.speed = speed
+        self.paused = False
+        self._anchor_position = min(position, session.duration_seconds)
+        self._anchor_time = time.monotonic()
+        self._last_position = self._anchor_position
+        self.added_symbols = engine.unknown_symbols(session.symbols)
+        try:
+            self._indices = np.array([
+                engine.add_symbol(symbol, sector, price)
+                for symbol, sector, price in zip(session.symbols, session.sectors, session.prices_at(self._anchor_position).tolist())
+            ], dtype=np.intp)
+        except ValueError:
+            engine.remove_symbols(self.added_symbols)
+            raise
+
+    def position(self, now: Optional[float] = None) -> float:
+        """Simulated seconds into the scenario."""
+        if self.paused:
+            return self._anchor_position
+        now = time.monotonic() if now is None else now
+        return min(self._anchor_position + (now - self._anchor_time) * self.speed, self.session.duration_seconds)
+
+    @property
+    def finished(self) -> bool:
+        return self._last_position >= self.session.duration_seconds
+
+    def _rebase(self, position: float, now: Optional[float] = None) -> None:
+        self._anchor_position = min(max(position, 0.0), self.session.duration_seconds)
+        self._anchor_time = time.monotonic() if now is None else now
+
+    def control(self, speed: Optional[float] = None, position: Optional[float] = None, paused: Optional[bool] = None, now: Optional[float] = None) -> None:
+        """Changes speed, jumps to a position or pauses/resumes, and applies the new position."""
+        now = time.monotonic() if now is None else now
+        self._rebase(self.position(now) if position is None else position, now)
+        if speed is not None:
+            self.speed = speed
+        if paused is not None:
+            self.paused = paused
+        if position is not None:
+            self._last_position = self._anchor_position
+            self.engine.set_prices(self._indices, self.session.prices_at(self._anchor_position))
+
+    def attach(self) -> None:
+        """Holds the engine and sets its prices to the current position."""
+        self.engine.held = True
+        self.engine.set_prices(self._indices, self.session.prices_at(self._last_position))
+
+    def detach(self) -> None:
+        """Hands the engine back to its own simulation from the last replayed prices."""
+        self.engine.held = False
+        self.engine.last_tick = time.monotonic()
+
+    def release(self, successor: Optional["ScenarioReplay"] = None) -> None:
+        """Delists the symbols this replay added, except those `successor` replays too (it takes them over)."""
+        kept = set(successor.session.symbols) if successor is not None else set()
+        if successor is not None:
+            successor.added_symbols += [symbol for symbol in self.added_symbols if symbol in kept and symbol not in successor.added_symbols]
+        self.engine.remove_symbols([symbol for symbol in self.added_symbols if symbol not in kept])
+        self.added_symbols = []
+
+    def advance(self, now: Optional[float] = None) -> List[Dict]:
+        """
+        Moves the engine to the current position.
+
+        Returns:
+            List[Dict]: Market events (with simulated `event_date`) passed since the last call.
+        """
+        position = self.position(now)
+        events = self.session.events_between(self._last_position, position) if position > self._last_position else []
+        self._last_position = position
+        self.engine.set_prices(self._indices, self.session.prices_at(position))
+        return [
+            {
+                "event_type": event["event_type"],
+                "description": event.get("description"),
+                "impact": event.get("impact"),
+                "event_date": self.session.start_date + timedelta(seconds=event["at_seconds"]),
+            }
+            for event in events
+        ]
+
+    def status(self) -> ReplayStatus:
+        scenario = self.session.scenario
+        position = self.position()
+        return ReplayStatus(
+            name=scenario.name,
+            seed=scenario.seed,
+            speed=self.speed,
+            paused=self.paused,
+            finished=position >= self.session.duration_seconds,
+            position_seconds=position,
+            duration_seconds=self.session.duration_seconds,
+            simulated_time=self.session.start_date + timedelta(seconds=position),
+            steps=self.session.steps,
+            symbols=self.session.symbols,
+            events=len(self.session.events),
+        )
+
+# Example usage: preview a scenario file's final prices and events
+if __name__ == "__main__":
+    import sys
+
+    session = precompute_session(load_scenario(sys.argv[1] if len(sys.argv) > 1 else "one_year"))
+    print(f"{session.steps} steps, {len(session.events)} events")
+    for symbol, first, last in zip(session.symbols, session.prices[0], session.prices[-1]):
+        print(f"{symbol}: {first:.2f} -> {last:.2f}")
@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from .auth import get_password_hashes_async
+from .database import execute, supabase
+from .models import PortfolioBase, RosterEntry, RosterImportResult
+
+# Upper bound on rows accepted by a single import
+ROSTER_IMPORT_MAX_ROWS = int(os.getenv("ROSTER_IMPORT_MAX_ROWS", 5000))
+# Rows per bulk insert request
+ROSTER_INSERT_BATCH_SIZE = int(os.getenv("ROSTER_INSERT_BATCH_SIZE", 500))
+# Emails per `in` lookup; keeps the query string well under common URL length limits
+ROSTER_LOOKUP_BATCH_SIZE = 200
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def parse_roster(body: bytes, content_type: str) -> List[dict]:
+    """
+    Parses an uploaded roster into raw rows.
+
+    Accepts a JSON array of objects, or CSV with a header row naming the columns
+    (email, password, and optionally role and class_code).
+
+    Raises:
+        HTTPException: 400 if the body cannot be parsed, 413 if it has too many rows.
+    """
+    try:
+        text = body.decode("utf-8-sig")
+        if "json" in content_type:
+            rows = json.loads(text)
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("Expected a JSON array of objects")
+        else:
+            reader = csv.DictReader(io.StringIO(text))
+            if not reader.fieldnames or "email" not in reader.fieldnames:
+                raise ValueError("CSV roster needs a header row with an email column")
+            # Empty cells become missing fields so model defaults apply
+            rows = [{key: value.strip() for key, value in row.items() if key and value and value.strip()} for row in reader]
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not parse roster: {e}")
+
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Roster is empty")
+    if len(rows) > ROSTER_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A roster may contain at most {ROSTER_IMPORT_MAX_ROWS} rows",
+        )
+    return rows
+
+def _validate_rows(rows: List[dict], allow_instructors: bool, results: Dict[int, RosterImportResult]) -> List[Tuple[int, RosterEntry]]:
+    """Validates raw rows, recording invalid ones in `results`; returns the rest with their row index."""
+    entries = []
+    seen = set()
+    for index, row in enumerate(rows):
+        email = row.get("email") if isinstance(row.get("email"), str) else None
+        try:
+            entry = RosterEntry(**row)
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            results[index] = RosterImportResult(index=index, email=email, status="invalid", error=f"{field}: {error['msg']}")
+            continue
+        if entry.role != "student" and not allow_instructors:
+            results[index] = RosterImportResult(index=index, email=entry.email, status="invalid", error="Only admins may import instructors")
+        elif entry.email in seen:
+            results[index] = RosterImportResult(index=index, email=entry.email, status="invalid", error="Duplicate email in roster")
+        else:
+            seen.add(entry.email)
+            entries.append((index, entry))
+    return entries
+
+async def _existing_emails(emails: List[str]) -> set:
+    existing = set()
+    for chunk in _chunks(emails, ROSTER_LOOKUP_BATCH_SIZE):
+        response = await execute(supabase.table("users").select("email").in_("email", chunk))
+        existing.update(row["email"] for row in response.data or [])
+    return existing
+
+async def import_roster(rows: List[dict], default_class_code: Optional[str] = None, allow_instructors: bool = False) -> List[RosterImportResult]:
+    """
+    Creates users (and default portfolios for students) from roster rows.
+
+    Existing emails are found with batched `in` lookups, passwords are hashed in
+    parallel on the hashing pool, and users and portfolios are inserted in batches
+    of ROSTER_INSERT_BATCH_SIZE. A failed insert marks only its own batch as failed.
+
+    Args:
+        rows: Raw rows from parse_roster.
+        default_class_code: Class code for rows that do not set one.
+        allow_instructors: Whether rows may create instructor accounts.
+
+    Returns:
+        List[RosterImportResult]: One result per row, in roster order.
+    """
+    # postgrest is imported with the Supabase client, on first use
+    from postgrest.exceptions import APIError
+    from postgrest.types import ReturnMethod
+
+    results: Dict[int, RosterImportResult] = {}
+    entries = _validate_rows(rows, allow_instructors, results)
+
+    existing = await _existing_emails([entry.email for _, entry in entries])
+    new_entries = []
+    for index, entry in entries:
+        if entry.email in existing:
+            results[index] = RosterImportResult(index=index, email=entry.email, status="exists", error="Email already registered")
+        else:
+            new_entries.append((index, entry))
+
+    hashes = await get_password_hashes_async([entry.password for _, entry in new_entries])
+
+    for batch in _chunks(list(zip(new_entries, hashes)), ROSTER_INSERT_BATCH_SIZE):
+        # Ids are assigned here so portfolio rows can be built without reading the users back
+        user_rows = [
+            {
+                "id": str(uuid4()),
+                "email": entry.email,
+                "password_hash": password_hash,
+                "role": entry.role,
+                "class_code": entry.class_code or default_class_code,
+            }
+            for (_, entry), password_hash in batch
+        ]
+        try:
+            await execute(supabase.table("users").insert(user_rows, returning=ReturnMethod.minimal))
+        except APIError as e:
+            for (index, entry), _ in batch:
+                results[index] = RosterImportResult(index=index, email=entry.email, status="failed", error=e.message or "User insert failed")
+            continue
+
+        portfolio_rows = [
+            PortfolioBase(user_id=user_row["id"]).model_dump(mode="json")
+            for user_row in user_rows
+            if user_row["role"] == "student"
+        ]
+        portfolio_error = None
+        if portfolio_rows:
+            try:
+                await execute(supabase.table("portfolios").insert(portfolio_rows, returning=ReturnMethod.minimal))
+            except APIError:
+                portfolio_error = "User created but the default portfolio could not be created"
+
+        for ((index, entry), _), user_row in zip(batch, user_rows):
+            failed = portfolio_error and entry.role == "student"
+            results[index] = RosterImportResult(
+                index=index,
+                email=entry.email,
+                status="failed" if failed else "created",
+                user_id=user_row["id"],
+                error=portfolio_error if failed else None,
+            )
+
+    return [results[index] for index in range(len(rows))]
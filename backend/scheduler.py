@@ -0,0 +1,360 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from .database import execute, supabase
+from .leaderboard import leaderboard
+from .orders import order_matcher
+from .streaming import market_stream
+from .shared_cache import global_list_cache
+from .market_simulator import SECTORS, PriceEngine, apply_market_event, bar_recorder, generate_market_event, market
+from .models import MarketScenario
+from .replay import MarketSession, ScenarioReplay, precompute_session
+
+logger = logging.getLogger(__name__)
+
+# Background market simulation settings
+MARKET_SCHEDULER_ENABLED = os.getenv("MARKET_SCHEDULER_ENABLED", "true").lower() == "true"
+MARKET_TICK_SECONDS = float(os.getenv("MARKET_TICK_SECONDS", 1.0))
+# Mean time between generated market events (events arrive as a Poisson process)
+MARKET_EVENT_INTERVAL_SECONDS = float(os.getenv("MARKET_EVENT_INTERVAL_SECONDS", 300))
+# "auto": workers elect the market producer through the market_state lease; "follower": never produce
+MARKET_SCHEDULER_ROLE = os.getenv("MARKET_SCHEDULER_ROLE", "auto").lower()
+# A producer that stops renewing its lease is replaced by another worker after this long
+MARKET_LEADER_LEASE_SECONDS = float(os.getenv("MARKET_LEADER_LEASE_SECONDS", max(5.0, 5 * MARKET_TICK_SECONDS)))
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY_ENABLED", "true").lower() == "true"
+
+class MarketScheduler:
+    """
+    Keeps this worker's price engine in step with the market's single producer.
+
+    Every worker runs a scheduler, but only the one holding the market lease (see the
+    market_sync database function) simulates: each tick it advances all prices, fires
+    market events at random intervals, stores them and publishes the new prices. The
+    other workers apply the published prices and pass on the events stored since their
+    previous tick, so clients see the same market whichever worker serves them. If the
+    producer stops renewing its lease, another worker takes over from the last
+    published prices.
+
+    Other components subscribe with `add_tick_listener` / `add_event_listener` instead
+    of stepping the engine themselves. While a scenario replay is running, the producer
+    takes prices and events from the replay instead of simulating them; replay settings
+    live in `market_state` too, so any worker can start or control a replay.
+    """
+
+    def __init__(
+        self,
+        engine: PriceEngine = market,
+        tick_seconds: float = MARKET_TICK_SECONDS,
+        event_interval_seconds: float = MARKET_EVENT_INTERVAL_SECONDS,
+        role: str = MARKET_SCHEDULER_ROLE,
+        lease_seconds: float = MARKET_LEADER_LEASE_SECONDS,
+        worker_id: Optional[str] = None,
+    ):
+        self.engine = engine
+        self.tick_seconds = tick_seconds
+        self.event_interval_seconds = event_interval_seconds
+        self.role = role
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # True while this worker holds the lease and produces prices
+        self.leader = False
+        self._tick_listeners: List[Callable] = []
+        self._event_listeners: List[Callable] = []
+        self._task: Optional[asyncio.Task] = None
+        self._next_event_at = 0.0
+        # Highest market_events.seq passed to the event listeners
+        self._since: Optional[int] = None
+        # Events this worker stored and already notified, skipped when they come back in the feed
+        self._own_events: Set[str] = set()
+        self.replay: Optional[ScenarioReplay] = None
+        self._replay_config: Optional[Dict] = None
+
+    def add_tick_listener(self, listener: Callable) -> None:
+        """Registers `listener(prices)`, called (or awaited) after every tick."""
+        self._tick_listeners.append(listener)
+
+    def add_event_listener(self, listener: Callable) -> None:
+        """Registers `listener(event_row)`, called (or awaited) after an event is stored."""
+        self._event_listeners.append(listener)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts the background task on the running event loop."""
+        if not self.running:
+            self._schedule_next_event()
+            self._task = asyncio.create_task(self._run(), name="market-scheduler")
+
+    async def stop(self) -> None:
+        """Cancels the background task and, as the producer, hands the lease over right away."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.leader:
+            self.leader = False
+            try:
+                await self._sync(publish=True, lease_seconds=0)
+            except Exception:
+                logger.exception("Failed to release the market lease")
+
+    def _schedule_next_event(self) -> None:
+        if self.event_interval_seconds > 0:
+            self._next_event_at = time.monotonic() + self.engine.rng.exponential(self.event_interval_seconds)
+        else:
+            self._next_event_at = float("inf")
+
+    async def _notify(self, listeners: List[Callable], *args) -> None:
+        for listener in listeners:
+            try:
+                result = listener(*args)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Market scheduler listener %r failed", listener)
+
+    async def tick(self) -> None:
+        """Produces (holding the lease) or follows one tick, then notifies tick listeners."""
+        producing = self.leader
+        if producing:
+            await self._produce()
+        try:
+            state = await self._sync(publish=producing)
+        except Exception:
+            logger.exception("Market sync failed")
+        else:
+            await self._apply_state(state, producing)
+        await self._notify(self._tick_listeners, self.engine.prices)
+
+    async def _produce(self) -> None:
+        """Advances prices (or the replay) and fires a due market event."""
+        if self.replay is not None:
+            for event in self.replay.advance():
+                await self._store_event(event)
+            return
+        self.engine.advance()
+        if time.monotonic() >= self._next_event_at:
+            self._schedule_next_event()
+            await self.trigger_event()
+
+    async def _sync(self, publish: bool, lease_seconds: Optional[float] = None) -> Dict:
+        """Renews or claims the lease through market_sync, publishing prices as the producer."""
+        params = {
+            "p_worker": self.worker_id,
+            "p_lease_seconds": self.lease_seconds if lease_seconds is None else lease_seconds,
+            "p_since": self._since,
+            "p_claim": self.role != "follower",
+        }
+        if publish:
+            # Only listed symbols, so followers drop the ones a finished replay delisted
+            listed = self.engine.listed
+            params["p_symbols"] = [symbol for symbol, ok in zip(self.engine.symbols, listed) if ok]
+            params["p_sectors"] = [SECTORS[i] for i in self.engine.sector_ids[:len(listed)][listed].tolist()]
+            params["p_prices"] = self.engine.prices[:len(listed)][listed].tolist()
+        response = await execute(supabase.rpc("market_sync", params))
+        return response.data
+
+    async def _apply_state(self, state: Dict, producing: bool) -> None:
+        self.leader = bool(state["leader"])
+        if not producing:
+            # Followers, and a worker that just took over, continue from the published prices
+            self._load_prices(state["symbols"], state["prices"])
+            if self.leader:
+                logger.info("Worker %s now produces the market", self.worker_id)
+                self.engine.last_tick = time.monotonic()
+                self._schedule_next_event()
+        elif not self.leader:
+            logger.warning("Worker %s lost the market lease", self.worker_id)
+
+        await self._follow_replay(state.get("replay"))
+        for event in state.get("pending") or []:
+            # Stored by a worker without the lease; the new prices go out with the next tick
+            apply_market_event(event, self.engine)
+
+        if self._since is None:
+            self._since = state["last_seq"]
+        for event in state.get("events") or []:
+            self._since = max(self._since, event["seq"])
+            if event["id"] in self._own_events:
+                self._own_events.discard(event["id"])
+                continue
+            await self._notify(self._event_listeners, event)
+
+    def _load_prices(self, symbols: List[str], prices: List[float]) -> None:
+        # Only symbols listed here; a replay's own symbols come and go with this worker's copy of it
+        indices, values = [], []
+        for symbol, price in zip(symbols, prices):
+            if symbol in self.engine.symbol_index:
+                indices.append(self.engine.symbol_index[symbol])
+                values.append(price)
+        if indices:
+            self.engine.set_prices(np.asarray(indices, dtype=np.intp), np.asarray(values))
+
+    async def trigger_event(self, event: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Applies a market event (a generated one if `event` is None) and stores it.
+
+        A worker without the lease only stores the event, marked pending; the producer
+        applies it on its next tick.
+
+        Returns:
+            Optional[Dict]: The stored `market_events` row, or None if it could not be saved.
+        """
+        event = generate_market_event(self.engine.rng) if event is None else event
+        if self.running and not self.leader:
+            return await self._store_event(event, pending=True)
+        affected = apply_market_event(event, self.engine)
+        logger.info("Market event %s moved %d symbols", event["event_type"], affected)
+        return await self._store_event(event)
+
+    async def _store_event(self, event: Dict, pending: bool = False) -> Optional[Dict]:
+        row = {**event, "event_date": event["event_date"].isoformat()}
+        if pending:
+            row["pending"] = True
+        try:
+            response = await execute(supabase.table("market_events").insert(row))
+        except Exception:
+            logger.exception("Failed to store market event")
+            return None
+        stored = response.data[0] if response.data else None
+        if stored:
+            if self.running:
+                self._own_events.add(stored["id"])
+            await self._notify(self._event_listeners, stored)
+        return stored
+
+    # --- Scenario replay ---
+
+    def replay_config(self, replay: ScenarioReplay, seek: bool = False) -> Dict:
+        """
+        Shared settings for `replay`, as stored in market_state.replay.
+
+        The position is anchored to wall-clock time, so every worker computes the same
+        position; `seek` makes the producer jump there instead of playing on.
+        """
+        current = self._replay_config if self.replay is replay else None
+        return {
+            "id": uuid.uuid4().hex,
+            "key": current["key"] if current else uuid.uuid4().hex,
+            "scenario": replay.session.scenario.model_dump(mode="json"),
+            "start_date": replay.session.start_date.isoformat(),
+            "speed": replay.speed,
+            "paused": replay.paused,
+            "position": replay.position(),
+            "at": time.time(),
+            "seek": seek,
+        }
+
+    async def set_replay(self, config: Optional[Dict], replay: Optional[ScenarioReplay] = None) -> None:
+        """
+        Shares replay settings (None stops the replay) with every worker and applies them here.
+
+        `replay` is the replay `config` was made from, when the caller already built it.
+        """
+        await execute(supabase.table("market_state").update({"replay": config}).eq("id", 1))
+        await self._apply_replay(config, replay)
+
+    async def _follow_replay(self, config: Optional[Dict]) -> None:
+        """Picks up replay changes made through other workers; only the producer holds the engine."""
+        if (config or {}).get("id") != (self._replay_config or {}).get("id"):
+            await self._apply_replay(config)
+        if self.replay is not None and self.engine.held != self.leader:
+            if self.leader:
+                self.replay.attach()
+            else:
+                self.replay.detach()
+
+    async def _apply_replay(self, config: Optional[Dict], replay: Optional[ScenarioReplay] = None) -> None:
+        current, self._replay_config = self._replay_config, config
+        if config is None:
+            replay, self.replay = self.replay, None
+            if replay is not None:
+                if self.engine.held:
+                    replay.detach()
+                    self._schedule_next_event()
+                replay.release()
+            return
+
+        position = config["position"]
+        if not config["paused"]:
+            position += config["speed"] * (time.time() - config["at"])
+        if replay is None and self.replay is not None and current is not None and current["key"] == config["key"]:
+            self.replay.control(speed=config["speed"], paused=config["paused"], position=position if config["seek"] else None)
+            return
+        if replay is None:
+            scenario = MarketScenario(**config["scenario"])
+            session: MarketSession = await asyncio.to_thread(precompute_session, scenario, datetime.fromisoformat(config["start_date"]))
+            replay = ScenarioReplay(session, self.engine, speed=config["speed"], position=position)
+            replay.control(paused=config["paused"])
+        if self.replay is not None:
+            if self.engine.held:
+                self.replay.detach()
+            self.replay.release(replay)
+        self.replay = replay
+        if self.leader or not self.running:
+            replay.attach()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Market scheduler tick failed")
+
+async def record_price_bar(prices) -> None:
+    """
+    Tick listener that folds prices into OHLC bars and persists each completed bar.
+
+    Only the market producer records, so every bar is written once, and replayed
+    prices are simulated history rather than the market's own, so they are skipped.
+    """
+    if not scheduler.leader or scheduler.replay is not None:
+        if bar_recorder.pending() is not None:
+            await asyncio.to_thread(bar_recorder.flush, bar_recorder.reset())
+        return
+    bar = bar_recorder.record(market.symbols, prices)
+    if bar is not None:
+        await asyncio.to_thread(bar_recorder.flush, bar)
+
+def match_orders(prices) -> None:
+    """Tick listener that matches resting orders; only the market producer matches, so each fill is made once."""
+    order_matcher.on_tick(prices, leader=scheduler.leader)
+
+async def invalidate_market_events(event_row: Dict) -> None:
+    """Event listener that drops the cached /market-events response for every worker."""
+    await global_list_cache.invalidate("market_events")
+
+# Shared scheduler used by the API
+scheduler = MarketScheduler()
+scheduler.add_event_listener(invalidate_market_events)
+scheduler.add_tick_listener(match_orders)
+scheduler.add_tick_listener(leaderboard.on_tick)
+scheduler.add_tick_listener(market_stream.on_tick)
+scheduler.add_event_listener(market_stream.on_event)
+if PRICE_HISTORY_ENABLED:
+    scheduler.add_tick_listener(record_price_bar)
+
+# Usage: python -m backend.scheduler
+# Runs a market producer on its own, e.g. next to API workers started with MARKET_SCHEDULER_ROLE=follower
+if __name__ == "__main__":
+    async def run_producer() -> None:
+        scheduler.start()
+        await asyncio.Event().wait()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_producer())
@@ -0,0 +1,32 @@
+import json
+import os
+from typing import Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+# Routes that opt in serve trusted database rows as-is; set to false to validate every response
+FAST_SERIALIZATION_ENABLED = os.getenv("FAST_SERIALIZATION_ENABLED", "true").lower() == "true"
+
+def dumps(content) -> bytes:
+    """Encodes JSON-native content (e.g. rows as returned by PostgREST) compactly, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+class RawJSONResponse(Response):
+    """JSON response for content that is already JSON-native, encoded without jsonable_encoder."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def model_columns(model: Type[BaseModel]) -> str:
+    """Select list of exactly `model`'s fields, so trusted rows need no filtering."""
+    return ", ".join(model.model_fields)
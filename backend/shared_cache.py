@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Shared response cache: one SQLite file used by every worker process on the host
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "finlit_response_cache.sqlite3"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 60))
+# How long a cache call waits for another worker's write lock before giving up
+RESPONSE_CACHE_BUSY_TIMEOUT_MS = int(os.getenv("RESPONSE_CACHE_BUSY_TIMEOUT_MS", 50))
+# Fraction of writes that also delete every expired entry, so the file stays bounded
+RESPONSE_CACHE_PURGE_FRACTION = float(os.getenv("RESPONSE_CACHE_PURGE_FRACTION", 0.05))
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+class SharedResponseCache:
+    """
+    Pre-serialized JSON responses stored in a local SQLite file.
+
+    Every uvicorn worker on the host opens the same file (in WAL mode, so reads never
+    block on writes), which means an invalidation made by one worker is seen by all of
+    them on their next lookup. Lookups are a single primary-key read.
+
+    SQLite calls run on a worker thread so they never block the event loop, and wait at
+    most `busy_timeout_ms` for a lock: a lookup that cannot get one counts as a miss and a
+    write is skipped, so a busy cache costs a database query rather than a stalled request.
+    Expired entries are deleted by a sampled `purge_fraction` of writes.
+    """
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_PATH,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        busy_timeout_ms: int = RESPONSE_CACHE_BUSY_TIMEOUT_MS,
+        purge_fraction: float = RESPONSE_CACHE_PURGE_FRACTION,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        self.purge_fraction = purge_fraction
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT NOT NULL, "
+                "headers TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Returns the cached response for `key`, or None if missing, expired or locked."""
+        try:
+            rows = await asyncio.to_thread(
+                self._execute, "SELECT body, etag, headers FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+            )
+        except sqlite3.OperationalError:
+            logger.warning("Response cache busy; treating %s as a miss", key)
+            rows = []
+        if not rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        body, etag, headers = rows[0]
+        return CachedResponse(body, etag, json.loads(headers))
+
+    async def set(self, key: str, body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """Stores a serialized response body under `key` (unless the cache is locked) and returns it with its ETag."""
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers = headers or {}
+        now = time.time()
+        try:
+            await asyncio.to_thread(
+                self._execute,
+                "INSERT OR REPLACE INTO responses (key, body, etag, headers, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, body, etag, json.dumps(headers), now + self.ttl_seconds),
+            )
+            if random.random() < self.purge_fraction:
+                await asyncio.to_thread(self._execute, "DELETE FROM responses WHERE expires_at <= ?", (now,))
+        except sqlite3.OperationalError:
+            logger.warning("Response cache busy; not storing %s", key)
+        return CachedResponse(body, etag, headers)
+
+    async def invalidate(self, prefix: str) -> None:
+        """
+        Removes every entry whose key starts with `prefix`, for all workers.
+
+        A locked cache is retried a few times; if it stays locked, the entries are left to
+        expire (at most `ttl_seconds` later).
+        """
+        for attempt in range(3):
+            try:
+                await asyncio.to_thread(self._execute, "DELETE FROM responses WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+                return
+            except sqlite3.OperationalError:
+                await asyncio.sleep(self.busy_timeout_ms / 1000 * (attempt + 1))
+        logger.warning("Response cache busy; %s* entries expire on their own", prefix)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns this worker's hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+async def cached_json_response(
+    request: Request,
+    cache: SharedResponseCache,
+    key: str,
+    loader: Callable[[], Awaitable[Tuple[object, Dict[str, str]]]],
+    trusted: bool = False,
+) -> Response:
+    """
+    Serves a JSON response from `cache`, calling `loader` to build and store it on a miss.
+
+    `loader` returns the response content and any extra headers; with `trusted`, the
+    content must already be JSON-native (e.g. database rows) and skips jsonable_encoder.
+    Responses carry an ETag, and a matching If-None-Match gets an empty 304.
+    """
+    entry = await cache.get(key)
+    if entry is None:
+        content, headers = await loader()
+        body = dumps(content if trusted else jsonable_encoder(content))
+        entry = await cache.set(key, body, headers)
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache", **entry.headers}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+# Shared cache for lists every user sees (market events, webinars)
+global_list_cache = SharedResponseCache()
@@ -0,0 +1,82 @@
+import argparse
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Import deferred modules and create the shared clients in the background once the worker is serving
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "true").lower() == "true"
+
+# Slow-to-import packages the backend only loads on first use
+DEFERRED_IMPORTS = ("openai", "pandas")
+
+def prewarm() -> None:
+    """
+    Loads what request paths would otherwise load on first use.
+
+    Meant to run in a thread after startup, so a new worker starts serving first and
+    the first chatbot or analytics request does not pay for the imports.
+    """
+    from .chatbot import get_client
+    from .database import get_supabase
+
+    started = time.perf_counter()
+    get_supabase()
+    for module in DEFERRED_IMPORTS:
+        importlib.import_module(module)
+    get_client()
+    logger.info("Prewarmed clients and deferred imports in %.2fs", time.perf_counter() - started)
+
+def import_times(module: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """
+    Imports `module` in a fresh interpreter under `python -X importtime`.
+
+    Returns:
+        Tuple[float, List[Tuple[str, int, int]]]: Wall-clock seconds for the whole
+        interpreter run, and (module, self us, cumulative us) for every import.
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONPROFILEIMPORTTIME": ""},
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"import {module} failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return elapsed, rows
+
+def report(module: str = "backend.main", top: int = 15) -> str:
+    """Formats the import-time breakdown of `module`: totals per top-level package, then the slowest modules."""
+    elapsed, rows = import_times(module)
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    total_us = sum(self_us for _, self_us, _ in rows)
+
+    lines = [f"import {module}: {total_us / 1e6:.3f}s in imports, {elapsed:.3f}s interpreter run", "", "By package (self time):"]
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {self_us / 1e3:9.1f} ms  {100 * self_us / total_us:5.1f}%  {package}")
+    lines += ["", "Slowest modules (cumulative time):"]
+    for name, _, cumulative_us in sorted(rows, key=lambda row: -row[2])[:top]:
+        lines.append(f"  {cumulative_us / 1e3:9.1f} ms  {name}")
+    return "\n".join(lines)
+
+# Usage: python -m backend.startup [--module backend.main] [--top 15]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report where worker start-up time goes, from python -X importtime.")
+    parser.add_argument("--module", default="backend.main", help="Module to import (default: backend.main)")
+    parser.add_argument("--top", type=int, default=15, help="Rows per section")
+    args = parser.parse_args()
+    print(report(args.module, args.top))
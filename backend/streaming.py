@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Optional, Set
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from .market_simulator import PriceEngine, market
+
+logger = logging.getLogger(__name__)
+
+# Per-connection cap on price messages; ticks in between are coalesced into the next one
+STREAM_MAX_UPDATES_PER_SECOND = float(os.getenv("STREAM_MAX_UPDATES_PER_SECOND", 2))
+# Market events held for a connection before it is treated as too slow and closed
+STREAM_MAX_PENDING_EVENTS = int(os.getenv("STREAM_MAX_PENDING_EVENTS", 32))
+# A send that takes longer than this closes the connection
+STREAM_SEND_TIMEOUT_SECONDS = float(os.getenv("STREAM_SEND_TIMEOUT_SECONDS", 5))
+STREAM_MAX_SYMBOLS = int(os.getenv("STREAM_MAX_SYMBOLS", 200))
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", 2000))
+
+class StreamConnection:
+    """
+    One subscriber. Price updates are level-triggered: the hub only marks the
+    connection dirty, and its sender task sends the latest snapshot at most
+    STREAM_MAX_UPDATES_PER_SECOND times a second, so a slow client never builds
+    up a backlog of stale prices. Events are queued and bounded.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.symbols: Set[int] = set()
+        self.symbols_key: tuple = ()
+        self.events = False
+        self.prices_dirty = False
+        self.pending_events: deque = deque()
+        self.overflowed = False
+        self.wakeup = asyncio.Event()
+
+    def subscribe(self, symbols: Set[int], events: Optional[bool]) -> None:
+        self.symbols |= symbols
+        self.symbols_key = tuple(sorted(self.symbols))
+        if events is not None:
+            self.events = events
+        self.prices_dirty = bool(self.symbols)
+        self.wakeup.set()
+
+    def unsubscribe(self, symbols: Set[int], events: Optional[bool]) -> None:
+        self.symbols -= symbols
+        self.symbols_key = tuple(sorted(self.symbols))
+        if events:
+            self.events = False
+
+    def mark_prices(self) -> None:
+        if self.symbols:
+            self.prices_dirty = True
+            self.wakeup.set()
+
+    def push_event(self, message: str) -> None:
+        if not self.events:
+            return
+        if len(self.pending_events) >= STREAM_MAX_PENDING_EVENTS:
+            self.overflowed = True
+        else:
+            self.pending_events.append(message)
+        self.wakeup.set()
+
+class MarketStreamHub:
+    """
+    Fans out simulator prices and market events to WebSocket subscribers.
+
+    The hub is the single producer: it is registered as a scheduler tick and event
+    listener, snapshots prices once per tick, and encodes each distinct price
+    message once per tick no matter how many connections share a subscription.
+
+    Client messages:
+        {"action": "subscribe", "symbols": ["AAPL", ...], "events": true}
+        {"action": "unsubscribe", "symbols": ["AAPL"], "events": true}
+
+    Server messages:
+        {"type": "prices", "ts": <unix seconds>, "prices": {"AAPL": 172.1, ...}}
+        {"type": "event", "event": {<market_events row>}}
+        {"type": "error", "detail": "..."}
+    """
+
+    def __init__(self, engine: PriceEngine = market):
+        self.engine = engine
+        self.connections: Set[StreamConnection] = set()
+        self._prices = np.empty(0)
+        self._prices_ts = 0.0
+        self._encoded: Dict[tuple, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def on_tick(self, prices: np.ndarray) -> None:
+        """Scheduler tick listener: snapshots prices and wakes every price subscriber."""
+        if not self.connections:
+            return
+        self._prices = prices.copy()
+        self._prices_ts = time.time()
+        self._encoded = {}
+        for connection in self.connections:
+            connection.mark_prices()
+
+    def on_event(self, event_row: Dict) -> None:
+        """Scheduler event listener: queues the stored event for every event subscriber."""
+        message = json.dumps({"type": "event", "event": event_row}, default=str)
+        for connection in self.connections:
+            connection.push_event(message)
+
+    def _price_message(self, symbols_key: tuple) -> str:
+        message = self._encoded.get(symbols_key)
+        if message is None:
+            if len(self._prices) < len(self.engine):
+                self._prices = self.engine.prices.copy()
+                self._prices_ts = time.time()
+            prices = self._prices[list(symbols_key)].round(4).tolist()
+            message = json.dumps({
+                "type": "prices",
+                "ts": round(self._prices_ts, 3),
+                "prices": dict(zip((self.engine.symbols[i] for i in symbols_key), prices)),
+            })
+            self._encoded[symbols_key] = message
+        return message
+
+    async def _send(self, connection: StreamConnection, message: str) -> None:
+        await asyncio.wait_for(connection.websocket.send_text(message), STREAM_SEND_TIMEOUT_SECONDS)
+
+    async def _sender(self, connection: StreamConnection) -> None:
+        interval = 1 / STREAM_MAX_UPDATES_PER_SECOND if STREAM_MAX_UPDATES_PER_SECOND > 0 else 0
+        last_prices_at = 0.0
+        while True:
+            await connection.wakeup.wait()
+            connection.wakeup.clear()
+            if connection.overflowed:
+                await connection.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Client is not keeping up")
+                return
+            while connection.pending_events:
+                await self._send(connection, connection.pending_events.popleft())
+            if connection.prices_dirty:
+                wait = last_prices_at + interval - time.monotonic()
+                if wait > 0:
+                    # Rate cap: later ticks fold into this message while we wait
+                    await asyncio.sleep(wait)
+                connection.prices_dirty = False
+                if connection.symbols_key:
+                    last_prices_at = time.monotonic()
+                    await self._send(connection, self._price_message(connection.symbols_key))
+
+    def _handle(self, connection: StreamConnection, raw: str) -> Optional[str]:
+        """Applies a client message; returns an error message to send back, if any."""
+        try:
+            message = json.loads(raw)
+            action = message["action"]
+            names = list(message.get("symbols") or [])
+            events = message.get("events")
+            if action not in ("subscribe", "unsubscribe") or not all(isinstance(name, str) for name in names):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return json.dumps({"type": "error", "detail": "Expected {\"action\": \"subscribe\"|\"unsubscribe\", \"symbols\": [...], \"events\": bool}"})
+
+        unknown = [name for name in names if name not in self.engine.symbol_index]
+        symbols = {self.engine.symbol_index[name] for name in names if name in self.engine.symbol_index}
+        if action == "subscribe":
+            if len(connection.symbols | symbols) > STREAM_MAX_SYMBOLS:
+                return json.dumps({"type": "error", "detail": f"At most {STREAM_MAX_SYMBOLS} symbols per connection"})
+            connection.subscribe(symbols, events)
+        else:
+            connection.unsubscribe(symbols, events)
+        if unknown:
+            return json.dumps({"type": "error", "detail": f"Unknown symbols: {', '.join(map(str, unknown[:20]))}"})
+        return None
+
+    async def serve(self, websocket: WebSocket, user_id) -> None:
+        """Accepts `websocket` and streams to it until either side disconnects."""
+        if len(self.connections) >= STREAM_MAX_CONNECTIONS:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many connections")
+            return
+        await websocket.accept()
+        connection = StreamConnection(websocket, user_id)
+        self.connections.add(connection)
+        sender = asyncio.create_task(self._sender(connection), name="market-stream-sender")
+        receiver = asyncio.create_task(self._receive(connection), name="market-stream-receiver")
+        try:
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is not None and not isinstance(error, (WebSocketDisconnect, asyncio.TimeoutError)):
+                    logger.warning("Market stream for user %s failed: %r", user_id, error)
+        finally:
+            self.connections.discard(connection)
+            sender.cancel()
+            receiver.cancel()
+
+    async def _receive(self, connection: StreamConnection) -> None:
+        while True:
+            error = self._handle(connection, await connection.websocket.receive_text())
+            if error is not None:
+                connection.pending_events.append(error)
+                connection.wakeup.set()
+
+# Shared hub used by the API
+market_stream = MarketStreamHub()
@@ -0,0 +1,90 @@
+import os
+from typing import List
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+from .database import execute, supabase
+from .models import TradeBase, TradeBatchResult, TradeInDB
+
+# Upper bound on orders accepted by a single batch call
+TRADE_BATCH_MAX_SIZE = int(os.getenv("TRADE_BATCH_MAX_SIZE", 500))
+
+# SQLSTATEs raised by the execute_trade database function (see supabase/migrations)
+TRADE_ERROR_STATUS = {
+    "P0002": status.HTTP_404_NOT_FOUND,
+    "42501": status.HTTP_403_FORBIDDEN,
+    "P0001": status.HTTP_400_BAD_REQUEST,
+    "22023": status.HTTP_400_BAD_REQUEST,
+}
+
+def trade_params(user_id: UUID, trade_data: TradeBase) -> dict:
+    """Builds the JSON arguments for the execute_trade database function."""
+    return {
+        "p_user_id": str(user_id),
+        "p_portfolio_id": str(trade_data.portfolio_id),
+        "p_symbol": trade_data.symbol,
+        "p_quantity": trade_data.quantity,
+        "p_price": trade_data.price,
+        "p_side": trade_data.side,
+    }
+
+async def execute_trade_atomic(user_id: UUID, trade_data: TradeBase) -> TradeInDB:
+    """
+    Executes a trade with a single round-trip to the execute_trade database function.
+
+    The function checks ownership, balance (BUY) or holdings (SELL), updates the portfolio
+    and holdings, and inserts the trade in one transaction.
+
+    Raises:
+        HTTPException: If the database rejects the trade or the call fails.
+
+    Returns:
+        TradeInDB: The recorded trade.
+    """
+    # postgrest is imported with the Supabase client, on first use
+    from postgrest.exceptions import APIError
+
+    try:
+        response = await execute(supabase.rpc("execute_trade", trade_params(user_id, trade_data)))
+    except APIError as e:
+        if e.code in TRADE_ERROR_STATUS:
+            raise HTTPException(status_code=TRADE_ERROR_STATUS[e.code], detail=e.message)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Trade execution failed")
+    if not response.data:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Trade execution failed")
+    trade = response.data[0] if isinstance(response.data, list) else response.data
+    return TradeInDB(**trade)
+
+async def execute_trade_batch_atomic(user_id: UUID, orders: List[TradeBase]) -> List[TradeBatchResult]:
+    """
+    Executes many orders with a single round-trip to the execute_trade_batch database function.
+
+    Each order is applied in its own subtransaction, so rejected orders do not affect the rest.
+
+    Raises:
+        HTTPException: If the batch call itself fails.
+
+    Returns:
+        List[TradeBatchResult]: One result per order, in submission order.
+    """
+    from postgrest.exceptions import APIError
+
+    payload = [order.model_dump(mode="json") for order in orders]
+    try:
+        response = await execute(supabase.rpc("execute_trade_batch", {"p_user_id": str(user_id), "p_orders": payload}))
+    except APIError:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Batch trade execution failed")
+
+    results = []
+    for result in sorted(response.data or [], key=lambda r: r["index"]):
+        if result["status"] == "filled":
+            results.append(TradeBatchResult(index=result["index"], status="filled", trade=TradeInDB(**result["trade"])))
+        else:
+            results.append(TradeBatchResult(
+                index=result["index"],
+                status="rejected",
+                error=result.get("error"),
+                status_code=TRADE_ERROR_STATUS.get(result.get("code"), status.HTTP_500_INTERNAL_SERVER_ERROR),
+            ))
+    return results
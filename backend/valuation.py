@@ -0,0 +1,141 @@
+import logging
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .database import execute, fetch_all, supabase
+from .market_simulator import PriceEngine, market
+
+logger = logging.getLogger(__name__)
+
+class HoldingsBook:
+    """
+    Columnar (portfolio x symbol) view of every portfolio's holdings.
+
+    Holdings are stored as coordinate arrays (portfolio index, symbol index, quantity),
+    with symbol indices pointing straight into a PriceEngine's price vector, so valuing
+    every portfolio is one gather, one multiply and one bincount over the holdings.
+    Each (portfolio, symbol) pair has one coordinate, and an index of each portfolio's
+    coordinates lets a trade be applied and its portfolio revalued in O(its holdings).
+    """
+
+    def __init__(self, portfolio_ids: List[str], balances: np.ndarray, portfolio_idx: np.ndarray, symbol_idx: np.ndarray, quantities: np.ndarray):
+        self.portfolio_ids = portfolio_ids
+        self.portfolio_index: Dict[str, int] = {pid: i for i, pid in enumerate(portfolio_ids)}
+        self.balances = balances
+        # Coordinate arrays have spare capacity so trades can be appended cheaply
+        self._size = len(quantities)
+        self._portfolio_idx = portfolio_idx
+        self._symbol_idx = symbol_idx
+        self._quantities = quantities
+        self._coordinate: Dict[Tuple[int, int], int] = {}
+        self._coordinates: Dict[int, List[int]] = {}
+        for i, key in enumerate(zip(portfolio_idx[:self._size].tolist(), symbol_idx[:self._size].tolist())):
+            self._coordinate[key] = i
+            self._coordinates.setdefault(key[0], []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.portfolio_ids)
+
+    @property
+    def portfolio_idx(self) -> np.ndarray:
+        return self._portfolio_idx[:self._size]
+
+    @property
+    def symbol_idx(self) -> np.ndarray:
+        return self._symbol_idx[:self._size]
+
+    @property
+    def quantities(self) -> np.ndarray:
+        return self._quantities[:self._size]
+
+    @classmethod
+    def from_rows(cls, portfolio_rows: List[dict], holding_rows: List[dict], engine: PriceEngine = market) -> "HoldingsBook":
+        """
+        Builds the book from `portfolios` (id, balance) and `holdings` (portfolio_id, symbol, quantity) rows.
+
+        Delisted symbols are valued at their last price. Symbols the engine never listed
+        are skipped (valued at 0) and logged, rather than added to the market.
+        """
+        portfolio_ids = [str(row["id"]) for row in portfolio_rows]
+        portfolio_index = {pid: i for i, pid in enumerate(portfolio_ids)}
+        balances = np.fromiter((float(row["balance"]) for row in portfolio_rows), dtype=float, count=len(portfolio_rows))
+
+        # Holdings of portfolios created after the portfolio read are skipped until the next load
+        holding_rows = [row for row in holding_rows if str(row["portfolio_id"]) in portfolio_index]
+        indices = [engine.price_index(row["symbol"]) for row in holding_rows]
+        unknown = sorted({row["symbol"] for row, index in zip(holding_rows, indices) if index is None})
+        if unknown:
+            logger.warning("Valuing holdings in %d unknown symbols at 0: %s", len(unknown), ", ".join(map(str, unknown[:20])))
+            holding_rows = [row for row, index in zip(holding_rows, indices) if index is not None]
+            indices = [index for index in indices if index is not None]
+        portfolio_idx = np.fromiter((portfolio_index[str(row["portfolio_id"])] for row in holding_rows), dtype=np.intp, count=len(holding_rows))
+        symbol_idx = np.array(indices, dtype=np.intp)
+        quantities = np.fromiter((row["quantity"] for row in holding_rows), dtype=float, count=len(holding_rows))
+        return cls(portfolio_ids, balances, portfolio_idx, symbol_idx, quantities)
+
+    def values(self, prices: np.ndarray) -> np.ndarray:
+        """Returns the total value (cash + holdings) of every portfolio at `prices`."""
+        holdings_value = np.bincount(
+            self.portfolio_idx,
+            weights=self.quantities * prices[self.symbol_idx],
+            minlength=len(self.portfolio_ids),
+        )
+        return self.balances + holdings_value
+
+    def value_of(self, portfolio: int, prices: np.ndarray) -> float:
+        """Returns the total value of the portfolio at index `portfolio`."""
+        coordinates = np.array(self._coordinates.get(portfolio, ()), dtype=np.intp)
+        return float(self.balances[portfolio] + np.dot(self._quantities[coordinates], prices[self._symbol_idx[coordinates]]))
+
+    def apply_trade(self, portfolio: int, symbol: int, quantity: float, cash: float) -> None:
+        """
+        Records a fill: `quantity` shares of `symbol` (negative for a sale) and a `cash`
+        change to the balance. The fill updates the pair's coordinate in place; only a
+        symbol new to the portfolio adds one.
+        """
+        self.balances[portfolio] += cash
+        coordinate = self._coordinate.get((portfolio, symbol))
+        if coordinate is not None:
+            self._quantities[coordinate] += quantity
+            return
+        if self._size == len(self._quantities):
+            capacity = max(2 * self._size, 16)
+            for name in ("_portfolio_idx", "_symbol_idx", "_quantities"):
+                old = getattr(self, name)
+                new = np.empty(capacity, dtype=old.dtype)
+                new[:self._size] = old[:self._size]
+                setattr(self, name, new)
+        self._portfolio_idx[self._size] = portfolio
+        self._symbol_idx[self._size] = symbol
+        self._quantities[self._size] = quantity
+        self._coordinate[(portfolio, symbol)] = self._size
+        self._coordinates.setdefault(portfolio, []).append(self._size)
+        self._size += 1
+
+async def load_holdings_book(engine: PriceEngine = market) -> HoldingsBook:
+    """Loads every portfolio and holding from Supabase into a HoldingsBook."""
+    portfolio_rows = await fetch_all(lambda: supabase.table("portfolios").select("id, balance").order("id"))
+    holding_rows = await fetch_all(lambda: supabase.table("holdings").select("portfolio_id, symbol, quantity").order("portfolio_id").order("symbol"))
+    return HoldingsBook.from_rows(portfolio_rows, holding_rows, engine)
+
+async def revalue_all_portfolios(engine: PriceEngine = market) -> dict:
+    """
+    Recomputes `total_value` for every portfolio and writes them back in one call.
+
+    Returns:
+        dict: The number of portfolios updated and the time taken.
+    """
+    started = time.perf_counter()
+    book = await load_holdings_book(engine)
+    engine.advance()
+    totals = np.round(book.values(engine.prices), 2)
+    response = await execute(supabase.rpc("update_portfolio_values", {
+        "p_ids": book.portfolio_ids,
+        "p_values": totals.tolist(),
+    }))
+    return {
+        "portfolios_updated": response.data or 0,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,370 @@
+"""
+Local stand-ins for Supabase (PostgREST) and the OpenAI API, for benchmarking.
+
+Both are small Starlette apps with a configurable per-request latency. The fake
+PostgREST keeps tables in memory and implements the subset of the REST dialect
+and the RPC functions (supabase/migrations) that the backend uses.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Column defaults applied on insert, per table
+TABLE_DEFAULTS = {
+    "users": {"role": "student", "profile": None, "password_hash": None},
+    "portfolios": {"balance": 10000.0, "total_value": None},
+    "trades": {},
+    "holdings": {},
+    "market_events": {"description": None, "impact": None, "pending": False},
+    "webinars": {"description": None, "duration_minutes": 60, "recording_url": None},
+    "chatbot_interactions": {"feedback": None},
+    "orders": {"limit_price": None, "stop_price": None, "status": "open", "trade_id": None, "error": None, "filled_at": None},
+    "market_state": {"leader": None, "lease_expires_at": None, "symbols": [], "sectors": [], "prices": [], "replay": None, "published_at": None},
+}
+# Columns filled from a sequence on insert, per table
+SEQUENCE_COLUMNS = {
+    "market_events": "seq",
+}
+# Columns filled with the insert time, per table
+TIMESTAMP_COLUMNS = {
+    "users": ("created_at", "updated_at"),
+    "portfolios": ("created_at", "updated_at"),
+    "trades": ("executed_at",),
+    "holdings": ("updated_at",),
+    "market_events": ("event_date",),
+    "webinars": ("created_at",),
+    "chatbot_interactions": ("interaction_at",),
+    "orders": ("created_at", "updated_at"),
+}
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class PostgrestError(Exception):
+    def __init__(self, code: str, message: str, status_code: int = 400):
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+def _split_top_level(expression: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+def _compare(row_value, operator: str, value: str) -> bool:
+    if operator == "is":
+        return row_value is None if value == "null" else str(row_value).lower() == value
+    if operator == "in":
+        return str(row_value) in [v.strip('"') for v in _split_top_level(value.strip("()"))]
+    if row_value is None:
+        return False
+    value = value.strip('"')
+    if isinstance(row_value, (int, float)) and not isinstance(row_value, bool):
+        left, right = float(row_value), float(value)
+    else:
+        left, right = str(row_value), value
+    return {
+        "eq": left == right, "neq": left != right,
+        "lt": left < right, "lte": left <= right,
+        "gt": left > right, "gte": left >= right,
+    }[operator]
+
+def _condition(expression: str):
+    """Parses "col.op.value", "or(...)" or "and(...)" into a row predicate."""
+    for logical, combine in (("or", any), ("and", all)):
+        if expression.startswith(logical + "("):
+            children = [_condition(part) for part in _split_top_level(expression[len(logical) + 1:-1])]
+            return lambda row, children=children, combine=combine: combine(child(row) for child in children)
+    column, operator, value = expression.split(".", 2)
+    return lambda row: _compare(row.get(column), operator, value)
+
+def _filters(params) -> list:
+    predicates = []
+    for key, value in params.multi_items():
+        if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+            continue
+        if key in ("or", "and"):
+            predicates.append(_condition(f"{key}{value}"))
+        else:
+            operator, operand = value.split(".", 1)
+            predicates.append(lambda row, c=key, o=operator, v=operand: _compare(row.get(c), o, v))
+    return predicates
+
+class FakePostgrest:
+    """In-memory tables behind a PostgREST-compatible HTTP interface."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[dict]] = {name: [] for name in TABLE_DEFAULTS}
+        self.sequences = itertools.count(1)
+        self.requests = 0
+        self.reset()
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{function}", self.rpc, methods=["POST"]),
+            Route("/rest/v1/{table}", self.table, methods=["GET", "POST", "PATCH", "DELETE"]),
+        ])
+
+    def reset(self) -> None:
+        """Empties every table, leaving the rows the migrations seed."""
+        for rows in self.tables.values():
+            rows.clear()
+        self._insert("market_state", {"id": 1})
+
+    # --- Table access ---
+
+    def _insert(self, table: str, row: dict) -> dict:
+        row = {**TABLE_DEFAULTS.get(table, {}), **row}
+        if table != "holdings":
+            row.setdefault("id", str(uuid.uuid4()))
+        if table in SEQUENCE_COLUMNS:
+            row[SEQUENCE_COLUMNS[table]] = next(self.sequences)
+        for column in TIMESTAMP_COLUMNS.get(table, ()):
+            row.setdefault(column, _now())
+        self.tables.setdefault(table, []).append(row)
+        return row
+
+    def _select(self, table: str, params) -> List[dict]:
+        predicates = _filters(params)
+        rows = [row for row in self.tables.get(table, []) if all(p(row) for p in predicates)]
+        for term in reversed((params.get("order") or "").split(",")):
+            if term:
+                column, _, direction = term.partition(".")
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or ""), reverse=direction.startswith("desc"))
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        select = params.get("select", "*")
+        if select != "*":
+            columns = [c.strip() for c in select.split(",") if "(" not in c]
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return rows
+
+    async def table(self, request: Request) -> Response:
+        await asyncio.sleep(self.latency)
+        self.requests += 1
+        table = request.path_params["table"]
+        params = request.query_params
+        single = request.headers.get("accept") == "application/vnd.pgrst.object+json"
+        body = await request.json() if request.method in ("POST", "PATCH") else None
+        # Handlers run on one event loop and never await while mutating, so no lock is needed
+        if request.method == "GET":
+            rows = self._select(table, params)
+        elif request.method == "POST":
+            rows = [self._insert(table, row) for row in (body if isinstance(body, list) else [body])]
+        elif request.method == "PATCH":
+            predicates = _filters(params)
+            rows = [row for row in self.tables.get(table, []) if all(p(row) for p in predicates)]
+            for row in rows:
+                row.update(body)
+                # Mirrors the update_*_updated_at triggers
+                if "updated_at" in TIMESTAMP_COLUMNS.get(table, ()):
+                    row["updated_at"] = _now()
+        else:
+            predicates = _filters(params)
+            rows = [row for row in self.tables.get(table, []) if all(p(row) for p in predicates)]
+            self.tables[table] = [row for row in self.tables.get(table, []) if row not in rows]
+        if single:
+            if len(rows) != 1:
+                return JSONResponse({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned", "details": None, "hint": None}, status_code=406)
+            return JSONResponse(rows[0])
+        return JSONResponse(rows)
+
+    # --- RPC functions (mirror supabase/migrations) ---
+
+    def execute_trade(self, p_user_id, p_portfolio_id, p_symbol, p_quantity, p_price, p_side) -> dict:
+        if p_side not in ("BUY", "SELL"):
+            raise PostgrestError("22023", "Invalid trade side")
+        portfolio = next((row for row in self.tables["portfolios"] if row["id"] == p_portfolio_id), None)
+        if portfolio is None:
+            raise PostgrestError("P0002", "Portfolio not found")
+        if portfolio["user_id"] != p_user_id:
+            raise PostgrestError("42501", "Not authorized to trade for this portfolio", 403)
+        cost = round(p_quantity * p_price, 2)
+        holding = next((row for row in self.tables["holdings"] if row["portfolio_id"] == p_portfolio_id and row["symbol"] == p_symbol), None)
+        if p_side == "BUY":
+            if portfolio["balance"] < cost:
+                raise PostgrestError("P0001", "Insufficient balance for this trade")
+            portfolio["balance"] -= cost
+            if holding is None:
+                self._insert("holdings", {"portfolio_id": p_portfolio_id, "symbol": p_symbol, "quantity": p_quantity, "average_cost": p_price})
+            else:
+                holding["average_cost"] = (holding["average_cost"] * holding["quantity"] + cost) / (holding["quantity"] + p_quantity)
+                holding["quantity"] += p_quantity
+        else:
+            if holding is None or holding["quantity"] < p_quantity:
+                raise PostgrestError("P0001", "Insufficient holdings for this trade")
+            holding["quantity"] -= p_quantity
+            if holding["quantity"] == 0:
+                self.tables["holdings"].remove(holding)
+            portfolio["balance"] += cost
+        return self._insert("trades", {"portfolio_id": p_portfolio_id, "symbol": p_symbol, "quantity": p_quantity, "price": p_price, "side": p_side})
+
+    def execute_trade_batch(self, p_user_id, p_orders) -> list:
+        results = []
+        ordered = sorted(enumerate(p_orders), key=lambda item: (item[1]["portfolio_id"], item[0]))
+        for index, order in ordered:
+            try:
+                trade = self.execute_trade(p_user_id, order["portfolio_id"], order["symbol"], order["quantity"], order["price"], order["side"])
+                results.append({"index": index, "status": "filled", "trade": trade})
+            except PostgrestError as e:
+                results.append({"index": index, "status": "rejected", "error": e.message, "code": e.code})
+        return results
+
+    def fill_orders(self, p_fills) -> list:
+        results = []
+        orders = {row["id"]: row for row in self.tables["orders"]}
+        for fill in sorted(p_fills, key=lambda fill: fill["portfolio_id"]):
+            order = orders.get(fill["order_id"])
+            if order is None or order["status"] != "open":
+                results.append({"order_id": fill["order_id"], "status": "skipped"})
+                continue
+            try:
+                trade = self.execute_trade(order["user_id"], order["portfolio_id"], order["symbol"], order["quantity"], fill["price"], order["side"])
+                order.update(status="filled", trade_id=trade["id"], filled_at=_now())
+                results.append({"order_id": order["id"], "status": "filled", "trade": trade})
+            except PostgrestError as e:
+                order.update(status="rejected", error=e.message)
+                results.append({"order_id": order["id"], "status": "rejected", "error": e.message, "code": e.code})
+        return results
+
+    def market_sync(self, p_worker, p_lease_seconds, p_since=None, p_symbols=None, p_sectors=None, p_prices=None, p_claim=True) -> dict:
+        state = self.tables["market_state"][0]
+        now = time.time()
+        expired = state["lease_expires_at"] is None or state["lease_expires_at"] <= now
+        if state["leader"] == p_worker and not expired:
+            leader = True
+            state["lease_expires_at"] = now + p_lease_seconds
+            if p_prices is not None:
+                state.update(symbols=p_symbols, sectors=p_sectors, prices=p_prices, published_at=_now())
+        elif p_claim and (state["leader"] is None or expired):
+            leader = True
+            state.update(leader=p_worker, lease_expires_at=now + p_lease_seconds)
+        else:
+            leader = False
+        events = sorted(self.tables["market_events"], key=lambda row: row["seq"])
+        pending = []
+        if leader:
+            pending = [dict(row) for row in events if row["pending"]]
+            for row in events:
+                row["pending"] = False
+        return {
+            "leader": leader,
+            "symbols": state["symbols"], "sectors": state["sectors"], "prices": state["prices"],
+            "replay": state["replay"],
+            "events": [] if p_since is None else [row for row in events if row["seq"] > p_since][:1000],
+            "pending": pending,
+            "last_seq": events[-1]["seq"] if events else 0,
+        }
+
+    def update_portfolio_values(self, p_ids, p_values) -> int:
+        values = dict(zip(p_ids, p_values))
+        updated = 0
+        for row in self.tables["portfolios"]:
+            if row["id"] in values:
+                row["total_value"] = values[row["id"]]
+                updated += 1
+        return updated
+
+    async def rpc(self, request: Request) -> Response:
+        await asyncio.sleep(self.latency)
+        self.requests += 1
+        function = getattr(self, request.path_params["function"], None)
+        if function is None:
+            return JSONResponse({"code": "PGRST202", "message": "Function not found", "details": None, "hint": None}, status_code=404)
+        arguments = await request.json()
+        try:
+            result = function(**arguments)
+        except PostgrestError as e:
+            return JSONResponse({"code": e.code, "message": e.message, "details": None, "hint": None}, status_code=e.status_code)
+        return JSONResponse(result)
+
+class FakeOpenAI:
+    """Chat completions endpoint returning canned answers, streamed word by word on request."""
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, fail_after: Optional[int] = None):
+        self.latency = latency
+        self.token_latency = token_latency
+        # Streams end with an error frame after this many words, like an upstream failing mid-answer
+        self.fail_after = fail_after
+        self.requests = 0
+        self.app = Starlette(routes=[Route("/v1/chat/completions", self.completions, methods=["POST"])])
+
+    def _answer(self, body: dict) -> str:
+        question = body["messages"][-1]["content"]
+        return f"Here is a short, educational explanation about: {question}"
+
+    async def completions(self, request: Request) -> Response:
+        self.requests += 1
+        body = await request.json()
+        await asyncio.sleep(self.latency)
+        answer = self._answer(body)
+        created = int(time.time())
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": created, "model": body.get("model", "fake")}
+        if not body.get("stream"):
+            return JSONResponse({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        async def stream():
+            for i, word in enumerate(answer.split(" ")):
+                if i == self.fail_after:
+                    yield f"data: {json.dumps({'error': {'message': 'The server had an error while processing your request.', 'type': 'server_error'}})}\n\n"
+                    return
+                await asyncio.sleep(self.token_latency)
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "finish_reason": None, "delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self.config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        sock = self.server.servers[0].sockets[0]
+        host, port = sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, timeout: float = 10.0) -> "ServerThread":
+        self.thread.start()
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks for the market simulation and valuation hot paths.
+
+Runs each case with timeit and prints the best per-call time. No database or
+network access is needed.
+
+Usage:
+    python -m benchmarks.micro --portfolios 10000 --symbols 500
+"""
+import argparse
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+# backend.database validates these at import time; nothing here talks to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bWljcm8")
+os.environ.setdefault("SUPABASE_ANON_KEY", os.environ["SUPABASE_SERVICE_KEY"])
+os.environ.setdefault("OPENAI_API_KEY", "micro")
+
+from backend.market_simulator import PriceEngine, calculate_portfolio_value, generate_market_event, market  # noqa: E402
+from backend.models import OrderInDB  # noqa: E402
+from backend.orders import OrderBook  # noqa: E402
+from backend.valuation import HoldingsBook  # noqa: E402
+
+def bench(name: str, func, repeat: int = 5, number: int = 0) -> None:
+    timer = timeit.Timer(func)
+    if not number:
+        number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    print(f"{name:<52}{best * 1e6:>12.2f} us")
+
+def build_book(engine: PriceEngine, portfolios: int, holdings_per_portfolio: int, rng: np.random.Generator) -> HoldingsBook:
+    portfolio_rows = [{"id": f"p{i}", "balance": 10000.0} for i in range(portfolios)]
+    holding_rows = [
+        {"portfolio_id": f"p{i}", "symbol": engine.symbols[j], "quantity": int(q)}
+        for i in range(portfolios)
+        for j, q in zip(rng.choice(len(engine), holdings_per_portfolio, replace=False), rng.integers(1, 100, holdings_per_portfolio))
+    ]
+    return HoldingsBook.from_rows(portfolio_rows, holding_rows, engine)
+
+def build_order_book(engine: PriceEngine, orders: int, rng: np.random.Generator) -> OrderBook:
+    """Resting orders with triggers 5-50% away from the current price, so none cross yet."""
+    book = OrderBook(engine)
+    now = datetime.now(timezone.utc)
+    for _ in range(orders):
+        symbol = int(rng.integers(len(engine)))
+        side = "BUY" if rng.random() < 0.5 else "SELL"
+        distance = rng.uniform(0.05, 0.5)
+        # BUY limits rest below the price, SELL limits above it
+        price = float(engine.prices[symbol] * (1 - distance if side == "BUY" else 1 + distance))
+        book.add(OrderInDB(
+            id=uuid.uuid4(), user_id=uuid.uuid4(), portfolio_id=uuid.uuid4(), symbol=engine.symbols[symbol],
+            side=side, order_type="LIMIT", quantity=1, limit_price=round(price, 2), status="open", created_at=now,
+        ))
+    return book
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--portfolios", type=int, default=10000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--holdings", type=int, default=10, help="holdings per portfolio")
+    parser.add_argument("--orders", type=int, default=50000, help="resting limit orders")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    engine = PriceEngine(seed=0, max_symbols=len(market) + args.symbols)
+    for i in range(args.symbols):
+        engine.add_symbol(f"S{i:04d}", "tech", 100.0)
+    book = build_book(engine, args.portfolios, min(args.holdings, args.symbols), rng)
+    holdings = {symbol: 10 for symbol in market.symbols}
+
+    print(f"{len(engine)} symbols, {len(book)} portfolios, {len(book.quantities)} holdings")
+    bench(f"PriceEngine.step ({len(engine)} symbols)", lambda: engine.step(1.0))
+    bench(f"HoldingsBook.values ({len(book)} portfolios)", lambda: book.values(engine.prices))
+    bench(f"HoldingsBook.value_of ({len(book.quantities)} holdings)", lambda: book.value_of(len(book) // 2, engine.prices))
+    bench(f"calculate_portfolio_value ({len(holdings)} holdings)", lambda: calculate_portfolio_value(holdings, 10000.0))
+    bench("generate_market_event", generate_market_event)
+
+    orders = build_order_book(engine, args.orders, rng)
+    bench(f"OrderBook.match, nothing crossed ({len(orders)} orders)", lambda: orders.match(engine.prices))
+    # A 10% drop in one symbol crosses the BUY limits resting within 10% of its price
+    shocked = engine.prices.copy()
+    shocked[0] *= 0.9
+    crossed = len(orders.match(shocked))
+    print(f"  a 10% drop in {engine.symbols[0]} crossed {crossed} orders")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Per-row cost of serving list endpoints: validated models vs trusted database rows.
+
+Each case is a FastAPI route returning the same page of `trades` rows, shaped as
+PostgREST returns them, called in-process through the ASGI interface (no network
+or database). The empty-page time is subtracted, so the per-row figure is the
+cost of building, validating and encoding one row.
+
+Usage:
+    python -m benchmarks.serialization --rows 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+# backend.database validates these at import time; nothing here talks to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bWljcm8")
+os.environ.setdefault("SUPABASE_ANON_KEY", os.environ["SUPABASE_SERVICE_KEY"])
+os.environ.setdefault("OPENAI_API_KEY", "micro")
+
+from fastapi import FastAPI, Response  # noqa: E402
+
+from backend.models import TradeInDB  # noqa: E402
+from backend.pagination import page_response  # noqa: E402
+from backend.serialization import orjson  # noqa: E402
+
+def trade_rows(n: int) -> List[dict]:
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    portfolio_id = str(uuid.uuid4())
+    return [
+        {
+            "portfolio_id": portfolio_id, "symbol": "AAPL", "quantity": 10, "price": 172.35, "side": "BUY",
+            "id": str(uuid.uuid4()), "executed_at": (start - timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(n + 1)
+    ]
+
+def build_app(rows: List[dict]) -> FastAPI:
+    app = FastAPI()
+    limit = len(rows) - 1
+
+    @app.get("/validated", response_model=List[TradeInDB])
+    async def validated(response: Response):
+        # What list endpoints did before: TradeInDB(**row), then response_model validation
+        return page_response(rows, limit, "executed_at", TradeInDB, False, response)
+
+    @app.get("/trusted", response_model=List[TradeInDB])
+    async def trusted(response: Response):
+        return page_response(rows, limit, "executed_at", TradeInDB, False, response, trusted=True)
+
+    return app
+
+async def call(app: FastAPI, path: str) -> bytes:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("bench", 1), "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+def bench(loop: asyncio.AbstractEventLoop, app: FastAPI, path: str, repeat: int = 5) -> float:
+    timer = timeit.Timer(lambda: loop.run_until_complete(call(app, path)))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="rows per page")
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    empty = build_app(trade_rows(0))
+    page = build_app(trade_rows(args.rows))
+    print(f"{args.rows} rows per page, JSON encoder: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'case':<14}{'per page':>14}{'per row':>14}")
+    for case in ("validated", "trusted"):
+        per_page = bench(loop, page, f"/{case}")
+        per_row = (per_page - bench(loop, empty, f"/{case}")) / args.rows
+        print(f"{case:<14}{per_page * 1e6:>11.1f} us{per_row * 1e6:>11.2f} us")
+    loop.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+-- Holdings ledger and atomic trade execution for FinLit
+
+-- 7. Holdings Table
+CREATE TABLE public.holdings (
+  portfolio_id UUID REFERENCES public.portfolios(id) ON DELETE CASCADE,
+  symbol TEXT NOT NULL,
+  quantity INTEGER NOT NULL CHECK (quantity > 0),
+  average_cost NUMERIC(15,4) NOT NULL CHECK (average_cost >= 0),
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (portfolio_id, symbol)
+);
+
+-- Set up RLS for holdings table (writes only happen through execute_trade)
+ALTER TABLE public.holdings ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Students can see their own holdings" ON public.holdings FOR SELECT USING (EXISTS (SELECT 1 FROM public.portfolios WHERE id = portfolio_id AND user_id = auth.uid()));
+
+CREATE TRIGGER update_holdings_updated_at BEFORE UPDATE ON public.holdings FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Executes a trade in one transaction: locks the portfolio row, checks ownership,
+-- balance (BUY) or holdings (SELL), updates balance and holdings, and records the trade.
+-- Errors use SQLSTATEs the backend maps to HTTP statuses:
+--   P0002 portfolio not found, 42501 not the owner, P0001 insufficient balance/holdings, 22023 bad input.
+CREATE OR REPLACE FUNCTION public.execute_trade(
+  p_user_id UUID,
+  p_portfolio_id UUID,
+  p_symbol TEXT,
+  p_quantity INTEGER,
+  p_price NUMERIC,
+  p_side TEXT
+)
+RETURNS public.trades AS $$
+DECLARE
+  v_portfolio public.portfolios%ROWTYPE;
+  v_cost NUMERIC(15,2);
+  v_held INTEGER;
+  v_trade public.trades%ROWTYPE;
+BEGIN
+  IF p_side NOT IN ('BUY', 'SELL') THEN
+    RAISE EXCEPTION 'Invalid trade side' USING ERRCODE = '22023';
+  END IF;
+  IF p_quantity IS NULL OR p_quantity <= 0 OR p_price IS NULL OR p_price < 0 THEN
+    RAISE EXCEPTION 'Invalid trade quantity or price' USING ERRCODE = '22023';
+  END IF;
+
+  SELECT * INTO v_portfolio FROM public.portfolios WHERE id = p_portfolio_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Portfolio not found' USING ERRCODE = 'P0002';
+  END IF;
+  IF v_portfolio.user_id IS DISTINCT FROM p_user_id THEN
+    RAISE EXCEPTION 'Not authorized to trade for this portfolio' USING ERRCODE = '42501';
+  END IF;
+
+  v_cost := p_quantity * p_price;
+
+  IF p_side = 'BUY' THEN
+    IF v_portfolio.balance < v_cost THEN
+      RAISE EXCEPTION 'Insufficient balance for this trade' USING ERRCODE = 'P0001';
+    END IF;
+    UPDATE public.portfolios SET balance = balance - v_cost WHERE id = p_portfolio_id;
+    INSERT INTO public.holdings (portfolio_id, symbol, quantity, average_cost)
+    VALUES (p_portfolio_id, p_symbol, p_quantity, p_price)
+    ON CONFLICT (portfolio_id, symbol) DO UPDATE SET
+      average_cost = (holdings.average_cost * holdings.quantity + EXCLUDED.average_cost * EXCLUDED.quantity)
+                     / (holdings.quantity + EXCLUDED.quantity),
+      quantity = holdings.quantity + EXCLUDED.quantity;
+  ELSE
+    SELECT quantity INTO v_held FROM public.holdings
+    WHERE portfolio_id = p_portfolio_id AND symbol = p_symbol FOR UPDATE;
+    IF COALESCE(v_held, 0) < p_quantity THEN
+      RAISE EXCEPTION 'Insufficient holdings for this trade' USING ERRCODE = 'P0001';
+    END IF;
+    IF v_held = p_quantity THEN
+      DELETE FROM public.holdings WHERE portfolio_id = p_portfolio_id AND symbol = p_symbol;
+    ELSE
+      UPDATE public.holdings SET quantity = quantity - p_quantity
+      WHERE portfolio_id = p_portfolio_id AND symbol = p_symbol;
+    END IF;
+    UPDATE public.portfolios SET balance = balance + v_cost WHERE id = p_portfolio_id;
+  END IF;
+
+  INSERT INTO public.trades (portfolio_id, symbol, quantity, price, side)
+  VALUES (p_portfolio_id, p_symbol, p_quantity, p_price, p_side)
+  RETURNING * INTO v_trade;
+
+  RETURN v_trade;
+END;
+$$ LANGUAGE plpgsql;
+
+-- p_user_id is trusted, so only the backend (service role) may call the function
+REVOKE EXECUTE ON FUNCTION public.execute_trade(UUID, UUID, TEXT, INTEGER, NUMERIC, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.execute_trade(UUID, UUID, TEXT, INTEGER, NUMERIC, TEXT) TO service_role;
@@ -0,0 +1,49 @@
+-- Batch trade execution for FinLit
+
+-- Executes a list of orders in one call. Each order runs execute_trade() inside its own
+-- subtransaction, so a rejected order is rolled back without affecting the others.
+-- Orders are applied grouped by portfolio (keeping submission order within a portfolio)
+-- so concurrent batches always lock portfolio rows in the same order.
+-- Returns a JSON array of {index, status, trade | error, code}, where index is the
+-- order's zero-based position in p_orders.
+CREATE OR REPLACE FUNCTION public.execute_trade_batch(
+  p_user_id UUID,
+  p_orders JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_order JSONB;
+  v_index BIGINT;
+  v_trade public.trades%ROWTYPE;
+  v_results JSONB := '[]'::JSONB;
+BEGIN
+  FOR v_order, v_index IN
+    SELECT value, ordinality - 1
+    FROM jsonb_array_elements(p_orders) WITH ORDINALITY
+    ORDER BY value->>'portfolio_id', ordinality
+  LOOP
+    BEGIN
+      v_trade := public.execute_trade(
+        p_user_id,
+        (v_order->>'portfolio_id')::UUID,
+        v_order->>'symbol',
+        (v_order->>'quantity')::INTEGER,
+        (v_order->>'price')::NUMERIC,
+        v_order->>'side'
+      );
+      v_results := v_results || jsonb_build_array(jsonb_build_object(
+        'index', v_index, 'status', 'filled', 'trade', to_jsonb(v_trade)
+      ));
+    EXCEPTION WHEN OTHERS THEN
+      v_results := v_results || jsonb_build_array(jsonb_build_object(
+        'index', v_index, 'status', 'rejected', 'error', SQLERRM, 'code', SQLSTATE
+      ));
+    END;
+  END LOOP;
+
+  RETURN v_results;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION public.execute_trade_batch(UUID, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.execute_trade_batch(UUID, JSONB) TO service_role;
@@ -0,0 +1,24 @@
+-- Bulk portfolio valuation for FinLit
+
+-- Writes total_value for many portfolios in one statement. Only total_value is touched,
+-- so a revaluation running alongside trades can never overwrite a balance.
+CREATE OR REPLACE FUNCTION public.update_portfolio_values(
+  p_ids UUID[],
+  p_values NUMERIC[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+  v_updated INTEGER;
+BEGIN
+  UPDATE public.portfolios AS p
+  SET total_value = v.total_value
+  FROM unnest(p_ids, p_values) AS v(id, total_value)
+  WHERE p.id = v.id;
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION public.update_portfolio_values(UUID[], NUMERIC[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.update_portfolio_values(UUID[], NUMERIC[]) TO service_role;
+
@@ -0,0 +1,15 @@
+-- Indexes for keyset pagination of list endpoints
+
+-- Trades are listed per portfolio, newest first, with id as the tie-breaker
+CREATE INDEX idx_trades_portfolio_executed_at ON public.trades(portfolio_id, executed_at DESC, id DESC);
+-- The composite index covers lookups by portfolio_id alone
+DROP INDEX IF EXISTS public.idx_trades_portfolio_id;
+
+-- Chatbot history is listed per user, newest first
+CREATE INDEX idx_chatbot_interactions_user_interaction_at ON public.chatbot_interactions(user_id, interaction_at DESC, id DESC);
+
+-- Webinars are listed by schedule, newest first
+CREATE INDEX idx_webinars_scheduled_at ON public.webinars(scheduled_at DESC, id DESC);
+
+-- Market events are listed by date, newest first
+CREATE INDEX idx_market_events_event_date ON public.market_events(event_date DESC);
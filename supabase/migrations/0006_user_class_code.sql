@@ -0,0 +1,6 @@
+-- Class membership for roster imports
+-- Students imported together share a class code, e.g. a school section
+
+ALTER TABLE public.users ADD COLUMN class_code TEXT;
+
+CREATE INDEX idx_users_class_code ON public.users(class_code) WHERE class_code IS NOT NULL;
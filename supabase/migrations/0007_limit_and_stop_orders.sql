@@ -0,0 +1,93 @@
+-- Resting limit and stop orders for FinLit
+
+-- 8. Orders Table
+-- LIMIT orders fill once the simulated price reaches limit_price (at or below it for BUY,
+-- at or above it for SELL); STOP orders fill once the price reaches stop_price (at or
+-- above it for BUY, at or below it for SELL). Matching happens in the backend; fills go
+-- through fill_orders() below.
+CREATE TABLE public.orders (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+  portfolio_id UUID NOT NULL REFERENCES public.portfolios(id) ON DELETE CASCADE,
+  symbol TEXT NOT NULL,
+  side TEXT NOT NULL CHECK (side IN ('BUY', 'SELL')),
+  order_type TEXT NOT NULL CHECK (order_type IN ('LIMIT', 'STOP')),
+  quantity INTEGER NOT NULL CHECK (quantity > 0),
+  limit_price NUMERIC(10,2) CHECK (limit_price > 0),
+  stop_price NUMERIC(10,2) CHECK (stop_price > 0),
+  status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'filled', 'cancelled', 'rejected')),
+  trade_id UUID REFERENCES public.trades(id) ON DELETE SET NULL,
+  error TEXT,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  filled_at TIMESTAMPTZ,
+  CHECK ((order_type = 'LIMIT' AND limit_price IS NOT NULL) OR (order_type = 'STOP' AND stop_price IS NOT NULL))
+);
+
+-- Set up RLS for orders table
+ALTER TABLE public.orders ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Students can see their own orders" ON public.orders FOR SELECT USING (auth.uid() = user_id);
+
+CREATE TRIGGER update_orders_updated_at BEFORE UPDATE ON public.orders FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Open orders are loaded into the matching engine at startup
+CREATE INDEX idx_orders_open ON public.orders(created_at, id) WHERE status = 'open';
+-- Orders are listed per user, newest first
+CREATE INDEX idx_orders_user_created_at ON public.orders(user_id, created_at DESC, id DESC);
+
+-- Fills many matched orders in one call. p_fills is a JSON array of
+-- {order_id, portfolio_id, price}. Each fill locks its order, skips it unless it is
+-- still open (another worker may have filled it, or it was cancelled), and runs
+-- execute_trade() in its own subtransaction; a rejected fill marks the order rejected.
+-- Fills are applied grouped by portfolio so concurrent calls lock rows in the same order.
+-- Returns a JSON array of {order_id, status, trade | error, code}.
+CREATE OR REPLACE FUNCTION public.fill_orders(
+  p_fills JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_fill JSONB;
+  v_order public.orders%ROWTYPE;
+  v_trade public.trades%ROWTYPE;
+  v_results JSONB := '[]'::JSONB;
+BEGIN
+  FOR v_fill IN
+    SELECT value
+    FROM jsonb_array_elements(p_fills) WITH ORDINALITY
+    ORDER BY value->>'portfolio_id', ordinality
+  LOOP
+    SELECT * INTO v_order FROM public.orders WHERE id = (v_fill->>'order_id')::UUID FOR UPDATE;
+    IF NOT FOUND OR v_order.status <> 'open' THEN
+      v_results := v_results || jsonb_build_array(jsonb_build_object(
+        'order_id', v_fill->>'order_id', 'status', 'skipped'
+      ));
+      CONTINUE;
+    END IF;
+
+    BEGIN
+      v_trade := public.execute_trade(
+        v_order.user_id,
+        v_order.portfolio_id,
+        v_order.symbol,
+        v_order.quantity,
+        (v_fill->>'price')::NUMERIC,
+        v_order.side
+      );
+      UPDATE public.orders SET status = 'filled', trade_id = v_trade.id, filled_at = NOW() WHERE id = v_order.id;
+      v_results := v_results || jsonb_build_array(jsonb_build_object(
+        'order_id', v_order.id, 'status', 'filled', 'trade', to_jsonb(v_trade)
+      ));
+    EXCEPTION WHEN OTHERS THEN
+      UPDATE public.orders SET status = 'rejected', error = SQLERRM WHERE id = v_order.id;
+      v_results := v_results || jsonb_build_array(jsonb_build_object(
+        'order_id', v_order.id, 'status', 'rejected', 'error', SQLERRM, 'code', SQLSTATE
+      ));
+    END;
+  END LOOP;
+
+  RETURN v_results;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION public.fill_orders(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.fill_orders(JSONB) TO service_role;
@@ -0,0 +1,100 @@
+-- Single market producer for FinLit
+-- One backend worker at a time holds the market lease: it simulates prices, generates
+-- events and publishes the prices here. Every other worker applies the published
+-- prices instead of running its own simulation, so all clients see the same market.
+
+-- 9. Market State Table (a single row)
+CREATE TABLE public.market_state (
+  id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  leader TEXT, -- Worker holding the lease
+  lease_expires_at TIMESTAMPTZ,
+  symbols TEXT[] NOT NULL DEFAULT '{}',
+  sectors TEXT[] NOT NULL DEFAULT '{}',
+  prices DOUBLE PRECISION[] NOT NULL DEFAULT '{}', -- Aligned with symbols
+  replay JSONB, -- Running scenario replay, e.g. {'key': ..., 'scenario': {...}, 'speed': 60, 'position': 0, 'at': <epoch>}
+  published_at TIMESTAMPTZ
+);
+
+INSERT INTO public.market_state (id) VALUES (1);
+
+ALTER TABLE public.market_state ENABLE ROW LEVEL SECURITY;
+
+-- Workers follow events in insertion order; pending events were stored by a worker
+-- without the lease and still have to be applied to prices by the leader
+ALTER TABLE public.market_events ADD COLUMN seq BIGSERIAL;
+ALTER TABLE public.market_events ADD COLUMN pending BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE UNIQUE INDEX idx_market_events_seq ON public.market_events(seq);
+CREATE INDEX idx_market_events_pending ON public.market_events(seq) WHERE pending;
+
+-- Called by every worker once per scheduler tick.
+-- A worker holding the lease (or claiming a free or expired one, when p_claim) renews it
+-- for p_lease_seconds; the current leader also publishes p_symbols/p_sectors/p_prices.
+-- Pending events are handed to the leader (and marked applied) in the same transaction.
+-- Returns {leader, symbols, sectors, prices, replay, events, pending, last_seq}: events
+-- are those with seq > p_since (none, with last_seq set, when p_since is NULL).
+CREATE OR REPLACE FUNCTION public.market_sync(
+  p_worker TEXT,
+  p_lease_seconds DOUBLE PRECISION,
+  p_since BIGINT DEFAULT NULL,
+  p_symbols TEXT[] DEFAULT NULL,
+  p_sectors TEXT[] DEFAULT NULL,
+  p_prices DOUBLE PRECISION[] DEFAULT NULL,
+  p_claim BOOLEAN DEFAULT TRUE
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_state public.market_state%ROWTYPE;
+  v_leader BOOLEAN;
+  v_events JSONB := '[]'::JSONB;
+  v_pending JSONB := '[]'::JSONB;
+BEGIN
+  SELECT * INTO v_state FROM public.market_state WHERE id = 1 FOR UPDATE;
+
+  IF v_state.leader = p_worker AND v_state.lease_expires_at > NOW() THEN
+    v_leader := TRUE;
+    UPDATE public.market_state SET
+      lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+      symbols = COALESCE(p_symbols, symbols),
+      sectors = COALESCE(p_sectors, sectors),
+      prices = COALESCE(p_prices, prices),
+      published_at = CASE WHEN p_prices IS NULL THEN published_at ELSE NOW() END
+    WHERE id = 1
+    RETURNING * INTO v_state;
+  ELSIF p_claim AND (v_state.leader IS NULL OR v_state.lease_expires_at IS NULL OR v_state.lease_expires_at <= NOW()) THEN
+    -- Take over; the new leader continues from the last published prices
+    v_leader := TRUE;
+    UPDATE public.market_state SET leader = p_worker, lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE id = 1
+    RETURNING * INTO v_state;
+  ELSE
+    v_leader := FALSE;
+  END IF;
+
+  IF v_leader THEN
+    WITH claimed AS (
+      UPDATE public.market_events SET pending = FALSE WHERE pending RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(claimed) ORDER BY seq), '[]'::JSONB) INTO v_pending FROM claimed;
+  END IF;
+
+  IF p_since IS NOT NULL THEN
+    SELECT COALESCE(jsonb_agg(to_jsonb(e) ORDER BY e.seq), '[]'::JSONB) INTO v_events
+    FROM (SELECT * FROM public.market_events WHERE seq > p_since ORDER BY seq LIMIT 1000) e;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'leader', v_leader,
+    'symbols', to_jsonb(v_state.symbols),
+    'sectors', to_jsonb(v_state.sectors),
+    'prices', to_jsonb(v_state.prices),
+    'replay', v_state.replay,
+    'events', v_events,
+    'pending', v_pending,
+    'last_seq', (SELECT COALESCE(MAX(seq), 0) FROM public.market_events)
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION public.market_sync(TEXT, DOUBLE PRECISION, BIGINT, TEXT[], TEXT[], DOUBLE PRECISION[], BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.market_sync(TEXT, DOUBLE PRECISION, BIGINT, TEXT[], TEXT[], DOUBLE PRECISION[], BOOLEAN) TO service_role;
@@ -0,0 +1,17 @@
+-- Other workers poll users.updated_at to evict cached users (role or password changes)
+
+CREATE INDEX IF NOT EXISTS idx_users_updated_at ON public.users(updated_at);
+
+-- 0001 marked its updated_at triggers optional; eviction depends on this one, so it is
+-- (re)created here. clock_timestamp() rather than NOW(): a long transaction must not stamp
+-- a time before the point the pollers have already read up to.
+CREATE OR REPLACE FUNCTION public.touch_users_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_users_updated_at ON public.users;
+CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON public.users FOR EACH ROW EXECUTE FUNCTION public.touch_users_updated_at();
@@ -0,0 +1,3 @@
+-- The market producer syncs its order book each tick from orders changed since its last read
+
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON public.orders(updated_at);
@@ -0,0 +1,76 @@
+"""
+Shared fixtures for the backend tests.
+
+The backend runs in-process against the fake PostgREST and OpenAI servers from
+benchmarks/fakes.py, so the suite needs no Supabase project or OpenAI key.
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+
+import pytest
+
+from benchmarks.fakes import FakeOpenAI, FakePostgrest, ServerThread
+
+FAKE_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.dGVzdHM"
+
+database = FakePostgrest()
+completions = FakeOpenAI()
+_database_server = ServerThread(database.app).start()
+_completions_server = ServerThread(completions.app).start()
+_workdir = tempfile.mkdtemp(prefix="finlit-tests-")
+
+# The backend reads its configuration at import time
+os.environ.update({
+    "SUPABASE_URL": _database_server.url,
+    "SUPABASE_SERVICE_KEY": FAKE_SUPABASE_KEY,
+    "SUPABASE_ANON_KEY": FAKE_SUPABASE_KEY,
+    "SECRET_KEY": "tests-secret",
+    "OPENAI_API_KEY": "tests",
+    "OPENAI_BASE_URL": f"{_completions_server.url}/v1",
+    "RESPONSE_CACHE_PATH": os.path.join(_workdir, "response_cache.sqlite3"),
+    "PRICE_HISTORY_DIR": os.path.join(_workdir, "price_history"),
+    "MARKET_SCHEDULER_ENABLED": "false",
+    "STARTUP_PREWARM": "false",
+})
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.auth import create_access_token, token_cache, user_cache  # noqa: E402
+from backend.conversation import conversation_memory  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.shared_cache import global_list_cache  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    # One client for the whole session: the lifespan shuts the worker pools down on exit
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Empties the fake database and the in-process caches before every test."""
+    database.reset()
+    database.latency = 0.0
+    completions.latency = 0.0
+    completions.fail_after = None
+    token_cache.clear()
+    user_cache.clear()
+    conversation_memory._conversations.clear()
+    asyncio.run(global_list_cache.invalidate(""))
+    yield
+
+@pytest.fixture
+def make_user():
+    """Inserts a user (with a portfolio for students) and returns (user row, auth headers)."""
+    def make(role: str = "student", class_code: str = None, balance: float = 10000.0):
+        user = database._insert("users", {"email": f"{uuid.uuid4().hex[:12]}@example.com", "role": role, "class_code": class_code})
+        if role == "student":
+            database._insert("portfolios", {"user_id": user["id"], "balance": balance})
+        token = create_access_token({"sub": user["id"]})
+        return user, {"Authorization": f"Bearer {token}"}
+    return make
+
+def portfolio_of(user: dict) -> dict:
+    return next(row for row in database.tables["portfolios"] if row["user_id"] == user["id"])
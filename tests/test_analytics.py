@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime, timezone
+
+from backend.analytics import ANALYTICS_MAX_POINTS, compute_performance
+from backend.market_simulator import market
+from backend.price_history import PRICE_HISTORY_BAR_SECONDS, PriceHistoryStore
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc).timestamp()
+
+def performance(tmp_path, interval_seconds, days_ago):
+    executed_at = datetime.fromtimestamp(NOW - days_ago * 86400, timezone.utc).isoformat()
+    trades = [{"symbol": market.symbols[0], "quantity": 10, "price": 100.0, "side": "BUY", "executed_at": executed_at}]
+    return compute_performance(uuid.uuid4(), 9000.0, trades, interval_seconds, now=NOW, store=PriceHistoryStore(str(tmp_path)))
+
+def test_explicit_intervals_cannot_exceed_the_point_cap(tmp_path):
+    # A year of one-minute points would be over half a million
+    result = performance(tmp_path, PRICE_HISTORY_BAR_SECONDS, days_ago=365)
+    assert len(result.ts) <= ANALYTICS_MAX_POINTS
+    assert result.interval_seconds % PRICE_HISTORY_BAR_SECONDS == 0
+    assert result.interval_seconds > PRICE_HISTORY_BAR_SECONDS
+
+def test_explicit_intervals_within_the_cap_are_kept(tmp_path):
+    result = performance(tmp_path, 3600, days_ago=2)
+    assert result.interval_seconds == 3600
+    assert result.initial_value == 10000.0
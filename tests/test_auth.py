@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.auth import evict_changed_users, user_cache
+from conftest import database
+
+def test_role_change_in_another_worker_reaches_the_user_cache(client, make_user):
+    instructor, headers = make_user(role="instructor")
+    assert client.get("/users/me", headers=headers).json()["role"] == "instructor"
+    since = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    # Another worker demotes the instructor; this worker's cache still holds the old role
+    row = next(row for row in database.tables["users"] if row["id"] == instructor["id"])
+    row.update(role="student", updated_at=datetime.now(timezone.utc).isoformat())
+    assert client.get("/users/me", headers=headers).json()["role"] == "instructor"
+
+    next_since = client.portal.call(evict_changed_users, since)
+    assert next_since < datetime.now(timezone.utc)
+    assert client.get("/users/me", headers=headers).json()["role"] == "student"
+
+def test_unchanged_users_stay_cached(client, make_user):
+    _, headers = make_user()
+    client.get("/users/me", headers=headers)
+    cached = len(user_cache)
+
+    client.portal.call(evict_changed_users, datetime.now(timezone.utc) + timedelta(seconds=1))
+    assert len(user_cache) == cached
+
+def test_role_update_endpoint_invalidates_locally(client, make_user):
+    student, student_headers = make_user()
+    _, admin_headers = make_user(role="admin")
+    client.get("/users/me", headers=student_headers)
+
+    response = client.patch(f"/users/{student['id']}/role", json={"role": "instructor"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/users/me", headers=student_headers).json()["role"] == "instructor"
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from backend import chatbot
+from backend.chatbot_cache import ResponseCache, is_self_contained
+from backend.conversation import SUMMARY_WORDS_PER_TURN, Conversation, conversation_memory
+from conftest import completions, database
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(chatbot, "response_cache", cache)
+    return cache
+
+def events(body: str):
+    """Parses a server-sent event stream into (event, data) pairs."""
+    parsed = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        parsed.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return parsed
+
+def test_answers_are_stored_and_cached(client, make_user, response_cache):
+    user, headers = make_user()
+    response = client.post("/chatbot/ask", headers=headers, params={"query": "What is a bond?"})
+    assert response.status_code == 200
+    answer = response.json()["response"]
+    assert "What is a bond?" in answer
+    assert [row["response"] for row in database.tables["chatbot_interactions"]] == [answer]
+
+    # Another student asking the same self-contained question is answered from the cache
+    requests = completions.requests
+    _, other = make_user()
+    assert client.post("/chatbot/ask", headers=other, params={"query": "what is a bond"}).json()["response"] == answer
+    assert completions.requests == requests
+
+def test_streamed_answers_end_with_the_stored_interaction(client, make_user, response_cache):
+    user, headers = make_user()
+    response = client.post("/chatbot/ask/stream", headers=headers, params={"query": "What is inflation?"})
+    assert response.status_code == 200
+
+    stream = events(response.text)
+    answer = "".join(data["delta"] for kind, data in stream if kind == "message").strip()
+    assert stream[-1][0] == "done"
+    assert stream[-1][1]["response"] == answer
+    assert response_cache.get("What is inflation?") == answer
+    assert [row["response"] for row in database.tables["chatbot_interactions"]] == [answer]
+
+def test_an_interrupted_stream_is_neither_stored_nor_cached(client, make_user, response_cache):
+    user, headers = make_user()
+    completions.fail_after = 3
+    response = client.post("/chatbot/ask/stream", headers=headers, params={"query": "What is a stock split?"})
+
+    stream = events(response.text)
+    assert [kind for kind, _ in stream] == ["message"] * 3 + ["error"]
+    assert database.tables["chatbot_interactions"] == []
+    assert response_cache.get("What is a stock split?") is None
+    assert client.portal.call(conversation_memory.history, user["id"]) == []
+
+    # Asking again goes back to the model and gets the whole answer
+    completions.fail_after = None
+    requests = completions.requests
+    stream = events(client.post("/chatbot/ask/stream", headers=headers, params={"query": "What is a stock split?"}).text)
+    assert stream[-1][0] == "done"
+    assert completions.requests == requests + 1
+
+def test_self_contained_questions_hit_the_cache_mid_conversation(client, make_user, response_cache):
+    _, first = make_user()
+    client.post("/chatbot/ask", headers=first, params={"query": "What is a mutual fund?"})
+
+    # This student has history, but a standalone question is still answered from the cache
+    _, headers = make_user()
+    client.post("/chatbot/ask", headers=headers, params={"query": "What is compound interest?"})
+    requests = completions.requests
+    client.post("/chatbot/ask", headers=headers, params={"query": "What is a mutual fund?"})
+    assert completions.requests == requests
+
+    # A follow-up depends on the conversation, so it goes to the model and is not cached
+    client.post("/chatbot/ask", headers=headers, params={"query": "Can you explain that again?"})
+    assert completions.requests == requests + 1
+    assert response_cache.get("Can you explain that again?") is None
+    assert response_cache.stats()["bypassed"] == 1
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is diversification?", True),
+    ("How do index funds work?", True),
+    ("Why?", False),
+    ("What about bonds?", False),
+    ("Is it risky?", False),
+    ("Tell me more", False),
+])
+def test_is_self_contained(query, expected):
+    assert is_self_contained(query) is expected
+
+def test_old_turns_are_reduced_to_truncated_questions():
+    conversation = Conversation(token_budget=10_000, summary_budget=10_000, max_turns=2)
+    long_question = " ".join(f"word{i}" for i in range(20))
+    for query in (long_question, "What is a bond?", "What is a stock?"):
+        conversation.add(query, "An answer.")
+
+    messages = conversation.messages()
+    assert messages[0] == {"role": "system", "content": f"Earlier in this conversation the student asked about: {' '.join(long_question.split()[:SUMMARY_WORDS_PER_TURN])}..."}
+    assert [m["content"] for m in messages[1:] if m["role"] == "user"] == ["What is a bond?", "What is a stock?"]
+
+def test_turns_asked_through_another_worker_reach_this_workers_window(client, make_user):
+    user, headers = make_user()
+    client.post("/chatbot/ask", headers=headers, params={"query": "What is a bond?"})
+    history = client.portal.call(conversation_memory.history, user["id"])
+    assert [message["content"] for message in history if message["role"] == "user"] == ["What is a bond?"]
+
+    # Another worker stores the next turn; this worker's window is behind it and reloads
+    database._insert("chatbot_interactions", {"user_id": user["id"], "query": "What is a coupon?", "response": "Interest a bond pays."})
+    history = client.portal.call(conversation_memory.history, user["id"])
+    assert [message["content"] for message in history if message["role"] == "user"] == ["What is a bond?", "What is a coupon?"]
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from backend import database as backend_database
+from backend.database import close_supabase, execute, fetch_all, supabase
+from conftest import database
+
+def test_execute_runs_queries_off_the_event_loop(client):
+    database.latency = 0.2
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        heartbeat = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(execute(supabase.table("users").select("id")) for _ in range(8)))
+        elapsed = time.perf_counter() - started
+        heartbeat.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = client.portal.call(scenario)
+    # Eight 200 ms round-trips overlap instead of queueing, and the loop keeps ticking meanwhile
+    assert elapsed < 0.8
+    assert ticks >= 10
+
+def test_fetch_all_pages_through_every_row(client):
+    for i in range(25):
+        database._insert("market_events", {"event_type": f"event-{i:02d}"})
+
+    rows = client.portal.call(fetch_all, lambda: supabase.table("market_events").select("event_type").order("event_type"), 10)
+    assert [row["event_type"] for row in rows] == [f"event-{i:02d}" for i in range(25)]
+
+def test_close_supabase_closes_the_session_and_a_later_query_reopens_it(client):
+    client.portal.call(execute, supabase.table("users").select("id"))
+    session = backend_database.get_supabase().postgrest.session
+
+    close_supabase()
+    assert session.is_closed
+    assert backend_database._client is None
+    client.portal.call(execute, supabase.table("users").select("id"))
+    assert not backend_database.get_supabase().postgrest.session.is_closed
+
+def test_importing_the_app_defers_the_heavy_clients():
+    code = "import sys, backend.main; print(sorted(m for m in ('postgrest', 'supabase', 'openai', 'pandas') if m in sys.modules))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, env=os.environ, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,91 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import export
+from backend.database import supabase
+from backend.export import TRADE_EXPORT_COLUMNS, _pages
+from conftest import database, portfolio_of
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def add_trades(user: dict, minutes) -> None:
+    for minute in minutes:
+        database._insert("trades", {
+            "portfolio_id": portfolio_of(user)["id"], "symbol": "AAPL", "quantity": 1, "price": 100.0, "side": "BUY",
+            "executed_at": (START + timedelta(minutes=minute)).isoformat(),
+        })
+
+def read_csv(response) -> list:
+    assert response.status_code == 200
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+async def collect(build_query, sort_key, page_size):
+    return [rows async for rows in _pages(build_query, sort_key, page_size)]
+
+def test_keyset_pages_cover_every_row_once_newest_first(client, make_user):
+    user, _ = make_user()
+    # Ties on the sort key are ordered (and paged) by id
+    add_trades(user, [0, 1, 1, 1, 2, 3, 3, 4, 5, 6])
+    pages = client.portal.call(collect, lambda: supabase.table("trades").select("*"), "executed_at", 3)
+
+    assert [len(rows) for rows in pages] == [3, 3, 3, 1]
+    rows = [row for page in pages for row in page]
+    assert len({row["id"] for row in rows}) == 10
+    keys = [(row["executed_at"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+def test_class_exports_are_newest_first_across_filter_chunks(client, make_user, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_FILTER_BATCH_SIZE", 2)
+    _, headers = make_user("instructor")
+    students = [make_user(class_code="C1")[0] for _ in range(5)]
+    for i, student in enumerate(students):
+        add_trades(student, range(i, 40, 5))
+    outsider, _ = make_user(class_code="C2")
+    add_trades(outsider, [100])
+
+    rows = read_csv(client.get("/export/trades", params={"class_code": "C1"}, headers=headers))
+    assert len(rows) == 40
+    assert [row["executed_at"] for row in rows] == sorted((row["executed_at"] for row in rows), reverse=True)
+    assert {row["class_code"] for row in rows} == {"C1"}
+
+def test_exports_of_every_class_look_up_the_users_they_list(client, make_user):
+    (first, _), (second, _), (_, headers) = make_user(class_code="C1"), make_user(), make_user("instructor")
+    add_trades(first, [1])
+    add_trades(second, [2])
+
+    rows = read_csv(client.get("/export/trades", headers=headers))
+    assert [(row["user_id"], row["email"], row["class_code"]) for row in rows] == [
+        (second["id"], second["email"], ""),
+        (first["id"], first["email"], "C1"),
+    ]
+
+def test_csv_quotes_commas_quotes_and_newlines(client, make_user):
+    user, _ = make_user()
+    _, headers = make_user("instructor")
+    query = 'Is "buy low, sell high"\nalways right?'
+    database._insert("chatbot_interactions", {"user_id": user["id"], "query": query, "response": "No, not always.", "feedback": 1})
+
+    [row] = read_csv(client.get("/export/chatbot-interactions", headers=headers))
+    assert row["query"] == query
+    assert row["response"] == "No, not always."
+    assert row["email"] == user["email"]
+
+def test_parquet_export_schema(client, make_user):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    user, _ = make_user()
+    _, headers = make_user("instructor")
+    add_trades(user, [1, 2])
+
+    response = client.get("/export/trades", params={"format": "parquet"}, headers=headers)
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.schema.names == TRADE_EXPORT_COLUMNS
+    assert table.schema.field("quantity").type == pa.int64()
+    assert table.schema.field("price").type == pa.float64()
+    assert table.schema.field("executed_at").type == pa.timestamp("us", tz="UTC")
+    assert table.column("executed_at").to_pylist() == [START + timedelta(minutes=2), START + timedelta(minutes=1)]
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from backend.leaderboard import Leaderboard, RankedBoard
+from backend.market_simulator import market
+from backend.models import TradeInDB
+from conftest import database, portfolio_of
+
+def test_ranked_board_updates_match_a_full_sort():
+    rng = np.random.default_rng(7)
+    values = rng.integers(0, 50, 200).astype(float)
+    board = RankedBoard(np.arange(len(values)), values.copy())
+    for _ in range(2000):
+        slot = int(rng.integers(len(values)))
+        new_value = float(rng.integers(0, 50))
+        board.update(slot, values[slot], new_value)
+        values[slot] = new_value
+
+    assert sorted(board.slots.tolist()) == list(range(len(values)))
+    np.testing.assert_array_equal(-board._keys, np.sort(values)[::-1])
+    np.testing.assert_array_equal(values[board.slots], -board._keys)
+
+def record_trade(portfolio: dict, quantity: int) -> TradeInDB:
+    """Stores a buy as the execute_trade function would, returning it as that worker sees it."""
+    symbol = market.symbols[0]
+    price = float(market.get_price(symbol))
+    portfolio["balance"] -= quantity * price
+    database._insert("holdings", {"portfolio_id": portfolio["id"], "symbol": symbol, "quantity": quantity})
+    row = database._insert("trades", {"portfolio_id": portfolio["id"], "symbol": symbol, "quantity": quantity, "price": price, "side": "BUY", "executed_at": datetime.now(timezone.utc).isoformat()})
+    return TradeInDB(**row)
+
+def test_trades_on_one_worker_reach_the_others(client, make_user):
+    users = [make_user(balance=10000.0)[0] for _ in range(3)]
+    here, there = Leaderboard(), Leaderboard()
+    for board in (here, there):
+        client.portal.call(board.load)
+
+    # The trade itself does not change the value; prices moving afterwards do
+    trade = record_trade(portfolio_of(users[1]), 50)
+    here.apply_trade(trade)
+    for board in (here, there):
+        client.portal.call(board.sync_trades)
+        board.refresh(market.prices * 2)
+
+    assert here.top(3) == there.top(3)
+    assert str(here.top(1)[0].user_id) == users[1]["id"]
+    assert here.rank_of(users[1]["id"]).total_value == there.rank_of(users[1]["id"]).total_value
+
+    # Polling again (or replaying a trade) never applies it twice
+    client.portal.call(there.sync_trades)
+    there.apply_trade(trade)
+    there.refresh(market.prices * 2)
+    assert there.top(3) == here.top(3)
+
+def test_reload_does_not_count_recent_trades_twice(client, make_user):
+    user, _ = make_user(balance=10000.0)
+    record_trade(portfolio_of(user), 10)
+    board = Leaderboard()
+    client.portal.call(board.load)
+    before = board.rank_of(user["id"]).total_value
+
+    client.portal.call(board.sync_trades)
+    board.refresh(market.prices)
+    assert board.rank_of(user["id"]).total_value == before
@@ -0,0 +1,54 @@
+import pytest
+
+from backend.market_simulator import PriceEngine, market
+from conftest import portfolio_of
+
+def test_prices_for_listed_symbols(client, make_user):
+    _, headers = make_user()
+
+    response = client.get("/market/prices", params={"symbols": "aapl, MSFT"}, headers=headers)
+    assert response.status_code == 200
+    prices = response.json()
+    assert list(prices) == ["AAPL", "MSFT"]
+    assert all(price > 0 for price in prices.values())
+
+def test_unknown_symbols_are_not_found_and_not_registered(client, make_user):
+    _, headers = make_user()
+    listed = len(market)
+
+    response = client.get("/market/prices", params={"symbols": "AAPL,NOPE,ZZZ9"}, headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unknown symbols: NOPE, ZZZ9"
+    assert len(market) == listed
+    assert "NOPE" not in market.symbol_index
+
+def test_trades_and_orders_in_unknown_symbols_are_rejected(client, make_user):
+    user, headers = make_user()
+    portfolio_id = portfolio_of(user)["id"]
+    listed = len(market)
+
+    trade = {"portfolio_id": portfolio_id, "symbol": "NOPE", "quantity": 1, "price": 1.0, "side": "BUY"}
+    assert client.post("/trades", json=trade, headers=headers).status_code == 400
+    assert client.post("/trades/batch", json=[trade], headers=headers).status_code == 400
+    order = {"portfolio_id": portfolio_id, "symbol": "NOPE", "side": "BUY", "order_type": "LIMIT", "quantity": 1, "limit_price": 1.0}
+    assert client.post("/orders", json=order, headers=headers).status_code == 400
+    assert len(market) == listed
+
+def test_engine_lookups_never_register_symbols():
+    engine = PriceEngine(seed=0)
+    with pytest.raises(KeyError):
+        engine.get_prices(["AAPL", "NOPE"])
+    with pytest.raises(KeyError):
+        engine.get_price("NOPE")
+    assert engine.unknown_symbols(["AAPL", "NOPE"]) == ["NOPE"]
+    assert "NOPE" not in engine.symbol_index
+
+def test_add_symbol_validates_and_caps_the_universe():
+    engine = PriceEngine(universe={"AAA": ("tech", 10.0)}, seed=0, max_symbols=2)
+    with pytest.raises(ValueError):
+        engine.add_symbol("../etc")
+    assert engine.add_symbol("BBB") == 1
+    assert engine.add_symbol("AAA") == 0
+    with pytest.raises(ValueError):
+        engine.add_symbol("CCC")
+    assert engine.symbols == ["AAA", "BBB"]
@@ -0,0 +1,62 @@
+import time
+
+from backend import main
+from backend.metrics import Counter, Gauge, Histogram, Registry, SamplingProfiler
+
+def test_counters_gauges_and_histograms_render_as_prometheus_text():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("route",)))
+    registry.register(Gauge("queued", "Queued jobs.", function=lambda: {(): 3}))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5.0, route="/a")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a\\"b"} 3.0',
+        "# HELP queued Queued jobs.",
+        "# TYPE queued gauge",
+        "queued 3",
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_count{route="/a"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+    ]
+
+def test_metrics_require_the_token_when_one_is_set(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert response.text.startswith("# HELP")
+
+def test_requests_are_labelled_by_route_template(client, make_user):
+    user, headers = make_user()
+    client.get(f"/portfolios/{user['id']}", headers=headers)
+    client.get("/no-such-route")
+
+    text = client.get("/metrics").text
+    assert 'route="/portfolios/{user_id}",status="200"' in text
+    assert 'route="unmatched",status="404"' in text
+    assert user["id"] not in text
+
+def test_profiler_reports_while_it_samples():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    try:
+        deadline = time.monotonic() + 2
+        while not profiler.samples and time.monotonic() < deadline:
+            profiler.top()
+        top = profiler.top(5)
+    finally:
+        profiler.stop()
+    assert top and sum(entry["fraction"] for entry in top) <= 1.0
+    assert any("test_metrics:test_profiler_reports_while_it_samples" in entry["stack"] for entry in top)
@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+from backend.market_simulator import PriceEngine
+from backend.models import OrderInDB
+from backend.orders import OrderBook, OrderMatcher
+from benchmarks.fakes import PostgrestError
+from conftest import database, portfolio_of
+
+def limit_buy(engine: PriceEngine, price: float) -> OrderInDB:
+    return OrderInDB(
+        id=uuid.uuid4(), user_id=uuid.uuid4(), portfolio_id=uuid.uuid4(), symbol=engine.symbols[0],
+        side="BUY", order_type="LIMIT", quantity=1, limit_price=price, status="open", created_at=datetime.now(timezone.utc),
+    )
+
+def crash(engine: PriceEngine) -> np.ndarray:
+    prices = engine.prices.copy()
+    prices[0] = 1.0
+    return prices
+
+def test_orders_at_the_same_trigger_fill_in_submission_order():
+    engine = PriceEngine(seed=1)
+    book = OrderBook(engine)
+    orders = [limit_buy(engine, 50.0) for _ in range(3)]
+    for order in orders:
+        book.add(order)
+
+    fills = book.match(crash(engine))
+    assert [order.id for order, _, _ in fills] == [order.id for order in orders]
+    assert len(book) == 0
+
+def test_fills_that_fail_to_persist_keep_their_time_priority(client, monkeypatch):
+    engine = PriceEngine(seed=1)
+    book = OrderBook(engine)
+    matcher = OrderMatcher(book)
+    first, second = limit_buy(engine, 50.0), limit_buy(engine, 50.0)
+    book.add(first)
+    book.add(second)
+    batch = book.match(crash(engine))
+    # Placed while the fills are being written
+    later = limit_buy(engine, 50.0)
+    book.add(later)
+
+    def failing(*args, **kwargs):
+        raise PostgrestError("08006", "connection failure")
+
+    monkeypatch.setattr(database, "fill_orders", failing)
+    client.portal.call(matcher._flush, batch)
+    assert first.id in book and second.id in book
+
+    # The orders put back still fill ahead of the one placed after them
+    fills = book.match(crash(engine))
+    assert [order.id for order, _, _ in fills] == [first.id, second.id, later.id]
+
+def test_fills_cancelled_while_being_written_are_not_put_back(client, monkeypatch):
+    engine = PriceEngine(seed=1)
+    book = OrderBook(engine)
+    matcher = OrderMatcher(book)
+    kept, cancelled = limit_buy(engine, 50.0), limit_buy(engine, 50.0)
+    book.add(kept)
+    book.add(cancelled)
+    batch = book.match(crash(engine))
+    matcher._in_flight.update(str(order.id) for order, _, _ in batch)
+    matcher.cancel(cancelled.id)
+
+    def failing(*args, **kwargs):
+        raise PostgrestError("08006", "connection failure")
+
+    monkeypatch.setattr(database, "fill_orders", failing)
+    client.portal.call(matcher._flush, batch)
+    assert kept.id in book and cancelled.id not in book
+    assert not matcher._in_flight and not matcher._cancelled
+
+def store_order(user: dict, engine: PriceEngine, price: float) -> dict:
+    return database._insert("orders", {
+        "user_id": user["id"], "portfolio_id": portfolio_of(user)["id"], "symbol": engine.symbols[0],
+        "side": "BUY", "order_type": "LIMIT", "quantity": 1, "limit_price": price,
+    })
+
+def tick(client, matcher: OrderMatcher, prices: np.ndarray, leader: bool) -> None:
+    """Runs one tick on `matcher` and waits for the load or sync it started."""
+    async def run():
+        matcher.on_tick(prices, leader)
+        for task in (matcher._load_task, matcher._sync_task):
+            if task is not None:
+                await task
+    client.portal.call(run)
+
+def test_only_the_lease_holder_matches_and_it_follows_other_workers(client, make_user):
+    engine = PriceEngine(seed=1)
+    matcher = OrderMatcher(OrderBook(engine))
+    user, _ = make_user()
+    resting = store_order(user, engine, 1.0)
+
+    tick(client, matcher, engine.prices, leader=False)
+    assert len(matcher.book) == 0
+    # Taking the lease loads the open orders
+    tick(client, matcher, engine.prices, leader=True)
+    assert resting["id"] in matcher.book
+
+    # Another worker places one order and cancels the other; the next tick syncs both
+    placed = store_order(user, engine, 2.0)
+    resting.update(status="cancelled", updated_at=datetime.now(timezone.utc).isoformat())
+    tick(client, matcher, engine.prices, leader=True)
+    assert placed["id"] in matcher.book and resting["id"] not in matcher.book
+
+    # Losing the lease drops the book, so a crossed price fills nothing here
+    tick(client, matcher, crash(engine), leader=False)
+    assert len(matcher.book) == 0 and not matcher._pending
@@ -0,0 +1,63 @@
+import base64
+import json
+
+import pytest
+
+from conftest import database, portfolio_of
+
+def cursor(*parts) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode().rstrip("=")
+
+@pytest.fixture
+def trades(make_user):
+    """A student with seven trades, three of them sharing a timestamp."""
+    user, headers = make_user()
+    portfolio = portfolio_of(user)
+    times = ["2026-01-01T10:00:00+00:00"] * 3 + [f"2026-01-0{day}T10:00:00+00:00" for day in range(2, 6)]
+    rows = [
+        database._insert("trades", {"portfolio_id": portfolio["id"], "symbol": "AAPL", "quantity": i + 1, "price": 100.0, "side": "BUY", "executed_at": ts})
+        for i, ts in enumerate(times)
+    ]
+    return f"/portfolios/{portfolio['id']}/trades", headers, rows
+
+def test_pages_walk_every_row_once_newest_first(client, trades):
+    path, headers, rows = trades
+    seen, before = [], None
+    while True:
+        response = client.get(path, headers=headers, params={"limit": 2, **({"before": before} if before else {})})
+        assert response.status_code == 200
+        seen += response.json()
+        before = response.headers.get("X-Next-Cursor")
+        if before is None:
+            break
+
+    expected = sorted(rows, key=lambda row: (row["executed_at"], row["id"]), reverse=True)
+    assert [trade["id"] for trade in seen] == [row["id"] for row in expected]
+
+@pytest.mark.parametrize("before", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    cursor("2026-01-01T10:00:00+00:00"),
+    cursor(1, 2),
+    cursor("2026-01-01T10:00:00+00:00", "not-a-uuid"),
+    cursor('2026-01-01") ,id.gt.(0', "00000000-0000-0000-0000-000000000000"),
+    cursor("2026-01-01T10:00:00\\,x", "00000000-0000-0000-0000-000000000000"),
+    cursor("2026-01-01T10:00:00+00:00\n", "00000000-0000-0000-0000-000000000000"),
+])
+def test_malformed_cursors_are_rejected(client, trades, before):
+    path, headers, _ = trades
+    response = client.get(path, headers=headers, params={"before": before})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+def test_fields_project_only_model_fields(client, trades):
+    path, headers, _ = trades
+    database.tables["trades"][0]["internal_note"] = "not part of TradeInDB"
+
+    response = client.get(path, headers=headers, params={"fields": "symbol,quantity,symbol"})
+    assert response.status_code == 200
+    assert all(set(trade) == {"id", "executed_at", "symbol", "quantity"} for trade in response.json())
+
+    for fields in ("internal_note", "*", "symbol:quantity", "portfolio_id(*)"):
+        response = client.get(path, headers=headers, params={"fields": fields})
+        assert response.status_code == 400
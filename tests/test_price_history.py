@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from backend import scheduler as scheduler_module
+from backend.price_history import BAR_DTYPE, BarRecorder, PriceHistoryStore, downsample
+
+DAY = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+def bars(*closes, start=DAY, step=60):
+    out = np.zeros(len(closes), dtype=BAR_DTYPE)
+    out["ts"] = int(start.timestamp()) + step * np.arange(len(closes))
+    out["open"] = out["high"] = out["low"] = out["close"] = closes
+    return out
+
+def test_appends_keep_bars_strictly_ordered(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.append("AAPL", bars(1.0, 2.0, 3.0))
+    # A bar recorded again after a restart, and one older than the file, are both dropped
+    store.append("AAPL", bars(9.0, 4.0, start=DAY + timedelta(minutes=2)))
+    store.append_bar(["AAPL"], int(DAY.timestamp()), *(np.array([9.0]),) * 4)
+
+    stored = store.read("AAPL", DAY, DAY + timedelta(days=1))
+    assert stored["close"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert np.all(np.diff(stored["ts"]) > 0)
+
+def test_a_half_written_record_is_truncated_before_appending(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.append("AAPL", bars(1.0, 2.0))
+    path = store._path(DAY.date(), "AAPL")
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 7)
+
+    store.append("AAPL", bars(3.0, start=DAY + timedelta(minutes=2)))
+    assert tmp_path.joinpath("2026-03-02", "AAPL.bin").stat().st_size == 3 * BAR_DTYPE.itemsize
+    assert store.read("AAPL", DAY, DAY + timedelta(days=1))["close"].tolist() == [1.0, 2.0, 3.0]
+
+def test_reads_span_days_and_downsample(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    store.append("AAPL", bars(1.0, 5.0, 2.0, 3.0, start=DAY - timedelta(minutes=2)))
+
+    stored = store.read("AAPL", DAY - timedelta(minutes=1), DAY + timedelta(minutes=2))
+    assert stored["close"].tolist() == [5.0, 2.0, 3.0]
+    merged = downsample(store.read("AAPL", DAY - timedelta(minutes=2), DAY + timedelta(minutes=2)), 120)
+    assert merged[["open", "high", "low", "close"]].tolist() == [(1.0, 5.0, 1.0, 5.0), (2.0, 3.0, 2.0, 3.0)]
+
+def test_only_the_live_producer_records_bars(client, monkeypatch, tmp_path):
+    recorder = BarRecorder(PriceHistoryStore(str(tmp_path)))
+    monkeypatch.setattr(scheduler_module, "bar_recorder", recorder)
+    shared = scheduler_module.scheduler
+    monkeypatch.setattr(shared, "leader", False)
+    monkeypatch.setattr(shared, "replay", None)
+    prices = scheduler_module.market.prices
+
+    client.portal.call(scheduler_module.record_price_bar, prices)
+    assert recorder.pending() is None
+
+    shared.leader = True
+    client.portal.call(scheduler_module.record_price_bar, prices)
+    assert recorder.pending() is not None
+
+    # Starting a replay writes out the live bar so far and records nothing from the replay
+    shared.replay = object()
+    client.portal.call(scheduler_module.record_price_bar, prices * 2)
+    assert recorder.pending() is None
+    now = datetime.now(timezone.utc)
+    written = recorder.store.read(scheduler_module.market.symbols[0], now - timedelta(minutes=2), now + timedelta(minutes=1))
+    assert written["close"].tolist() == [prices[0]]
+
+def test_history_rejects_intervals_that_exceed_the_point_cap(client, make_user):
+    _, headers = make_user()
+    end = datetime.now(timezone.utc)
+    symbol = scheduler_module.market.symbols[0]
+
+    response = client.get(f"/market/prices/{symbol}/history", headers=headers, params={"start": (end - timedelta(days=3)).isoformat(), "end": end.isoformat(), "interval_seconds": 60})
+    assert response.status_code == 422
+
+    response = client.get(f"/market/prices/{symbol}/history", headers=headers, params={"start": (end - timedelta(days=3)).isoformat(), "end": end.isoformat()})
+    assert response.status_code == 200
+    assert response.json()["interval_seconds"] >= 180
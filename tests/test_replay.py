@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from backend.market_simulator import DEFAULT_UNIVERSE, PriceEngine
+from backend.models import MarketScenario
+from backend.replay import ScenarioReplay, load_scenario, precompute_session
+
+SCENARIO = MarketScenario(
+    name="Test", seed=7, duration_seconds=86400, step_seconds=600, event_interval_seconds=7200,
+    universe={"AAA": ("tech", 100.0), "BBB": ("finance", 50.0)},
+    events=[{"at_seconds": 3600, "event_type": "Crash", "impact": {"sectors_affected": ["tech"], "price_change": -0.2}}],
+)
+
+def test_the_same_scenario_always_precomputes_the_same_session():
+    first, second = precompute_session(SCENARIO), precompute_session(SCENARIO)
+    np.testing.assert_array_equal(first.prices, second.prices)
+    assert first.events == second.events
+    assert len(first.events) > 1
+
+    reseeded = precompute_session(SCENARIO.model_copy(update={"seed": 8}))
+    assert not np.array_equal(first.prices, reseeded.prices)
+
+def test_the_bundled_scenario_is_reproducible():
+    scenario = load_scenario("one_year")
+    first, second = precompute_session(scenario), precompute_session(scenario)
+    np.testing.assert_array_equal(first.prices, second.prices)
+    assert first.events == second.events
+    assert first.start_date == second.start_date == scenario.start_date
+
+def play(controls):
+    """Replays SCENARIO on a fresh engine with hand-fed clock times; returns the prices and events seen."""
+    engine = PriceEngine(seed=0)
+    replay = ScenarioReplay(precompute_session(SCENARIO), engine, speed=600.0)
+    replay.control(position=0.0, now=0.0)
+    replay.attach()
+    indices = [engine.symbol_index[symbol] for symbol in replay.session.symbols]
+    seen = []
+    for now, control in controls:
+        if control:
+            replay.control(now=now, **control)
+        events = replay.advance(now)
+        seen.append((engine.prices[indices].copy(), [event["event_type"] for event in events]))
+    return replay, seen
+
+def test_replays_with_the_same_controls_see_the_same_market():
+    controls = [(10.0, None), (20.0, {"speed": 1200.0}), (30.0, {"paused": True}), (40.0, None), (50.0, {"position": 60000.0, "paused": False}), (200.0, None)]
+    (replay, first), (_, second) = play(controls), play(controls)
+    for (prices_a, events_a), (prices_b, events_b) in zip(first, second):
+        np.testing.assert_array_equal(prices_a, prices_b)
+        assert events_a == events_b
+
+    # Prices are the precomputed rows, and the scripted event is reported as it is passed
+    np.testing.assert_array_equal(first[0][0], replay.session.prices_at(6000.0))
+    assert "Crash" in first[0][1]
+    # Paused, nothing moves; seeking skips the events in between
+    np.testing.assert_array_equal(first[2][0], first[3][0])
+    assert first[3][1] == [] and first[4][1] == []
+    assert replay.finished
+    np.testing.assert_array_equal(first[-1][0], replay.session.prices[-1])
+
+@pytest.mark.parametrize("price_change", [-1, -2.5, "abc", float("inf")])
+def test_scripted_events_cannot_wipe_out_prices(price_change):
+    event = {"at_seconds": 0, "event_type": "Crash", "impact": {"sectors_affected": ["tech"], "price_change": price_change}}
+    with pytest.raises(ValidationError):
+        MarketScenario(name="Bad", universe={"AAA": ("tech", 100.0)}, events=[event])
+
+def test_a_bad_scripted_event_is_rejected_before_replaying(client, make_user):
+    _, headers = make_user("instructor")
+    scenario = SCENARIO.model_dump()
+    scenario["events"][0]["impact"]["price_change"] = "abc"
+    response = client.post("/market/replay", json={"scenario": scenario}, headers=headers)
+    assert response.status_code == 422
+
+def test_released_replays_delist_the_symbols_they_added():
+    engine = PriceEngine(seed=0, max_symbols=len(DEFAULT_UNIVERSE) + 2)
+    session = precompute_session(SCENARIO)
+    for _ in range(3):
+        replay = ScenarioReplay(session, engine)
+        index = engine.symbol_index["AAA"]
+        replay.release()
+        assert engine.unknown_symbols(["AAA", "BBB", "AAPL"]) == ["AAA", "BBB"]
+
+    # Delisted prices stop moving, and a symbol listed again keeps its index
+    frozen = engine.prices[index]
+    engine.step(86400)
+    assert engine.prices[index] == frozen
+    assert ScenarioReplay(session, engine).engine.symbol_index["AAA"] == index
+    assert len(engine) == len(DEFAULT_UNIVERSE) + 2
+
+def test_a_replaced_replay_hands_its_symbols_to_the_next_one():
+    engine = PriceEngine(seed=0)
+    session = precompute_session(SCENARIO)
+    first = ScenarioReplay(session, engine)
+    second = ScenarioReplay(session, engine)
+    first.release(second)
+    assert engine.unknown_symbols(["AAA", "BBB"]) == []
+    second.release()
+    assert engine.unknown_symbols(["AAA", "BBB"]) == ["AAA", "BBB"]
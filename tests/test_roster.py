@@ -0,0 +1,39 @@
+from backend import auth
+from conftest import database
+
+ROSTER = b"email,password,role,class_code\nana@example.com,pw-1,,\nben@example.com,pw-2,,bio-2\nana@example.com,pw-3,,\nteacher@example.com,pw-4,instructor,\nnot-an-email,pw-5,,\n"
+
+def user_by_email(email: str) -> dict:
+    return next(row for row in database.tables["users"] if row["email"] == email)
+
+def test_signup_cannot_choose_a_class(client):
+    response = client.post("/signup", json={"email": "eve@example.com", "password": "secret", "class_code": "bio-1"})
+    assert response.status_code == 200
+    assert response.json()["class_code"] is None
+    assert user_by_email("eve@example.com").get("class_code") is None
+
+def test_import_reports_a_status_per_row(client, make_user):
+    database._insert("users", {"email": "ben@example.com", "role": "student"})
+    _, headers = make_user("instructor")
+
+    response = client.post("/users/import", headers={**headers, "Content-Type": "text/csv"}, params={"class_code": "bio-1"}, content=ROSTER)
+    assert response.status_code == 200
+    assert [(row["email"], row["status"]) for row in response.json()] == [
+        ("ana@example.com", "created"),
+        ("ben@example.com", "exists"),
+        ("ana@example.com", "invalid"),
+        ("teacher@example.com", "invalid"),
+        ("not-an-email", "invalid"),
+    ]
+    ana = user_by_email("ana@example.com")
+    assert ana["class_code"] == "bio-1"
+    assert any(portfolio["user_id"] == ana["id"] for portfolio in database.tables["portfolios"])
+
+def test_import_is_not_rejected_while_logins_fill_the_hashing_queue(client, make_user, monkeypatch):
+    _, headers = make_user("instructor")
+    monkeypatch.setattr(auth, "_hash_pending", auth.PASSWORD_HASH_WORKERS + auth.PASSWORD_HASH_MAX_QUEUE)
+
+    assert client.post("/signup", json={"email": "late@example.com", "password": "secret"}).status_code == 503
+    roster = b'[{"email": "a@example.com", "password": "pw"}, {"email": "b@example.com", "password": "pw"}]'
+    response = client.post("/users/import", headers={**headers, "Content-Type": "application/json"}, content=roster)
+    assert [row["status"] for row in response.json()] == ["created", "created"]
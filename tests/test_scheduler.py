@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from backend.market_simulator import PriceEngine
+from backend.models import MarketScenario
+from backend.replay import ScenarioReplay, precompute_session
+from backend.scheduler import MarketScheduler
+from conftest import database
+
+EVENT = {"event_type": "Rally", "description": None, "impact": {"sectors_affected": ["all"], "price_change": 0.1}}
+
+@pytest.fixture
+def workers(client):
+    """Starts schedulers for two workers (ticked by hand) with separately seeded engines."""
+    started = []
+
+    def make(name, **kwargs):
+        scheduler = MarketScheduler(engine=PriceEngine(seed=len(started)), tick_seconds=3600, event_interval_seconds=0, worker_id=name, **kwargs)
+        seen = []
+        scheduler.add_event_listener(seen.append)
+        scheduler.seen = seen
+        client.portal.call(start, scheduler)
+        started.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in started:
+        client.portal.call(scheduler.stop)
+
+async def start(scheduler):
+    scheduler.start()
+
+def tick(client, *schedulers):
+    for scheduler in schedulers:
+        client.portal.call(scheduler.tick)
+
+def event(client, scheduler):
+    return client.portal.call(scheduler.trigger_event, {**EVENT, "event_date": datetime.now(timezone.utc)})
+
+def test_one_worker_produces_and_the_others_follow(client, workers):
+    producer, follower = workers("a"), workers("b")
+    # Separately seeded engines drift apart when each simulates on its own
+    producer.engine.step(86400)
+    follower.engine.step(86400)
+    assert not np.allclose(producer.engine.prices, follower.engine.prices)
+
+    tick(client, producer, follower, producer, follower)
+    assert producer.leader and not follower.leader
+    assert follower.engine.symbols == producer.engine.symbols
+    np.testing.assert_allclose(follower.engine.prices, producer.engine.prices)
+
+def test_events_are_stored_once_and_reach_every_worker(client, workers):
+    producer, follower = workers("a"), workers("b")
+    tick(client, producer, follower)
+    before = producer.engine.prices.copy()
+
+    stored = event(client, producer)
+    np.testing.assert_allclose(producer.engine.prices, before * 1.1)
+    tick(client, producer, follower, producer, follower)
+    assert [row["id"] for row in database.tables["market_events"]] == [stored["id"]]
+    assert [row["id"] for row in producer.seen] == [stored["id"]]
+    assert [row["id"] for row in follower.seen] == [stored["id"]]
+
+def test_events_triggered_on_a_follower_are_applied_by_the_producer(client, workers):
+    producer, follower = workers("a"), workers("b")
+    tick(client, producer, follower)
+    before = producer.engine.prices.copy()
+
+    stored = event(client, follower)
+    assert database.tables["market_events"][0]["pending"]
+    tick(client, producer)
+    np.testing.assert_allclose(producer.engine.prices, before * 1.1, rtol=1e-3)
+    assert not database.tables["market_events"][0]["pending"]
+    tick(client, producer, follower)
+    np.testing.assert_allclose(follower.engine.prices, producer.engine.prices)
+    assert [row["id"] for row in follower.seen] == [stored["id"]]
+    assert [row["id"] for row in producer.seen] == [stored["id"]]
+
+def test_another_worker_takes_over_an_expired_lease(client, workers):
+    first, second = workers("a"), workers("b")
+    tick(client, first, second, first)
+    published = first.engine.prices.copy()
+
+    database.tables["market_state"][0]["lease_expires_at"] = 0
+    tick(client, second)
+    assert second.leader
+    np.testing.assert_allclose(second.engine.prices, published)
+    tick(client, first)
+    assert not first.leader
+
+def test_stopping_the_producer_hands_the_lease_over(client, workers):
+    first, second = workers("a"), workers("b")
+    tick(client, first, second)
+
+    client.portal.call(first.stop)
+    tick(client, second)
+    assert second.leader
+
+def test_followers_never_claim_the_lease(client, workers):
+    follower = workers("a", role="follower")
+    tick(client, follower, follower)
+    assert not follower.leader
+    assert database.tables["market_state"][0]["leader"] is None
+
+def test_replays_started_on_a_follower_are_played_by_the_producer(client, workers):
+    producer, follower = workers("a"), workers("b")
+    tick(client, producer, follower)
+    scenario = MarketScenario(name="Test", seed=1, duration_seconds=3600, step_seconds=60, universe={"TST": ("tech", 10.0)})
+
+    replay = ScenarioReplay(precompute_session(scenario), follower.engine, speed=60.0)
+    client.portal.call(follower.set_replay, follower.replay_config(replay, seek=True), replay)
+    assert not follower.engine.held
+    tick(client, producer, follower)
+    assert producer.engine.held
+    assert not follower.engine.held
+    assert producer.replay.status().name == "Test"
+    assert producer.replay.session.start_date == follower.replay.session.start_date
+    np.testing.assert_array_equal(producer.replay.session.prices, follower.replay.session.prices)
+    # Replayed prices reach followers with the producer's next publish
+    tick(client, producer, follower)
+    np.testing.assert_allclose(follower.engine.get_price("TST"), producer.engine.get_price("TST"))
+
+    client.portal.call(follower.set_replay, None)
+    tick(client, producer, follower)
+    assert producer.replay is None and not producer.engine.held
+    # The scenario's own symbols are delisted again on every worker
+    assert producer.engine.unknown_symbols(["TST"]) == follower.engine.unknown_symbols(["TST"]) == ["TST"]
+    tick(client, producer, follower)
+    assert follower.engine.unknown_symbols(["TST"]) == ["TST"]
@@ -0,0 +1,44 @@
+import pytest
+
+from backend import main, pagination
+from backend.models import ChatbotInteractionInDB, MarketEventInDB, OrderInDB, TradeInDB, WebinarInDB
+from backend.shared_cache import global_list_cache
+from conftest import database, portfolio_of
+
+@pytest.fixture
+def endpoints(make_user):
+    """Seeds two rows or more behind every list endpoint that can serve trusted rows."""
+    user, headers = make_user()
+    portfolio = portfolio_of(user)
+    for i in range(3):
+        database._insert("trades", {"portfolio_id": portfolio["id"], "symbol": "AAPL", "quantity": i + 1, "price": 172.35, "side": "BUY"})
+        database._insert("orders", {"user_id": user["id"], "portfolio_id": portfolio["id"], "symbol": "AAPL", "side": "BUY", "order_type": "LIMIT", "quantity": 1, "limit_price": 150.0})
+        database._insert("chatbot_interactions", {"user_id": user["id"], "query": f"Question {i}?", "response": "An answer.", "feedback": 4})
+        database._insert("webinars", {"instructor_id": user["id"], "topic": f"Topic {i}", "scheduled_at": f"2026-11-0{i + 1}T15:00:00+00:00", "recording_url": "https://example.com"})
+        database._insert("market_events", {"event_type": "Rally", "impact": {"sectors_affected": ["all"], "price_change": 0.01}})
+    return headers, [
+        (f"/portfolios/{portfolio['id']}/trades?limit=2", TradeInDB),
+        ("/orders?limit=2", OrderInDB),
+        ("/chatbot/history?limit=2", ChatbotInteractionInDB),
+        ("/webinars?limit=2", WebinarInDB),
+        ("/market-events", MarketEventInDB),
+    ]
+
+def fetch(client, monkeypatch, headers, path, fast: bool):
+    monkeypatch.setattr(pagination, "FAST_SERIALIZATION_ENABLED", fast)
+    monkeypatch.setattr(main, "FAST_SERIALIZATION_ENABLED", fast)
+    client.portal.call(global_list_cache.invalidate, "")
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return response
+
+def test_trusted_rows_match_validated_responses(client, monkeypatch, endpoints):
+    headers, paths = endpoints
+    for path, model in paths:
+        validated = fetch(client, monkeypatch, headers, path, fast=False)
+        trusted = fetch(client, monkeypatch, headers, path, fast=True)
+
+        # Same fields and values; only the timestamp spelling may differ (PostgREST's vs pydantic's)
+        assert [set(row) for row in trusted.json()] == [set(model.model_fields)] * len(validated.json()), path
+        assert [model(**row) for row in trusted.json()] == [model(**row) for row in validated.json()], path
+        assert trusted.headers.get("X-Next-Cursor") == validated.headers.get("X-Next-Cursor"), path
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+from backend.shared_cache import SharedResponseCache, global_list_cache
+
+def test_list_responses_carry_an_etag_and_revalidate_to_304(client, make_user):
+    instructor, headers = make_user("instructor")
+    webinar = {"instructor_id": instructor["id"], "topic": "Budgeting 101", "scheduled_at": "2026-11-01T15:00:00+00:00"}
+    assert client.post("/webinars", headers=headers, json=webinar).status_code == 200
+
+    first = client.get("/webinars", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert [row["topic"] for row in first.json()] == ["Budgeting 101"]
+
+    revalidated = client.get("/webinars", headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+
+    # Creating a webinar invalidates the cached pages, so the old ETag no longer matches
+    assert client.post("/webinars", headers=headers, json={**webinar, "topic": "Credit scores"}).status_code == 200
+    changed = client.get("/webinars", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 2
+
+def test_writes_skip_a_locked_cache_instead_of_stalling(client, tmp_path):
+    cache = SharedResponseCache(str(tmp_path / "cache.sqlite3"), busy_timeout_ms=20)
+    client.portal.call(cache.set, "key", b"[]")
+
+    # Another worker holding the write lock (WAL mode still lets readers through)
+    writer = sqlite3.connect(cache.path, isolation_level=None)
+    writer.execute("BEGIN EXCLUSIVE")
+    try:
+        started = time.perf_counter()
+        assert client.portal.call(cache.get, "key").body == b"[]"
+        assert client.portal.call(cache.set, "other", b"[1]").body == b"[1]"
+        assert time.perf_counter() - started < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+    assert client.portal.call(cache.get, "other") is None
+
+def test_expired_entries_are_purged_by_later_writes(client, tmp_path):
+    cache = SharedResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0.01, purge_fraction=1.0)
+    for i in range(5):
+        client.portal.call(cache.set, f"key{i}", b"[]")
+    time.sleep(0.02)
+    client.portal.call(cache.set, "fresh", b"[]")
+    assert [key for (key,) in cache._execute("SELECT key FROM responses", ())] == ["fresh"]
+
+def cached_webinar_pages() -> int:
+    return global_list_cache._execute("SELECT count(*) FROM responses WHERE key LIKE 'webinars:%'", ())[0][0]
+
+def test_webinar_cache_keys_only_hold_validated_input(client, make_user):
+    _, headers = make_user("instructor")
+    assert client.get("/webinars", params={"before": "not a cursor"}, headers=headers).status_code == 400
+    assert client.get("/webinars", params={"fields": "topic,nope"}, headers=headers).status_code == 400
+    assert cached_webinar_pages() == 0
+
+    # The same columns, however they are listed, share one entry
+    for fields in ("topic,scheduled_at", "scheduled_at, topic", "topic,topic,scheduled_at"):
+        assert client.get("/webinars", params={"fields": fields}, headers=headers).status_code == 200
+    assert cached_webinar_pages() == 1
@@ -0,0 +1,75 @@
+import json
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from backend import streaming
+from backend.market_simulator import market
+from backend.streaming import market_stream
+
+def connect(client, make_user):
+    _, headers = make_user()
+    token = headers["Authorization"].split()[1]
+    return client.websocket_connect(f"/ws/market?token={token}")
+
+def send(websocket, **message):
+    websocket.send_text(json.dumps(message))
+
+def receive(websocket) -> dict:
+    return json.loads(websocket.receive_text())
+
+def tick(client, factor: float = 1.0) -> None:
+    client.portal.call(market_stream.on_tick, market.prices * factor)
+
+def test_subscriptions_choose_the_streamed_symbols(client, make_user):
+    with connect(client, make_user) as websocket:
+        send(websocket, action="subscribe", symbols=["AAPL", "MSFT", "NOPE"])
+        assert receive(websocket) == {"type": "error", "detail": "Unknown symbols: NOPE"}
+        assert set(receive(websocket)["prices"]) == {"AAPL", "MSFT"}
+
+        send(websocket, action="unsubscribe", symbols=["MSFT"])
+        send(websocket, action="subscribe", symbols=[])
+        message = receive(websocket)
+        assert message["type"] == "prices" and set(message["prices"]) == {"AAPL"}
+
+def test_ticks_between_sends_are_coalesced_under_the_rate_cap(client, make_user, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_MAX_UPDATES_PER_SECOND", 5)
+    with connect(client, make_user) as websocket:
+        send(websocket, action="subscribe", symbols=["AAPL"])
+        receive(websocket)
+        sent_at = time.monotonic()
+        for factor in (1.01, 1.02, 1.03):
+            tick(client, factor)
+
+        message = receive(websocket)
+        assert time.monotonic() - sent_at >= 0.15
+        assert message["prices"]["AAPL"] == round(market.get_price("AAPL") * 1.03, 4)
+        # The three ticks went out as that one frame: the reply to the next message comes first
+        send(websocket, action="subscribe", symbols=["NOPE"], events=True)
+        assert receive(websocket)["type"] == "error"
+        assert receive(websocket)["type"] == "prices"
+        client.portal.call(market_stream.on_event, {"event_type": "Crash"})
+        assert receive(websocket) == {"type": "event", "event": {"event_type": "Crash"}}
+
+def test_clients_that_fall_behind_on_events_are_closed(client, make_user, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_MAX_PENDING_EVENTS", 2)
+
+    def burst():
+        for i in range(3):
+            market_stream.on_event({"event_type": f"Event {i}"})
+
+    with connect(client, make_user) as websocket:
+        send(websocket, action="subscribe", symbols=["NOPE"], events=True)
+        assert receive(websocket)["type"] == "error"
+        client.portal.call(burst)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            while True:
+                receive(websocket)
+        assert closed.value.code == 1013
+
+def test_bad_tokens_are_rejected(client):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/ws/market?token=not-a-token") as websocket:
+            websocket.receive_text()
+    assert closed.value.code == 1008
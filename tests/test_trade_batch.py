@@ -0,0 +1,45 @@
+from backend.trading import TRADE_BATCH_MAX_SIZE
+from benchmarks.fakes import PostgrestError
+from conftest import database, portfolio_of
+from test_trades import trade
+
+def test_batch_fills_valid_orders_and_rejects_the_rest(client, make_user):
+    user, headers = make_user(balance=1500.0)
+    other, _ = make_user()
+    portfolio_id = portfolio_of(user)["id"]
+    orders = [
+        trade(portfolio_id, quantity=10, price=100.0),
+        trade(portfolio_id, quantity=10, price=100.0),
+        trade(portfolio_of(other)["id"]),
+        trade(portfolio_id, side="SELL", quantity=5, price=100.0, symbol="MSFT"),
+    ]
+
+    response = client.post("/trades/batch", json=orders, headers=headers)
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert [result["status"] for result in results] == ["filled", "rejected", "rejected", "rejected"]
+    assert [result["status_code"] for result in results] == [None, 400, 403, 400]
+    assert results[0]["trade"]["portfolio_id"] == portfolio_id
+    assert portfolio_of(user)["balance"] == 500.0
+    assert len(database.tables["trades"]) == 1
+
+def test_empty_and_oversized_batches_are_rejected(client, make_user):
+    user, headers = make_user()
+    order = trade(portfolio_of(user)["id"], quantity=1, price=1.0)
+
+    assert client.post("/trades/batch", json=[], headers=headers).status_code == 400
+    response = client.post("/trades/batch", json=[order] * (TRADE_BATCH_MAX_SIZE + 1), headers=headers)
+    assert response.status_code == 400
+    assert database.tables["trades"] == []
+
+def test_failed_batch_call_is_a_server_error(client, make_user, monkeypatch):
+    user, headers = make_user()
+
+    def failing(*args, **kwargs):
+        raise PostgrestError("XX000", "internal detail")
+
+    monkeypatch.setattr(database, "execute_trade_batch", failing)
+    response = client.post("/trades/batch", json=[trade(portfolio_of(user)["id"])], headers=headers)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Batch trade execution failed"
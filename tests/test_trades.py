@@ -0,0 +1,68 @@
+import uuid
+
+from benchmarks.fakes import PostgrestError
+from conftest import database, portfolio_of
+
+def trade(portfolio_id, side="BUY", quantity=10, price=100.0, symbol="AAPL"):
+    return {"portfolio_id": portfolio_id, "symbol": symbol, "quantity": quantity, "price": price, "side": side}
+
+def holding(portfolio_id, symbol="AAPL"):
+    return next((row for row in database.tables["holdings"] if row["portfolio_id"] == portfolio_id and row["symbol"] == symbol), None)
+
+def test_buy_and_sell_update_balance_and_holdings(client, make_user):
+    user, headers = make_user()
+    portfolio = portfolio_of(user)
+
+    response = client.post("/trades", json=trade(portfolio["id"]), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["side"] == "BUY"
+    assert portfolio["balance"] == 9000.0
+    assert holding(portfolio["id"])["quantity"] == 10
+
+    response = client.post("/trades", json=trade(portfolio["id"], side="SELL", quantity=4, price=110.0), headers=headers)
+    assert response.status_code == 200
+    assert portfolio["balance"] == 9440.0
+    assert holding(portfolio["id"])["quantity"] == 6
+    assert len(database.tables["trades"]) == 2
+
+def test_insufficient_balance_is_a_bad_request(client, make_user):
+    user, headers = make_user(balance=50.0)
+    portfolio = portfolio_of(user)
+
+    response = client.post("/trades", json=trade(portfolio["id"]), headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Insufficient balance for this trade"
+    assert portfolio["balance"] == 50.0
+    assert database.tables["trades"] == []
+
+def test_selling_more_than_held_is_a_bad_request(client, make_user):
+    user, headers = make_user()
+
+    response = client.post("/trades", json=trade(portfolio_of(user)["id"], side="SELL"), headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Insufficient holdings for this trade"
+
+def test_unknown_portfolio_is_not_found(client, make_user):
+    _, headers = make_user()
+
+    response = client.post("/trades", json=trade(str(uuid.uuid4())), headers=headers)
+    assert response.status_code == 404
+
+def test_trading_for_another_users_portfolio_is_forbidden(client, make_user):
+    owner, _ = make_user()
+    _, headers = make_user()
+
+    response = client.post("/trades", json=trade(portfolio_of(owner)["id"]), headers=headers)
+    assert response.status_code == 403
+    assert portfolio_of(owner)["balance"] == 10000.0
+
+def test_unexpected_database_errors_are_not_leaked(client, make_user, monkeypatch):
+    user, headers = make_user()
+
+    def failing(*args, **kwargs):
+        raise PostgrestError("XX000", "internal detail")
+
+    monkeypatch.setattr(database, "execute_trade", failing)
+    response = client.post("/trades", json=trade(portfolio_of(user)["id"]), headers=headers)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Trade execution failed"
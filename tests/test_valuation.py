@@ -0,0 +1,54 @@
+import numpy as np
+
+from backend.market_simulator import PriceEngine, market
+from backend.valuation import HoldingsBook
+from conftest import database, portfolio_of
+
+def test_trades_update_each_holding_in_place():
+    engine = PriceEngine(seed=0)
+    portfolios = [{"id": f"p{i}", "balance": 1000.0} for i in range(3)]
+    holdings = [{"portfolio_id": "p0", "symbol": "AAPL", "quantity": 5}, {"portfolio_id": "p1", "symbol": "MSFT", "quantity": 2}]
+    book = HoldingsBook.from_rows(portfolios, holdings, engine)
+    aapl, jpm = engine.symbol_index["AAPL"], engine.symbol_index["JPM"]
+
+    for _ in range(50):
+        book.apply_trade(0, aapl, 1, -10.0)
+        book.apply_trade(0, aapl, -1, 10.0)
+    book.apply_trade(0, jpm, 3, -30.0)
+    book.apply_trade(2, aapl, 4, -40.0)
+    # Only symbols new to a portfolio add coordinates
+    assert len(book.quantities) == 4
+
+    values = book.values(engine.prices)
+    for portfolio in range(len(book)):
+        assert np.isclose(book.value_of(portfolio, engine.prices), values[portfolio])
+    prices = engine.prices
+    assert np.isclose(values[0], 970.0 + 5 * prices[aapl] + 3 * prices[jpm])
+
+def test_bulk_values_skip_symbols_the_market_never_listed():
+    engine = PriceEngine(universe={"AAA": ("tech", 10.0), "BBB": ("energy", 20.0)}, seed=0, max_symbols=2)
+    engine.remove_symbols(["BBB"])
+    portfolios = [{"id": "p0", "balance": 100.0}, {"id": "p1", "balance": 50.0}, {"id": "p2", "balance": 0.0}]
+    holdings = [
+        {"portfolio_id": "p0", "symbol": "AAA", "quantity": 2},
+        {"portfolio_id": "p0", "symbol": "GONE", "quantity": 7},
+        {"portfolio_id": "p1", "symbol": "BBB", "quantity": 1},
+        {"portfolio_id": "p1", "symbol": "not a symbol", "quantity": 3},
+        {"portfolio_id": "p9", "symbol": "AAA", "quantity": 1},
+    ]
+    book = HoldingsBook.from_rows(portfolios, holdings, engine)
+
+    # Delisted BBB keeps its last price; unknown and malformed symbols count for nothing
+    np.testing.assert_allclose(book.values(engine.prices), [120.0, 70.0, 0.0])
+    assert engine.unknown_symbols(["GONE"]) == ["GONE"]
+
+def test_revaluing_writes_every_total_value(client, make_user):
+    (first, _), (second, _), (_, headers) = make_user(balance=1000.0), make_user(balance=500.0), make_user("instructor")
+    symbol = market.symbols[0]
+    database._insert("holdings", {"portfolio_id": portfolio_of(first)["id"], "symbol": symbol, "quantity": 4})
+
+    response = client.post("/portfolios/revalue", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["portfolios_updated"] == 2
+    assert portfolio_of(first)["total_value"] == round(1000.0 + 4 * market.get_price(symbol), 2)
+    assert portfolio_of(second)["total_value"] == 500.0